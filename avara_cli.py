@@ -8,7 +8,6 @@ import requests
 import sqlite3
 import sys
 import os
-import glob
 import shlex
 import traceback
 import json
@@ -103,9 +102,15 @@ def print_help():
     _cmd("approve",   "<action_id>",  "Approve a halted action")
     _cmd("deny",      "<action_id>",  "Deny a halted action")
 
+    print(f"\n{CYAN}{BOLD}  RAG PROVENANCE{RESET}")
+    _cmd("import-docs", "<path> [--format jsonl|csv]", "Bulk-import document provenance & ACLs")
+
     print(f"\n{CYAN}{BOLD}  MONITORING{RESET}")
     _cmd("status",    "",             "Check AVARA API server health")
-    _cmd("logs",      "[--tail N]",   "View recent audit log entries")
+    _cmd("logs",      "[--tail N] [--follow] [--agent ID] [--event TYPE] [--since T]", "View or query audit log entries")
+    _cmd("verify-ledger", "[--full] [--workers N]", "Verify the audit ledger hash chain & checkpoints")
+    _cmd("replay",    "[--since T] [--workers N] [--show N]", "Re-run logged decisions against the current policy")
+    _cmd("export",    "<out_dir> [--events A,B]", "Incremental columnar (NumPy) export of the audit ledger")
 
     print(f"\n{CYAN}{BOLD}  GENERAL{RESET}")
     _cmd("theme",     "<color>",      "Change the UI color theme (orange, blue, purple, green, red)")
@@ -217,6 +222,34 @@ def cmd_resolve(args, decision):
     except Exception as e:
         err(f"Error: {e}")
 
+def cmd_import_docs(args):
+    from src.db.memory_store import InMemoryStore
+    from src.db.storage_backend import open_store
+    from src.guards.provenance_registry import ProvenanceRegistry
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    store = None
+    try:
+        # Same engine the server uses ($AVARA_STORAGE_URL, else the SQLite file)
+        store = open_store()
+        if isinstance(store, InMemoryStore):
+            warn("Storage is memory:// - imported records are discarded when this command exits.")
+        registry = ProvenanceRegistry(store)
+        started = time.time()
+        if fmt == "csv":
+            count = registry.import_csv(args.path, batch_size=args.batch_size)
+        else:
+            count = registry.import_jsonl(args.path, batch_size=args.batch_size)
+        ok(f"Imported {count:,} document provenance records in {time.time() - started:.1f}s")
+        info("Running servers pick up new documents on first lookup.")
+    except FileNotFoundError:
+        err(f"File not found: {args.path}")
+    except Exception as e:
+        err(f"Import failed: {e}")
+    finally:
+        if store is not None:
+            store.close()
+
 def cmd_status(args):
     try:
         r = requests.get(f"{API_BASE}/health", timeout=3)
@@ -233,41 +266,162 @@ def cmd_status(args):
         warn(f"Database: {DB_PATH} not found (will be created on first use)")
 
     # Log status
-    log_files = sorted(glob.glob(os.path.join(LOG_DIR, "*.log")))
+    from src.core.ledger_segments import list_segments
+    log_files = list_segments(LOG_DIR)
     if log_files:
         info(f"Audit logs: {len(log_files)} file(s) in {LOG_DIR}/")
     else:
         warn(f"Audit logs: none found in {LOG_DIR}/")
 
+def _print_log_line(line):
+    # Color-code by event type
+    if "BLOCK" in line or "DENIED" in line or "REVOKE" in line:
+        print(f"    {RED}●{RESET}  {line}")
+    elif "ALLOW" in line or "APPROVED" in line or "PROVISION" in line:
+        print(f"    {GREEN}●{RESET}  {line}")
+    elif "PENDING" in line or "APPROVAL_REQUEST" in line:
+        print(f"    {YELLOW}●{RESET}  {line}")
+    else:
+        print(f"    {GRAY}●{RESET}  {line}")
+
+def _parse_since(value):
+    """Absolute ISO date/datetime, or relative like 30m, 12h, 7d."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if value[-1:] in units and value[:-1].isdigit():
+        return time.time() - int(value[:-1]) * units[value[-1]]
+    return datetime.fromisoformat(value).timestamp()
+
 def cmd_logs(args):
     tail = getattr(args, 'tail', 20) or 20
-    log_files = sorted(glob.glob(os.path.join(LOG_DIR, "*.log")))
-    if not log_files:
-        warn(f"No audit logs found in {LOG_DIR}/")
+    agent, event, since = getattr(args, 'agent', None), getattr(args, 'event', None), getattr(args, 'since', None)
+    if agent or event or since:
+        from collections import deque
+        from src.core.ledger_index import query_ledger
+        try:
+            since_ts = _parse_since(since) if since else None
+        except ValueError:
+            err(f"Invalid --since value: {since} (use ISO time or e.g. 30m, 12h, 7d)")
+            return
+        filters = ", ".join(f"{k}={v}" for k, v in (("agent", agent), ("event", event), ("since", since)) if v)
+        try:
+            matches = deque(query_ledger(LOG_DIR, agent_id=agent, event_type=event, since=since_ts), maxlen=tail)
+        except Exception as e:
+            err(f"Could not query audit logs: {e}")
+            return
+        if not matches:
+            warn(f"No audit entries match {filters}")
+            return
+        info(f"Showing last {len(matches)} entries matching {CYAN}{filters}{RESET}\n")
+        for record in matches:
+            record.pop("prev_hash", None)
+            record.pop("hash", None)
+            _print_log_line(json.dumps(record))
+        print()
         return
 
-    latest = log_files[-1]
-    info(f"Showing last {tail} entries from {CYAN}{os.path.basename(latest)}{RESET}\n")
+    from src.core.ledger_segments import follow, list_segments, tail_lines
+    segments = list_segments(LOG_DIR)
+    if not segments:
+        warn(f"No audit logs found in {LOG_DIR}/")
+        return
 
+    # Memory-mapped backward scan: only the last `tail` lines are read, stepping
+    # back into older segments when the newest one is shorter than that
+    lines = []
     try:
-        with open(latest, 'r') as f:
-            lines = f.readlines()
-        for line in lines[-tail:]:
-            line = line.strip()
-            if not line:
-                continue
-            # Color-code by event type
-            if "BLOCK" in line or "DENIED" in line or "REVOKE" in line:
-                print(f"    {RED}●{RESET}  {line}")
-            elif "ALLOW" in line or "APPROVED" in line or "PROVISION" in line:
-                print(f"    {GREEN}●{RESET}  {line}")
-            elif "PENDING" in line or "APPROVAL_REQUEST" in line:
-                print(f"    {YELLOW}●{RESET}  {line}")
-            else:
-                print(f"    {GRAY}●{RESET}  {line}")
-        print()
+        for segment in reversed(segments):
+            lines = tail_lines(segment, tail - len(lines)) + lines
+            if len(lines) >= tail:
+                break
     except Exception as e:
         err(f"Could not read log file: {e}")
+        return
+    info(f"Showing last {len(lines)} entries from {CYAN}{os.path.basename(segments[-1])}{RESET}\n")
+    for line in lines:
+        if line.strip():
+            _print_log_line(line.strip())
+
+    if getattr(args, 'follow', False):
+        info(f"Following {LOG_DIR}/ (Ctrl+C to stop)\n")
+        try:
+            for line in follow(LOG_DIR):
+                _print_log_line(line.strip())
+        except KeyboardInterrupt:
+            pass
+    print()
+
+def cmd_verify_ledger(args):
+    from src.core.ledger_integrity import verify_ledger
+    from src.core.ledger_segments import list_segments
+
+    segments = list_segments(LOG_DIR)
+    if not segments:
+        warn(f"No audit logs found in {LOG_DIR}/")
+        return
+    started = time.time()
+    try:
+        report = verify_ledger(LOG_DIR, segments, from_checkpoint=not args.full, workers=args.workers)
+    except Exception as e:
+        err(f"Verification failed to run: {e}")
+        return
+    elapsed = time.time() - started
+    scope = "full ledger" if args.full else "records after the latest signed checkpoint"
+    if report.ok:
+        ok(f"Ledger intact: {report.records:,} records verified ({scope}) in {elapsed:.1f}s")
+        if report.trusted_checkpoint:
+            info(f"Trusted checkpoint: {report.trusted_checkpoint['segment']} @ byte {report.trusted_checkpoint['offset']:,}")
+        if report.legacy_segments:
+            info(f"Skipped {report.legacy_segments} legacy segment(s) written before hash chaining")
+        if report.warning:
+            warn(report.warning)
+    else:
+        err(f"Ledger TAMPERED or corrupt: {report.error}")
+
+def cmd_replay(args):
+    from src.core.replay_engine import ReplayEngine
+
+    try:
+        since_ts = _parse_since(args.since) if args.since else None
+    except ValueError:
+        err(f"Invalid --since value: {args.since} (use ISO time or e.g. 30m, 12h, 7d)")
+        return
+    info(f"Replaying validate_action decisions from {LOG_DIR}/ against the current guards...")
+    try:
+        report = ReplayEngine(workers=args.workers, batch_size=args.batch_size, max_diffs=args.show).replay_ledger(LOG_DIR, since=since_ts)
+    except Exception as e:
+        err(f"Replay failed: {e}")
+        return
+    ok(f"Replayed {report.replayed:,} decisions in {report.elapsed_seconds:.1f}s ({report.events_per_second:,.0f}/s)")
+    if report.skipped:
+        warn(f"{report.skipped:,} decisions could not be re-derived (unknown agent scopes or risk level)")
+    if not report.changed:
+        ok("No decision would change under the current policy.")
+        return
+    err(f"{report.changed:,} decisions would change:")
+    for (before, after), count in report.transitions.most_common():
+        print(f"    {before:>16} → {after:<16} {count:,}")
+    print()
+    for diff in report.diffs:
+        a = diff.action
+        print(f"    {DIM}{a.timestamp}{RESET}  {a.agent_id}  {a.proposed_action} on {a.target_resource}: "
+              f"{a.historical_decision} → {RED}{diff.replayed_decision}{RESET} ({diff.reason})")
+    print()
+
+def cmd_export(args):
+    from src.core.ledger_export import export_ledger
+
+    events = [e.strip() for e in args.events.split(",") if e.strip()] if args.events else None
+    info(f"Exporting {LOG_DIR}/ to {CYAN}{args.out}{RESET}" + (f" (events: {', '.join(events)})" if events else ""))
+    try:
+        result = export_ledger(LOG_DIR, args.out, events)
+    except Exception as e:
+        err(f"Export failed: {e}")
+        return
+    if not result["segments"]:
+        ok("Export is up to date.")
+        return
+    ok(f"Exported {result['records']:,} records from {result['segments']} segment(s) in {result['seconds']:.1f}s")
+    info("Load with src.core.ledger_export.load_export() or numpy.load() per segment.")
 
 # ─── Demo Subsystem ───────────────────────────────────────────────────────────
 def _print_header(text):
@@ -474,12 +628,39 @@ def build_parser():
     p.add_argument("action_id")
     p.set_defaults(func=lambda a: cmd_resolve(a, "deny"))
 
+    p = sub.add_parser("import-docs")
+    p.add_argument("path")
+    p.add_argument("--format", choices=["jsonl", "csv"])
+    p.add_argument("--batch-size", type=int, default=5000)
+    p.set_defaults(func=cmd_import_docs)
+
     sub.add_parser("status").set_defaults(func=cmd_status)
 
     p = sub.add_parser("logs")
     p.add_argument("--tail", type=int, default=20)
+    p.add_argument("--agent")
+    p.add_argument("--event")
+    p.add_argument("--since")
+    p.add_argument("--follow", "-f", action="store_true")
     p.set_defaults(func=cmd_logs)
 
+    p = sub.add_parser("verify-ledger")
+    p.add_argument("--full", action="store_true")
+    p.add_argument("--workers", type=int, default=1)
+    p.set_defaults(func=cmd_verify_ledger)
+
+    p = sub.add_parser("replay")
+    p.add_argument("--since")
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--batch-size", type=int, default=2048)
+    p.add_argument("--show", type=int, default=20)
+    p.set_defaults(func=cmd_replay)
+
+    p = sub.add_parser("export")
+    p.add_argument("out")
+    p.add_argument("--events")
+    p.set_defaults(func=cmd_export)
+
     sub.add_parser("demo").set_defaults(func=cmd_demo)
 
     p = sub.add_parser("theme")
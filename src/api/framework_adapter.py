@@ -1,5 +1,5 @@
 import requests
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 class AVARAFrameworkAdapter:
     """
@@ -38,15 +38,18 @@ class AVARAFrameworkAdapter:
             print(f"AVARA INTERCEPT: Execution Blocked. Reason: {e.response.text}")
             return False
 
-    def get_safe_context(self, dynamic_query: str, system_prompt: str) -> Optional[str]:
+    def get_safe_context(self, dynamic_query: str, system_prompt: str, segments: Optional[List[Dict[str, Any]]] = None) -> Optional[str]:
         """
         Forces LLM input through the Context Governor to inject safety anchors
         and enforce token saturation limits.
+        Optional `segments` ({"kind", "text", "priority"}) are pruned by priority
+        to fit the budget instead of failing the whole request.
         """
         payload = {
             "agent_id": self.agent_id,
             "dynamic_query": dynamic_query,
-            "system_prompt": system_prompt
+            "system_prompt": system_prompt,
+            "segments": segments or []
         }
         
         try:
@@ -1,37 +1,65 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
 import time
 
 # Import AVARA guard systems
-from src.guards.tool_guard import ToolRegistry, ToolGuard, ToolRegistration, ToolPermission
+from src.guards.tool_guard import ToolRegistry, ToolGuard, ToolRegistration, permissions_from_scopes
 from src.guards.circuit_breaker import CircuitBreaker, AgentAction, ActionRiskLevel, CircuitBreakerStatus
 from src.core.audit_ledger import AuditLedger
 from src.core.iam_service import IAMService, AgentRole
 from src.guards.rag_firewall import RAGFirewall, DocumentProvenance
+from src.guards.provenance_registry import ProvenanceRegistry
 from src.guards.intent_validator import IntentValidator, AgentState, ValidationDecision
 from src.guards.multi_agent_monitor import MultiAgentMonitor, AgentMessage
-from src.guards.context_governor import ContextGovernor
+from src.guards.context_governor import ContextGovernor, ContextSegment, SessionEvictedError, UnknownSessionError
+from src.guards.tokenizer import load_tokenizer
 from src.guards.anomaly_detector import AnomalyDetector
-from src.db.persistent_store import PersistentStore
+from src.db.storage_backend import open_store
+from src.core.approval_sweeper import ApprovalSweeper, ApprovalWaiters
+from src.core.metrics import metrics
+from src.core.scan_pool import ScanOffloader
 import uuid
 
-# Persistent DB connection
-persistent_store = PersistentStore()
+# Local BPE vocabulary for the Context Governor (falls back to a heuristic estimate if absent)
+TOKENIZER_MERGES_PATH = "./tokenizer/merges.txt"
+TOKENIZER_VOCAB_PATH = "./tokenizer/vocab.json"
+
+# Storage engine from $AVARA_STORAGE_URL (memory:// or sqlite:///<path>), SQLite file by default
+persistent_store = open_store()
 
 # Import AVARA guard systems (using in-memory instances where DB not fully retrofitted yet)
 iam_service = IAMService()
-tool_registry = ToolRegistry()
+tool_registry = ToolRegistry(persistent_store)
 tool_guard = ToolGuard(tool_registry)
 circuit_breaker = CircuitBreaker()
 audit_ledger = AuditLedger(log_dir="./logs")
-rag_firewall = RAGFirewall()
+scan_offloader = ScanOffloader()
+rag_firewall = RAGFirewall(registry=ProvenanceRegistry(persistent_store), scan_offloader=scan_offloader)
 intent_validator = IntentValidator()
-multi_agent_monitor = MultiAgentMonitor()
-context_governor = ContextGovernor()
+# Spilled agent messages are kept for at most 64 x 64 MiB segments
+multi_agent_monitor = MultiAgentMonitor(spill_dir="./logs/agent_messages", high_risk_actions=circuit_breaker.high_risk_actions, max_spill_segments=64)
+context_governor = ContextGovernor(tokenizer=load_tokenizer(TOKENIZER_MERGES_PATH, TOKENIZER_VOCAB_PATH))
 anomaly_detector = AnomalyDetector()
+approval_waiters = ApprovalWaiters()
+approval_sweeper = ApprovalSweeper(persistent_store, approval_waiters, audit_ledger=audit_ledger)
+
+# Upper bound for a single long-poll on approval status
+MAX_APPROVAL_WAIT_SECONDS = 30.0
 
-app = FastAPI(title="AVARA Control Plane", description="Runtime Authority API for Autonomous Agents", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    approval_sweeper.start()
+    yield
+    approval_sweeper.stop(timeout=5)
+    scan_offloader.shutdown()
+    multi_agent_monitor.close()
+    audit_ledger.close()
+    persistent_store.close()
+
+app = FastAPI(title="AVARA Control Plane", description="Runtime Authority API for Autonomous Agents", version="0.1.0", lifespan=lifespan)
 
 # ----------------- Models -----------------
 
@@ -49,10 +77,45 @@ class ValidateActionRequest(BaseModel):
     action_args: Dict[str, Any]
     risk_level: str  # "LOW", "MEDIUM", "HIGH"
 
+class ContextSegmentModel(BaseModel):
+    kind: str  # "retrieved" | "history"
+    text: str
+    priority: float = 0.0
+    segment_id: Optional[str] = None
+
 class ContextPreparationRequest(BaseModel):
     agent_id: str
     dynamic_query: str
     system_prompt: str
+    segments: List[ContextSegmentModel] = []  # optional, pruned by priority to fit the budget
+
+class ContextSessionRequest(BaseModel):
+    agent_id: str
+    dynamic_query: str
+    system_prompt: Optional[str] = None  # only sent when it changes
+    append: List[ContextSegmentModel] = []
+    remove_ids: List[str] = []
+    reset: bool = False
+
+class RetrievalChunk(BaseModel):
+    doc_id: str
+    content: str
+
+class ValidateRetrievalsRequest(BaseModel):
+    agent_id: str
+    query: str
+    chunks: List[RetrievalChunk]  # retriever order (top-k)
+
+class AgentMessageModel(BaseModel):
+    sender_id: str
+    receiver_id: str
+    content: str
+    assumptions: List[str] = []
+    confidence_score: float
+    intended_action: Optional[str] = None
+
+class ValidateMessagesRequest(BaseModel):
+    messages: List[AgentMessageModel]  # e.g. one orchestrator tick, in send order
 
 # ----------------- Middlewares / Dependency -----------------
 def get_verified_agent(agent_id: str):
@@ -80,6 +143,7 @@ def provision_agent(request: ProvisionIdentityRequest):
 @app.delete("/iam/revoke/{agent_id}")
 def revoke_agent(agent_id: str):
     iam_service.revoke_identity(agent_id)
+    context_governor.end_session(agent_id)
     audit_ledger.log_event("IAM_REVOKE", agent_id, {})
     return {"status": "success", "message": f"Identity {agent_id} revoked."}
 
@@ -94,18 +158,21 @@ def validate_agent_action(request: ValidateActionRequest):
     anomaly_detector.log_execution(request.agent_id, request.proposed_action, request.target_resource)
     
     # 2. Intent Validation (Check for drift)
-    state = AgentState(request.task_intent, request.proposed_action, request.target_resource, request.action_args)
+    state = AgentState(request.task_intent, request.proposed_action, request.target_resource, request.action_args, agent_id=request.agent_id)
     intent_decision = intent_validator.validate_action(state)
     
     if intent_decision == ValidationDecision.BLOCK:
-        audit_ledger.log_event("INTENT_BLOCK", request.agent_id, request.model_dump())
+        audit_ledger.log_event("INTENT_BLOCK", request.agent_id, {**request.model_dump(), "agent_scopes": sorted(identity.scopes)})
         raise HTTPException(status_code=403, detail="Blocked: Severe semantic drift detected from assigned task intent.")
 
     # 3. Tool explicitly registered and permissions match?
-    # Simple mock check for tool execution if action is a tool call
-    if tool_registry.is_registered(request.proposed_action):
-        agent_perms = [ToolPermission(s.split(":")[0], s.split(":")[1] if ":" in s else "*", "") for s in identity.scopes]
-        if not tool_guard.validate_invocation(request.proposed_action, request.action_args, agent_perms):
+    # Simple mock check for tool execution if action is a tool call.
+    # One registry snapshot is used for the whole decision and its version is recorded.
+    registry_snapshot = tool_registry.snapshot()
+    if registry_snapshot.is_registered(request.proposed_action):
+        agent_perms = permissions_from_scopes(identity.scopes)
+        if not tool_guard.validate_invocation(request.proposed_action, request.action_args, agent_perms, snapshot=registry_snapshot):
+            audit_ledger.log_event("TOOL_BLOCK", request.agent_id, {**request.model_dump(), "tool_registry_version": registry_snapshot.version, "agent_scopes": sorted(identity.scopes)}, decision="DENY")
             raise HTTPException(status_code=403, detail="Blocked: Tool invocation failed permission or schema validation.")
 
     # 4. Excessive-Agency Circuit Breaker
@@ -113,11 +180,19 @@ def validate_agent_action(request: ValidateActionRequest):
     action = AgentAction(request.proposed_action, request.target_resource, request.action_args, risk_enum)
     
     breaker_status = circuit_breaker.evaluate_action(action)
-    if breaker_status == CircuitBreakerStatus.HALT_REQUIRE_APPROVAL:
+    # Questionable alignment (a mid-score drift rule) goes through the same human approval flow
+    if breaker_status == CircuitBreakerStatus.HALT_REQUIRE_APPROVAL or intent_decision == ValidationDecision.REQUIRE_APPROVAL:
+        if breaker_status == CircuitBreakerStatus.HALT_REQUIRE_APPROVAL:
+            halt_reason = "High-risk action halted by Circuit Breaker"
+        else:
+            halt_reason = "Questionable task alignment flagged by Intent Validator"
         action_id = str(uuid.uuid4())
         # Store pending approval in DB
         persistent_store.save_approval(action_id, request.agent_id, request.proposed_action, request.target_resource, request.action_args, "PENDING")
-        audit_ledger.log_approval_request(request.agent_id, request.proposed_action, request.target_resource, "PENDING")
+        audit_ledger.log_approval_request(
+            request.agent_id, request.proposed_action, request.target_resource, "PENDING",
+            action_id=action_id, request={**request.model_dump(), "tool_registry_version": registry_snapshot.version, "agent_scopes": sorted(identity.scopes)}
+        )
         
         # Simulate firing off an async webhook to a designated channel (Slack, Email, etc.)
         print(f"\n[WEBHOOK TRIGGERED] Action {action_id} requires human approval.")
@@ -127,49 +202,67 @@ def validate_agent_action(request: ValidateActionRequest):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
             detail={
-                "error": "Blocked: High-risk action halted by Circuit Breaker. Human approval required.",
+                "error": f"Blocked: {halt_reason}. Human approval required.",
                 "action_id": action_id,
                 "status": "PENDING_APPROVAL"
             }
         )
 
     # If all passes
-    audit_ledger.log_event("ACTION_ALLOW", request.agent_id, request.model_dump())
-    return {"status": "allowed"}
+    audit_ledger.log_event("ACTION_ALLOW", request.agent_id, {**request.model_dump(), "tool_registry_version": registry_snapshot.version, "agent_scopes": sorted(identity.scopes)})
+    return {"status": "allowed", "tool_registry_version": registry_snapshot.version}
 
 # ----------------- Routes: Webhook Approvals -----------------
-@app.post("/guard/approvals/{action_id}/approve")
-def approve_action(action_id: str):
-    """External webhook callback to approve a pending action."""
+def _resolve_approval(action_id: str, new_status: str) -> Dict[str, Any]:
+    """Shared approve/deny path: rejects missing, resolved and past-deadline approvals."""
     approval = persistent_store.get_approval(action_id)
     if not approval:
         raise HTTPException(status_code=404, detail="Approval request not found.")
-    if approval["status"] != "PENDING":
-        raise HTTPException(status_code=400, detail=f"Action is already {approval['status']}.")
-        
-    persistent_store.update_approval_status(action_id, "APPROVED")
+    if approval_sweeper.is_past_deadline(approval):
+        # The sweeper has not reached this row yet; expire it inline instead of honouring a stale decision
+        if persistent_store.resolve_pending_approval(action_id, "EXPIRED"):
+            metrics.increment("approvals.expired")
+            audit_ledger.log_event("APPROVAL_EXPIRED", approval["agent_id"], {"action_id": action_id}, decision="EXPIRED")
+        approval_waiters.notify(action_id)
+        raise HTTPException(status_code=400, detail="Action is already EXPIRED.")
+    if approval["status"] != "PENDING" or not persistent_store.resolve_pending_approval(action_id, new_status):
+        current = persistent_store.get_approval(action_id) or approval
+        raise HTTPException(status_code=400, detail=f"Action is already {current['status']}.")
+    approval_waiters.notify(action_id)
+    return approval
+
+@app.post("/guard/approvals/{action_id}/approve")
+def approve_action(action_id: str):
+    """External webhook callback to approve a pending action."""
+    approval = _resolve_approval(action_id, "APPROVED")
     audit_ledger.log_event("APPROVAL_GRANTED", approval["agent_id"], {"action_id": action_id})
     return {"status": "success", "message": f"Action {action_id} approved. Agent may proceed."}
 
 @app.post("/guard/approvals/{action_id}/deny")
 def deny_action(action_id: str):
     """External webhook callback to deny a pending action."""
-    approval = persistent_store.get_approval(action_id)
-    if not approval:
-        raise HTTPException(status_code=404, detail="Approval request not found.")
-    if approval["status"] != "PENDING":
-        raise HTTPException(status_code=400, detail=f"Action is already {approval['status']}.")
-        
-    persistent_store.update_approval_status(action_id, "DENIED")
+    approval = _resolve_approval(action_id, "DENIED")
     audit_ledger.log_event("APPROVAL_DENIED", approval["agent_id"], {"action_id": action_id})
     return {"status": "success", "message": f"Action {action_id} strictly denied."}
 
 @app.get("/guard/approvals/{action_id}/status")
-def check_approval_status(action_id: str):
-    """Agents can poll this endpoint to see if they were approved to proceed."""
-    approval = persistent_store.get_approval(action_id)
+async def check_approval_status(action_id: str, wait_seconds: float = 0.0):
+    """
+    Agents can poll this endpoint to see if they were approved to proceed.
+    With `wait_seconds` > 0 the request parks on the event loop (not a threadpool
+    worker) until the approval is resolved or the wait elapses. Store reads are
+    blocking, so each one runs in the threadpool rather than on the loop.
+    """
+    approval = await run_in_threadpool(persistent_store.get_approval, action_id)
     if not approval:
         raise HTTPException(status_code=404, detail="Approval request not found.")
+    if approval["status"] == "PENDING" and wait_seconds > 0:
+        await approval_waiters.wait(
+            action_id,
+            min(wait_seconds, MAX_APPROVAL_WAIT_SECONDS),
+            lambda: persistent_store.get_approval(action_id)["status"] != "PENDING"
+        )
+        approval = await run_in_threadpool(persistent_store.get_approval, action_id)
     return {"action_id": action_id, "status": approval["status"]}
 
 # ----------------- Routes: Context & RAG -----------------
@@ -178,18 +271,139 @@ def check_approval_status(action_id: str):
 def prepare_context(request: ContextPreparationRequest):
     """Enforces token budget and mandatory safety anchors for prompt generation."""
     get_verified_agent(request.agent_id)
-    context = context_governor.prepare_context(request.dynamic_query, request.system_prompt)
+    segments = [ContextSegment(s.kind, s.text, s.priority, s.segment_id if s.segment_id is not None else str(i)) for i, s in enumerate(request.segments)]
+    context = context_governor.prepare_context(request.dynamic_query, request.system_prompt, segments)
     
     if not context:
         audit_ledger.log_event("CONTEXT_SATURATION_BLOCK", request.agent_id, {"dynamic_query_length": len(request.dynamic_query)})
         raise HTTPException(status_code=413, detail="Blocked: Context saturation limits exceeded.")
+
+    if context.dropped_segments:
+        audit_ledger.log_event("CONTEXT_PRUNED", request.agent_id, {"dropped_segment_ids": [s.segment_id for s in context.dropped_segments]})
         
     return {
         "budget_used": context.tokens_used,
         "safety_anchors": context.safety_anchors,
-        "final_context_block": "\n".join(context.safety_anchors) + f"\n\n{request.system_prompt}\n\n{request.dynamic_query}"
+        "kept_segments": [{"segment_id": s.segment_id, "kind": s.kind, "tokens": s.tokens} for s in context.kept_segments],
+        "dropped_segments": [{"segment_id": s.segment_id, "kind": s.kind, "tokens": s.tokens} for s in context.dropped_segments],
+        "final_context_block": context.render()
     }
 
+@app.post("/guard/context_session")
+def update_context_session(request: ContextSessionRequest):
+    """
+    Session-aware Context Governor: clients send only turn deltas and the
+    budget is updated incrementally from per-agent running totals.
+    """
+    get_verified_agent(request.agent_id)
+    try:
+        session = context_governor.update_session(
+            request.agent_id,
+            system_prompt=request.system_prompt,
+            append=[ContextSegment(s.kind, s.text, s.priority, s.segment_id) for s in request.append],
+            remove_ids=request.remove_ids,
+            reset=request.reset
+        )
+        context = context_governor.prepare_session_context(request.agent_id, request.dynamic_query)
+    except SessionEvictedError as e:
+        # The client's deltas assume context the server no longer holds
+        raise HTTPException(status_code=409, detail=f"{e} (send reset=true with the full context)")
+    except UnknownSessionError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    if not context:
+        audit_ledger.log_event("CONTEXT_SATURATION_BLOCK", request.agent_id, {"dynamic_query_length": len(request.dynamic_query), "session": True})
+        raise HTTPException(status_code=413, detail="Blocked: Context saturation limits exceeded.")
+
+    if context.dropped_segments:
+        audit_ledger.log_event("CONTEXT_PRUNED", request.agent_id, {"dropped_segment_ids": [s.segment_id for s in context.dropped_segments], "session": True})
+
+    return {
+        "budget_used": context.tokens_used,
+        "session_segments": list(session.segments.keys()),
+        "kept_segments": [{"segment_id": s.segment_id, "kind": s.kind, "tokens": s.tokens} for s in context.kept_segments],
+        "dropped_segments": [{"segment_id": s.segment_id, "kind": s.kind, "tokens": s.tokens} for s in context.dropped_segments],
+        "final_context_block": context.render()
+    }
+
+@app.delete("/guard/context_session/{agent_id}")
+def end_context_session(agent_id: str):
+    context_governor.end_session(agent_id)
+    return {"status": "success", "message": f"Context session for {agent_id} closed."}
+
+@app.post("/guard/validate_retrievals")
+def validate_retrievals(request: ValidateRetrievalsRequest):
+    """RAG Provenance Firewall for a whole top-k retrieval in one round trip."""
+    identity = get_verified_agent(request.agent_id)
+    verdicts = rag_firewall.validate_retrievals(
+        request.query,
+        [(chunk.doc_id, chunk.content) for chunk in request.chunks],
+        identity.role.name
+    )
+
+    blocked = [v.doc_id for v in verdicts if not v.allowed]
+    audit_ledger.log_event(
+        "RAG_RETRIEVAL_VALIDATED", request.agent_id,
+        {"query": request.query, "chunks": len(verdicts), "blocked_doc_ids": blocked},
+        decision="PARTIAL" if blocked else "ALLOW"
+    )
+    return {
+        "query": request.query,
+        "safe_chunks": [
+            {"rank": v.rank, "doc_id": v.doc_id, "source_uri": v.context.provenance.source_uri, "content": v.context.text_content}
+            for v in verdicts if v.allowed
+        ],
+        "results": [{"rank": v.rank, "doc_id": v.doc_id, "allowed": v.allowed, "reason": v.reason} for v in verdicts],
+        "blocked_count": len(blocked)
+    }
+
+@app.post("/guard/validate_messages")
+def validate_messages(request: ValidateMessagesRequest):
+    """
+    Multi-Agent Safety Monitor for a batch of agent-to-agent messages.
+    IAM is checked once per distinct sender; messages from unverified senders
+    are blocked individually without failing the rest of the batch.
+    """
+    sender_errors: Dict[str, str] = {}
+    for sender_id in dict.fromkeys(m.sender_id for m in request.messages):
+        try:
+            get_verified_agent(sender_id)
+        except HTTPException as e:
+            sender_errors[sender_id] = f"Sender failed IAM verification: {e.detail}"
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(request.messages)
+    to_check: List[int] = []
+    for i, m in enumerate(request.messages):
+        if m.sender_id in sender_errors:
+            results[i] = {"index": i, "sender_id": m.sender_id, "receiver_id": m.receiver_id, "allowed": False, "reason": sender_errors[m.sender_id]}
+        else:
+            to_check.append(i)
+
+    verdicts = multi_agent_monitor.validate_messages([
+        AgentMessage(m.sender_id, m.receiver_id, m.content, m.assumptions, m.confidence_score, m.intended_action)
+        for m in (request.messages[i] for i in to_check)
+    ])
+    for i, verdict in zip(to_check, verdicts):
+        results[i] = {"index": i, "sender_id": verdict.sender_id, "receiver_id": verdict.receiver_id, "allowed": verdict.allowed, "reason": verdict.reason}
+
+    blocked = [r for r in results if not r["allowed"]]
+    for r in blocked:
+        audit_ledger.log_event("AGENT_MESSAGE_BLOCKED", r["sender_id"], {"receiver_id": r["receiver_id"], "reason": r["reason"]}, decision="DENY")
+    return {"results": results, "delivered_count": len(results) - len(blocked), "blocked_count": len(blocked)}
+
+@app.get("/metrics")
+def get_metrics():
+    """Snapshot of control-plane counters and gauges."""
+    metrics.set_gauge("approvals.parked_waiters", approval_waiters.parked_count())
+    metrics.set_gauge("intent.memo_hit_rate", intent_validator.memo_stats()["hit_rate"])
+    metrics.set_gauge("intent.memo_size", intent_validator.memo_stats()["size"])
+    metrics.set_gauge("rag.verdict_cache_hit_rate", rag_firewall.verdict_cache_stats()["hit_rate"])
+    metrics.set_gauge("context.sessions", context_governor.session_count())
+    metrics.set_gauge("context.held_chars", context_governor.held_chars())
+    metrics.set_gauge("tools.registry_version", tool_registry.version)
+    metrics.set_gauge("audit.queue_depth", audit_ledger.queue_depth())
+    return metrics.snapshot()
+
 @app.get("/health")
 def health_check():
     return {"status": "AVARA Central Authority is online."}
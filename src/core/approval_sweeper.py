@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from src.core.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+class _ParkedWaiter:
+    __slots__ = ("futures",)
+
+    def __init__(self):
+        self.futures: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+class ApprovalWaiters:
+    """
+    Parking lot for agents long-polling an approval decision.
+    - Waiters await a per-action future on the event loop instead of hammering the DB
+      or holding a threadpool worker for the whole wait
+    - Approve, deny and expiry (from any thread) wake every waiter for that action
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, _ParkedWaiter] = {}
+
+    async def wait(self, action_id: str, timeout: float, is_resolved: Callable[[], bool]) -> bool:
+        """
+        Park until `action_id` is notified or `timeout` elapses.
+        `is_resolved` is checked after parking so a concurrent notify is never missed;
+        it usually hits the store, so it runs in a worker thread, never on the loop.
+        Returns True if the approval was resolved.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = (loop, future)
+        with self._lock:
+            waiter = self._waiters.setdefault(action_id, _ParkedWaiter())
+            waiter.futures.append(entry)
+        try:
+            if await asyncio.to_thread(is_resolved):
+                return True
+            try:
+                await asyncio.wait_for(future, timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+        finally:
+            with self._lock:
+                if entry in waiter.futures:
+                    waiter.futures.remove(entry)
+                if not waiter.futures and self._waiters.get(action_id) is waiter:
+                    del self._waiters[action_id]
+
+    def notify(self, action_id: str):
+        """Wake everyone parked on `action_id`. Safe to call from any thread."""
+        with self._lock:
+            waiter = self._waiters.pop(action_id, None)
+            futures = list(waiter.futures) if waiter else []
+        for loop, future in futures:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                pass  # the waiter's loop has already shut down
+
+    def parked_count(self) -> int:
+        with self._lock:
+            return sum(len(w.futures) for w in self._waiters.values())
+
+class ApprovalSweeper:
+    """
+    Executes Approval Expiry rules:
+    - PENDING approvals past their deadline are expired in batches
+    - Resolved approvals are archived into the compact history table
+    - Parked waiters are woken so they observe the EXPIRED status
+    - Expiry and archive counts are recorded in metrics
+    """
+    def __init__(
+        self,
+        store,
+        waiters: ApprovalWaiters,
+        audit_ledger=None,
+        approval_ttl_seconds: float = 3600,
+        retention_seconds: float = 86400,
+        interval_seconds: float = 60,
+        batch_size: int = 500,
+        metrics_registry: MetricsRegistry = metrics
+    ):
+        self.store = store
+        self.waiters = waiters
+        self.audit_ledger = audit_ledger
+        self.approval_ttl_seconds = approval_ttl_seconds
+        self.retention_seconds = retention_seconds
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.metrics = metrics_registry
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_past_deadline(self, approval: Dict[str, Any]) -> bool:
+        """True if a PENDING approval should no longer be resolvable."""
+        return approval["status"] == "PENDING" and time.time() - approval["timestamp"] > self.approval_ttl_seconds
+
+    def sweep_once(self) -> Dict[str, int]:
+        """Run one full expiry + archive pass. Each loop iteration touches at most `batch_size` rows."""
+        now = time.time()
+        expired = 0
+        while True:
+            batch = self.store.expire_pending_approvals(now - self.approval_ttl_seconds, self.batch_size)
+            for row in batch:
+                self.waiters.notify(row["action_id"])
+                if self.audit_ledger:
+                    self.audit_ledger.log_event("APPROVAL_EXPIRED", row["agent_id"], {"action_id": row["action_id"]}, decision="EXPIRED")
+            expired += len(batch)
+            if len(batch) < self.batch_size:
+                break
+
+        archived = 0
+        while True:
+            count = self.store.archive_resolved_approvals(now - self.retention_seconds, self.batch_size)
+            archived += count
+            if count < self.batch_size:
+                break
+
+        self.metrics.increment("approvals.expired", expired)
+        self.metrics.increment("approvals.archived", archived)
+        self.metrics.increment("approvals.sweeps")
+        if expired or archived:
+            logger.info("Approval sweep expired %d pending and archived %d resolved approvals", expired, archived)
+        return {"expired": expired, "archived": archived}
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.sweep_once()
+            except Exception as e:
+                self.metrics.increment("approvals.sweep_errors")
+                logger.exception("Approval sweep failed: %s", e)
+
+    def start(self):
+        """Start the background sweeper thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="avara-approval-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
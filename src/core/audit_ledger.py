@@ -1,73 +1,452 @@
 import json
-import logging
+import os
+import queue
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional
+
+from src.core.ledger_integrity import (
+    CHECKPOINT_FILE, GENESIS_HASH, LedgerReport, chain_line, is_legacy_segment, last_record_hash,
+    load_ledger_key, merkle_root, read_checkpoints, sign_checkpoint, split_line, verify_ledger
+)
+from src.core.ledger_index import SegmentIndex, index_path, load_or_build_index, query_ledger
+from src.core.ledger_segments import PLAIN_EXT, compress_segment, list_segments, logical_size, segment_stem
+from src.core.metrics import MetricsRegistry, metrics
+
+# Durability modes for the background writer
+DURABILITY_BATCH = "batch"        # fsync after every written batch
+DURABILITY_INTERVAL = "interval"  # fsync at most every fsync_interval_seconds
+DURABILITY_NONE = "none"          # leave it to the OS page cache
+
+# Backpressure policies when the queue is full
+BACKPRESSURE_BLOCK = "block"      # request thread waits for room (no event is ever lost)
+BACKPRESSURE_DROP = "drop"        # event is dropped and counted in audit.dropped
+
+class _FlushMarker:
+    """Queued behind pending records; set once everything before it is on disk."""
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+_STOP = object()
+
+# Bytes a chained line (plus newline) adds on top of its asctime and entry JSON
+_CHAIN_OVERHEAD = len(chain_line("", "{}", GENESIS_HASH)[0]) + 1 - len("{}")
+
+def format_asctime(ts: float) -> str:
+    """Same layout as logging's default %(asctime)s, e.g. '2026-10-18 12:00:00,123'."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) + ",%03d" % (int(ts * 1000) % 1000)
 
 class AuditLedger:
     """
     Executes Audit & Forensics Ledger rules:
     - Logs Prompts, Retrieved documents, Tool calls, Decisions, Approvals, Timing
-    - Immutable (conceptually, in code it writes append-only to a file/store)
+    - Immutable: every record is hash-chained to the previous one, with HMAC-signed
+      Merkle checkpoints so verification can start from the latest trusted checkpoint
     - Replayable
     - Human-readable
+    - Group commit: requests only enqueue; a writer thread writes and fsyncs in batches
+    - Size-bounded segments with sidecar indexes (agent, event type, sparse time) for forensic queries
+    - Segments rotate on size, on age and at midnight; sealed ones are block-compressed in the background
     """
-    def __init__(self, log_dir: str = "/tmp/avara_audit"):
+    def __init__(
+        self,
+        log_dir: str = "/tmp/avara_audit",
+        async_mode: bool = True,
+        durability: str = DURABILITY_BATCH,
+        fsync_interval_seconds: float = 1.0,
+        queue_size: int = 65536,
+        max_batch: int = 4096,
+        backpressure: str = BACKPRESSURE_BLOCK,
+        checkpoint_every: int = 10000,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        time_index_every: int = 256,
+        rotate_interval_seconds: Optional[float] = None,
+        compress_sealed: bool = True,
+        compression_block_bytes: int = 256 * 1024,
+        metrics_registry: MetricsRegistry = metrics
+    ):
         self.log_dir = log_dir
-        # Ensure dir exists safely
-        import os
         os.makedirs(self.log_dir, exist_ok=True)
-        
-        # Setting up basic logging to simulate immutable append-only ledger
-        self.logger = logging.getLogger("AVARA_Ledger")
-        self.logger.setLevel(logging.INFO)
-        fh = logging.FileHandler(f"{self.log_dir}/audit_{datetime.now().strftime('%Y%m%d')}.log")
-        fh.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-        if not self.logger.handlers:
-            self.logger.addHandler(fh)
+        self.async_mode = async_mode
+        self.durability = durability
+        self.fsync_interval_seconds = fsync_interval_seconds
+        self.max_batch = max_batch
+        self.backpressure = backpressure
+        self.metrics = metrics_registry
+
+        self.segment_max_bytes = segment_max_bytes
+        self.time_index_every = time_index_every
+        self.rotate_interval_seconds = rotate_interval_seconds
+        self._open_active_segment()
+
+        # Hash chain state, continued from the newest existing segment
+        self.checkpoint_every = checkpoint_every
+        self._key = load_ledger_key(self.log_dir)
+        self._last_hash = GENESIS_HASH
+        for segment in reversed(self.segments()):
+            if logical_size(segment):
+                self._last_hash = last_record_hash(segment) or GENESIS_HASH
+                break
+        self._block_hashes: List[str] = []
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+        self._write_lock = threading.Lock()
+        self._closed = False
+        if self._last_hash == GENESIS_HASH and not read_checkpoints(self.log_dir):
+            # A new chain starts with a signed anchor, so a ledger whose checkpoints
+            # were deleted can never pass as one that has not written any yet
+            self._write_checkpoints([self._seal_block()])
+
+        # Sealed segments are compressed off the write path; any this ledger sealed but
+        # left plain (crash, or close before compression finished) are queued too.
+        # Legacy pre-chain logs are not ours to rewrite and stay as they are
+        self.compression_block_bytes = compression_block_bytes
+        self._compress_queue: "queue.Queue" = queue.Queue()
+        self._compressor: Optional[threading.Thread] = None
+        if compress_sealed:
+            self._compressor = threading.Thread(target=self._run_compressor, name="audit-ledger-compressor", daemon=True)
+            self._compressor.start()
+            for segment in self.segments():
+                if segment.endswith(PLAIN_EXT) and segment != self.path and not is_legacy_segment(segment):
+                    self._compress_queue.put(segment)
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        if async_mode:
+            self._writer = threading.Thread(target=self._run, name="audit-ledger-writer", daemon=True)
+            self._writer.start()
 
+    # --- Request side ---
     def log_event(self, event_type: str, agent_id: str, context: Dict[str, Any], decision: Optional[str] = None):
-        """Standard immutable log entry."""
+        """
+        Standard immutable log entry. The entry is serialized here, on the caller's
+        thread, so one bad record can never cost the writer a batch of other callers'
+        events: values JSON cannot represent are recorded as their str(), and anything
+        still unserializable (e.g. a circular reference) raises to this caller.
+        """
+        now = time.time()
         entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.fromtimestamp(now).isoformat(),
             "event_type": event_type,
             "agent_id": agent_id,
             "decision": decision,
             "context": context
         }
-        
-        # Append to log
-        log_json = json.dumps(entry)
-        self.logger.info(log_json)
-        
-        # For our MVP output visibility
-        print(f"AUDIT LOGGED -> {event_type} (Decision: {decision})")
+        record = (now, agent_id, event_type, json.dumps(entry, default=self._json_fallback))
+        if not self.async_mode:
+            self._write_batch([record])
+            return
+        if self.backpressure == BACKPRESSURE_DROP:
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                self.metrics.increment("audit.dropped")
+        else:
+            if self._queue.full():
+                self.metrics.increment("audit.backpressure_waits")
+            self._queue.put(record)
+
+    def _json_fallback(self, value: Any) -> str:
+        self.metrics.increment("audit.unserializable_values")
+        return str(value)
 
     def log_tool_execution(self, agent_id: str, tool_name: str, args: dict, result: Any):
         """Log explicit tool invocation and output."""
         self.log_event("TOOL_CALL", agent_id, context={"tool": tool_name, "args": args, "result": str(result)})
 
-    def log_approval_request(self, agent_id: str, action: str, target: str, outcome: str):
-        """Log manual approvals and circuit breakers."""
-        self.log_event("APPROVAL_REQUEST", agent_id, context={"action": action, "target": target}, decision=outcome)
+    def log_approval_request(self, agent_id: str, action: str, target: str, outcome: str, action_id: Optional[str] = None, request: Optional[Dict[str, Any]] = None):
+        """Log manual approvals and circuit breakers. `request` (the halted validate_action input) makes the decision replayable."""
+        context: Dict[str, Any] = {"action": action, "target": target}
+        if action_id is not None:
+            context["action_id"] = action_id
+        if request is not None:
+            context["request"] = request
+        self.log_event("APPROVAL_REQUEST", agent_id, context=context, decision=outcome)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every event logged before this call is written (and fsynced per durability mode)."""
+        if not self.async_mode or self._writer is None or not self._writer.is_alive():
+            with self._write_lock:
+                if not self._file.closed:
+                    self._file.flush()
+                    self._sync(force=self.durability != DURABILITY_NONE)
+            return True
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Drain the queue, fsync and stop the writer. Safe to call twice."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+        with self._write_lock:
+            if not self._file.closed:
+                self._file.flush()
+                if self.durability != DURABILITY_NONE:
+                    os.fsync(self._file.fileno())
+                if self._block_hashes:
+                    self._write_checkpoints([self._seal_block()])
+                self._index.save(index_path(self.path))
+                self._file.close()
+        if self._compressor is not None and self._compressor.is_alive():
+            self._compress_queue.put(_STOP)
+            self._compressor.join(timeout)
+
+    # --- Writer side ---
+    def _run(self):
+        timeout = self.fsync_interval_seconds if self.durability == DURABILITY_INTERVAL else None
+        while True:
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                with self._write_lock:
+                    self._sync()
+                continue
+
+            batch: List[tuple] = []
+            markers: List[_FlushMarker] = []
+            stop = False
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, _FlushMarker):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            try:
+                if batch:
+                    self._write_batch(batch)
+                if markers:
+                    with self._write_lock:
+                        self._sync(force=self.durability != DURABILITY_NONE)
+            except Exception as e:
+                # Records arrive serialized (see log_event), so only I/O fails here; the
+                # ledger must outlive a full disk, and the error is counted and reported
+                self.metrics.increment("audit.write_errors")
+                print(f"AUDIT LEDGER: Write failed - {e}")
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                return
+
+    def _write_batch(self, batch: List[tuple]):
+        """Write (ts, agent_id, event_type, entry_json) records serialized by log_event."""
+        encoded = [(ts, agent_id, event_type, format_asctime(ts), entry_json) for ts, agent_id, event_type, entry_json in batch]
+        with self._write_lock:
+            run: List[tuple] = []
+            run_bytes = 0
+            for record in encoded:
+                size = len(record[3]) + len(record[4]) + _CHAIN_OVERHEAD
+                # A batch straddling midnight (or the rotation interval) is split at the
+                # boundary, and one that would overflow the segment at the last record that fits
+                if self._overflows(run_bytes + size, bool(run)) or self._rotation_due(record[0], record[3], run[0] if run else None):
+                    if run:
+                        self._append(run)
+                        run, run_bytes = [], 0
+                    # _append may already have rotated on size
+                    if self._overflows(size) or self._rotation_due(record[0], record[3]):
+                        self._rotate()
+                run.append(record)
+                run_bytes += size
+            if run:
+                self._append(run)
+        self.metrics.increment("audit.events_written", len(batch))
+        self.metrics.increment("audit.batches_written")
+
+    def _append(self, encoded: List[tuple]):
+        """Chain, write and index records in the active segment. Caller holds _write_lock."""
+        # Chaining happens under the lock so records hash in file order;
+        # state is rolled back if the write fails so the chain never skips a record
+        saved = (self._last_hash, self._offset, self._block_start, list(self._block_hashes))
+        lines: List[str] = []
+        index_rows: List[tuple] = []
+        checkpoints: List[Dict[str, Any]] = []
+        for ts, agent_id, event_type, asctime, entry_json in encoded:
+            line, record_hash = chain_line(asctime, entry_json, self._last_hash)
+            lines.append(line)
+            self._last_hash = record_hash
+            start = self._offset
+            self._offset += len(line) + 1  # json.dumps output is ASCII
+            index_rows.append((start, self._offset, ts, agent_id, event_type))
+            self._block_hashes.append(record_hash)
+            if len(self._block_hashes) >= self.checkpoint_every:
+                checkpoints.append(self._seal_block())
+        try:
+            self._file.write(("\n".join(lines) + "\n").encode("utf-8"))
+            self._file.flush()
+        except Exception:
+            self._last_hash, self._offset, self._block_start, self._block_hashes = saved
+            raise
+        self._dirty = True
+        self._sync()
+        for row in index_rows:
+            self._index.add(*row)
+        if checkpoints:
+            self._write_checkpoints(checkpoints)
+        if self._offset >= self.segment_max_bytes:
+            self._rotate()
+
+    def _sync(self, force: bool = False):
+        """fsync according to the durability mode. Caller holds _write_lock."""
+        if not self._dirty or self._file.closed:
+            return
+        if force or self.durability == DURABILITY_BATCH or (
+            self.durability == DURABILITY_INTERVAL and time.monotonic() - self._last_fsync >= self.fsync_interval_seconds
+        ):
+            os.fsync(self._file.fileno())
+            self._last_fsync = time.monotonic()
+            self._dirty = False
 
-    def read_logs_for_replay(self) -> list:
+    # --- Segments ---
+    def _open_active_segment(self, resume: bool = True):
         """
-        Retrieves logs to fulfill the 'Logs must be replayable' requirement.
-        Just a mock implementation for MVP.
+        Resume today's newest segment if it is still plain and has room (on startup),
+        otherwise start the next one. After a rotation nothing is resumed: the sealed
+        segment may already be queued for compression.
         """
-        logs = []
-        try:
-           import glob
-           import os
-           list_of_files = glob.glob(f'{self.log_dir}/*.log')
-           if list_of_files:
-               latest_file = max(list_of_files, key=os.path.getctime)
-               with open(latest_file, 'r') as f:
-                   for line in f:
-                       # split to ignore the logging timestamp prefix for JSON parsing
-                       if " - " in line:
-                           json_str = line.split(" - ", 1)[1]
-                           logs.append(json.loads(json_str))
-        except Exception as e:
-            print(f"Error reading logs: {e}")
-        return logs
+        now = datetime.now()
+        day = now.strftime('%Y%m%d')
+        existing = [s for s in list_segments(self.log_dir) if segment_stem(s).startswith(f"audit_{day}_")]
+        if resume and existing and existing[-1].endswith(PLAIN_EXT) and os.path.getsize(existing[-1]) < self.segment_max_bytes:
+            self.path = existing[-1]
+            self._index = load_or_build_index(self.path, self.time_index_every)
+        else:
+            number = int(segment_stem(existing[-1])[len(f"audit_{day}_"):]) + 1 if existing else 1
+            self.path = f"{self.log_dir}/audit_{day}_{number:04d}{PLAIN_EXT}"
+            self._index = SegmentIndex(os.path.basename(self.path), self.time_index_every)
+        self._file = open(self.path, "ab")
+        self._offset = self._file.tell()
+        self._block_start = self._offset
+        self._segment_day = now.strftime('%Y-%m-%d')
+
+    def _overflows(self, pending_bytes: int, pending: bool = False) -> bool:
+        """
+        True if `pending_bytes` more would push the active segment past segment_max_bytes.
+        An empty segment always takes its first record, however large. Caller holds _write_lock.
+        """
+        return (self._offset > 0 or pending) and self._offset + pending_bytes > self.segment_max_bytes
+
+    def _rotation_due(self, ts: float, asctime: str, pending: Optional[tuple] = None) -> bool:
+        """
+        True if a record stamped `ts` must start a new segment, given `pending`
+        (the first record not yet written to this one). Caller holds _write_lock.
+        """
+        if self._offset == 0 and pending is None:
+            return False
+        # asctime starts with the local date; a late record from the previous day stays put
+        if asctime[:10] > self._segment_day:
+            return True
+        if self.rotate_interval_seconds is None:
+            return False
+        started = self._index.first_ts if self._index.first_ts is not None else pending[0]
+        return ts - started >= self.rotate_interval_seconds
+
+    def _rotate(self):
+        """Seal the active segment (checkpoint + sidecar index), open the next and queue the old one for compression. Caller holds _write_lock."""
+        if self._block_hashes:
+            self._write_checkpoints([self._seal_block()])
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._dirty = False
+        self._index.save(index_path(self.path))
+        sealed = self.path
+        self._open_active_segment(resume=False)
+        if self._compressor is not None:
+            self._compress_queue.put(sealed)
+        self.metrics.increment("audit.segments_rotated")
+
+    def _run_compressor(self):
+        while True:
+            path = self._compress_queue.get()
+            if path is _STOP:
+                return
+            try:
+                if os.path.exists(path):
+                    compress_segment(path, self.compression_block_bytes)
+                    self.metrics.increment("audit.segments_compressed")
+            except Exception as e:
+                # The plain segment is left intact and is retried on the next start
+                self.metrics.increment("audit.compression_errors")
+                print(f"AUDIT LEDGER: Compression of {os.path.basename(path)} failed - {e}")
+
+    def query(
+        self,
+        agent_id: Optional[str] = None,
+        event_type: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None
+    ):
+        """
+        Forensic query (epoch-second bounds), oldest first. Sealed segments use
+        their sidecar index and the active segment its in-memory one, so matching
+        records are read by seeking.
+        """
+        self.flush()
+        return query_ledger(self.log_dir, agent_id, event_type, since, until, limit, {os.path.basename(self.path): self._index})
+
+    # --- Integrity ---
+    def _seal_block(self) -> Dict[str, Any]:
+        """Signed checkpoint over the records written since the last one. Caller holds _write_lock."""
+        checkpoint = sign_checkpoint({
+            "segment": os.path.basename(self.path),
+            "block_start_offset": self._block_start,
+            "offset": self._offset,
+            "records": len(self._block_hashes),
+            "last_hash": self._last_hash,
+            "merkle_root": merkle_root(self._block_hashes),
+            "created_at": datetime.now().isoformat()
+        }, self._key)
+        self._block_start = self._offset
+        self._block_hashes = []
+        return checkpoint
+
+    def _write_checkpoints(self, checkpoints: List[Dict[str, Any]]):
+        with open(os.path.join(self.log_dir, CHECKPOINT_FILE), "a", encoding="utf-8") as f:
+            for checkpoint in checkpoints:
+                f.write(json.dumps(checkpoint) + "\n")
+            f.flush()
+            if self.durability != DURABILITY_NONE:
+                os.fsync(f.fileno())
+        self.metrics.increment("audit.checkpoints_written", len(checkpoints))
+
+    def segments(self) -> List[str]:
+        """Ledger segment files, oldest first."""
+        return list_segments(self.log_dir)
+
+    def verify(self, from_checkpoint: bool = True, workers: int = 1) -> LedgerReport:
+        """
+        Verify the hash chain. By default only records after the newest signed
+        checkpoint are re-hashed; from_checkpoint=False re-hashes everything and
+        re-derives every checkpoint's Merkle root. Segments written before
+        chaining was enabled are skipped.
+        """
+        self.flush()
+        return verify_ledger(self.log_dir, self.segments(), self._key, from_checkpoint, workers)
+
+    # --- Reading ---
+    def read_logs_for_replay(self, since: Optional[float] = None, until: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streams every ledger record (all segments, plain or compressed), oldest
+        first, to fulfill the 'Logs must be replayable' requirement. Decision
+        re-evaluation is done by src.core.replay_engine.
+        """
+        return self.query(since=since, until=until)
@@ -0,0 +1,165 @@
+import json
+import os
+import re
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.core.ledger_segments import SegmentReader, list_segments, logical_size, segment_stem
+
+MANIFEST_FILE = "manifest.json"
+COLUMNS = ("ts", "agent", "event", "decision")
+_DTYPES = {"ts": "q", "agent": "i", "event": "i", "decision": "i"}
+
+# Records are serialized with a fixed key order, so the exported fields are read
+# from the head of each line (chained or legacy) by one regex pass over a whole
+# chunk, without decoding the (much larger) context object
+_HEAD = re.compile(
+    rb'^[^\n]*? - \{(?:"prev_hash": "[0-9a-f]{64}", )?"timestamp": "([^"]+)", "event_type": "((?:[^"\\\n]|\\.)*)", '
+    rb'"agent_id": "((?:[^"\\\n]|\\.)*)", "decision": (null|"(?:[^"\\\n]|\\.)*")[^\n]*\n',
+    re.M
+)
+
+class _Dictionary:
+    """Append-only string dictionary; codes stay stable across segments and runs."""
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = list(values)
+        self.codes: Dict[str, int] = {v: i for i, v in enumerate(self.values)}
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+class _Clock:
+    """ISO local timestamp -> epoch microseconds, converting each distinct second once."""
+    def __init__(self):
+        self._seconds: Dict[str, int] = {}
+
+    def micros(self, iso: str) -> int:
+        head, _, frac = iso.partition(".")
+        base = self._seconds.get(head)
+        if base is None:
+            base = self._seconds[head] = int(time.mktime(datetime.fromisoformat(head).timetuple())) * 1_000_000
+        return base + (int(frac.ljust(6, "0")[:6]) if frac else 0)
+
+def _text(value: bytes) -> str:
+    return json.loads(b'"' + value + b'"') if b"\\" in value else value.decode("utf-8")
+
+def _load_manifest(out_dir: str) -> Dict[str, Any]:
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"event_types": None, "dictionaries": {"agent": [], "event": [], "decision": []}, "segments": {}}
+
+def _save_manifest(out_dir: str, manifest: Dict[str, Any]):
+    tmp = os.path.join(out_dir, MANIFEST_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST_FILE))
+
+def _segment_columns(out_dir: str, stem: str) -> Dict[str, np.ndarray]:
+    return {c: np.load(os.path.join(out_dir, stem, f"{c}.npy")) for c in COLUMNS}
+
+def export_ledger(log_dir: str, out_dir: str, event_types: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Export ledger segments to per-segment NumPy column files:
+      <out_dir>/<segment>/ts.npy        int64 epoch microseconds
+      <out_dir>/<segment>/agent.npy     int32 codes into manifest dictionaries["agent"]
+      <out_dir>/<segment>/event.npy     int32 codes into dictionaries["event"]
+      <out_dir>/<segment>/decision.npy  int32 codes into dictionaries["decision"] (-1 = none)
+    Incremental: segments already exported are skipped, and a growing active
+    segment is extended from the byte offset its last export covered. Changing
+    `event_types` (None = every event) re-exports everything.
+    Returns {"segments": exported, "records": new records, "seconds": elapsed}.
+    """
+    started = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    wanted = sorted(event_types) if event_types else None
+    manifest = _load_manifest(out_dir)
+    if manifest["event_types"] != wanted:
+        manifest = {"event_types": wanted, "dictionaries": {"agent": [], "event": [], "decision": []}, "segments": {}}
+    wanted_set = set(wanted) if wanted else None
+    dictionaries = {name: _Dictionary(values) for name, values in manifest["dictionaries"].items()}
+    clock = _Clock()
+    exported, new_records = 0, 0
+
+    for segment in list_segments(log_dir):
+        stem = segment_stem(segment)
+        size = logical_size(segment)
+        entry = manifest["segments"].get(stem)
+        if entry is not None and entry["bytes"] >= size:
+            continue
+
+        columns = {c: array(_DTYPES[c]) for c in COLUMNS}
+        covered = 0
+        if entry is not None:
+            covered = entry["bytes"]
+            # Column files can be ahead of the manifest if an export died before publishing it
+            for name, values in _segment_columns(out_dir, stem).items():
+                columns[name].frombytes(values[:entry["records"]].astype(columns[name].typecode).tobytes())
+        before = len(columns["ts"])
+        ts_col, agent_col, event_col, decision_col = columns["ts"], columns["agent"], columns["event"], columns["decision"]
+        agents, events, decisions = dictionaries["agent"], dictionaries["event"], dictionaries["decision"]
+        # Decoded strings are memoized by raw bytes; real ledgers repeat a small set of agents and events
+        agent_codes: Dict[bytes, int] = {}
+        event_codes: Dict[bytes, int] = {}
+        with SegmentReader(segment) as reader:
+            for offset, data in reader.iter_chunks(covered):
+                covered = offset + len(data)
+                for match in _HEAD.finditer(data):
+                    ts, event, agent, decision = match.groups()
+                    code = event_codes.get(event)
+                    if code is None:
+                        name = _text(event)
+                        code = event_codes[event] = events.encode(name) if wanted_set is None or name in wanted_set else -1
+                    if code < 0:
+                        continue
+                    event_col.append(code)
+                    ts_col.append(clock.micros(ts.decode("ascii")))
+                    a = agent_codes.get(agent)
+                    if a is None:
+                        a = agent_codes[agent] = agents.encode(_text(agent))
+                    agent_col.append(a)
+                    decision_col.append(-1 if decision == b"null" else decisions.encode(_text(decision[1:-1])))
+
+        segment_dir = os.path.join(out_dir, stem)
+        os.makedirs(segment_dir, exist_ok=True)
+        for name, values in columns.items():
+            tmp = os.path.join(segment_dir, f"{name}.tmp.npy")
+            np.save(tmp, np.frombuffer(values, dtype=np.int64 if name == "ts" else np.int32))
+            os.replace(tmp, os.path.join(segment_dir, f"{name}.npy"))
+        manifest["segments"][stem] = {"bytes": covered, "records": len(columns["ts"])}
+        # Dictionaries grow before the manifest that references them is published
+        manifest["dictionaries"] = {name: d.values for name, d in dictionaries.items()}
+        _save_manifest(out_dir, manifest)
+        exported += 1
+        new_records += len(columns["ts"]) - before
+
+    return {"segments": exported, "records": new_records, "seconds": time.perf_counter() - started}
+
+def load_export(out_dir: str, mmap: bool = True) -> Dict[str, Any]:
+    """
+    Concatenated columns of every exported segment plus the dictionaries to
+    decode them, e.g. counting INTENT_BLOCKs per agent:
+        data = load_export(path)
+        codes = data["agent"][data["event"] == data["dictionaries"]["event"].index("INTENT_BLOCK")]
+        counts = np.bincount(codes, minlength=len(data["dictionaries"]["agent"]))
+    With mmap=True each segment file is memory-mapped before concatenation.
+    """
+    manifest = _load_manifest(out_dir)
+    stems = sorted(manifest["segments"])
+    data: Dict[str, Any] = {"dictionaries": manifest["dictionaries"], "segments": stems}
+    for name in COLUMNS:
+        parts = [
+            np.load(os.path.join(out_dir, stem, f"{name}.npy"), mmap_mode="r" if mmap else None)[:manifest["segments"][stem]["records"]]
+            for stem in stems
+        ]
+        data[name] = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64 if name == "ts" else np.int32)
+    return data
@@ -0,0 +1,220 @@
+import bisect
+import json
+import os
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.core.ledger_segments import SegmentReader, iter_lines, list_segments, logical_size
+
+INDEX_SUFFIX = ".idx"
+
+def parse_record(line: str) -> Optional[Dict[str, Any]]:
+    """Decode one "<asctime> - {json}" ledger line; None for blank or foreign lines."""
+    if " - " not in line:
+        return None
+    try:
+        return json.loads(line.split(" - ", 1)[1])
+    except ValueError:
+        return None
+
+def record_epoch(record: Dict[str, Any]) -> float:
+    return datetime.fromisoformat(record["timestamp"]).timestamp()
+
+class SegmentIndex:
+    """
+    Sidecar index for one ledger segment:
+    - agent_id -> record offsets and event_type -> record offsets
+    - sparse (epoch, offset) time index, one entry every `time_every` records
+    - `bytes`: how much of the segment the index covers (anything past it is scanned)
+    """
+    def __init__(self, segment: str, time_every: int = 256):
+        self.segment = segment
+        self.time_every = time_every
+        self.records = 0
+        self.bytes = 0
+        self.first_ts: Optional[float] = None
+        self.last_ts: Optional[float] = None
+        self.agents: Dict[str, array] = {}
+        self.events: Dict[str, array] = {}
+        self.time_ts = array("d")
+        self.time_offsets = array("q")
+
+    def add(self, offset: int, end_offset: int, epoch: float, agent_id: str, event_type: str):
+        if self.records % self.time_every == 0:
+            self.time_ts.append(epoch)
+            self.time_offsets.append(offset)
+        self.agents.setdefault(agent_id, array("q")).append(offset)
+        self.events.setdefault(event_type, array("q")).append(offset)
+        if self.first_ts is None:
+            self.first_ts = epoch
+        self.last_ts = epoch
+        self.records += 1
+        self.bytes = end_offset
+
+    # --- Lookup ---
+    def start_offset(self, since: Optional[float]) -> int:
+        """Offset no later than the first record at or after `since`."""
+        if since is None or not self.time_ts:
+            return 0
+        i = bisect.bisect_left(self.time_ts, since) - 1
+        return self.time_offsets[i] if i >= 0 else 0
+
+    def may_contain(self, agent_id: Optional[str], event_type: Optional[str], since: Optional[float], until: Optional[float]) -> bool:
+        if agent_id is not None and agent_id not in self.agents:
+            return False
+        if event_type is not None and event_type not in self.events:
+            return False
+        if self.records and since is not None and self.last_ts < since:
+            return False
+        if self.records and until is not None and self.first_ts > until:
+            return False
+        return True
+
+    def candidate_offsets(self, agent_id: Optional[str], event_type: Optional[str], since: Optional[float]) -> Optional[List[int]]:
+        """Sorted offsets that match the key filters, or None if every record from start_offset is a candidate."""
+        lists = []
+        if agent_id is not None:
+            lists.append(self.agents.get(agent_id, array("q")))
+        if event_type is not None:
+            lists.append(self.events.get(event_type, array("q")))
+        if not lists:
+            return None
+        lists.sort(key=len)
+        offsets = lists[0]
+        for other in lists[1:]:
+            keep = set(other)
+            offsets = [o for o in offsets if o in keep]
+        start = self.start_offset(since)
+        return [o for o in offsets if o >= start]
+
+    # --- Persistence ---
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "segment": self.segment,
+            "time_every": self.time_every,
+            "records": self.records,
+            "bytes": self.bytes,
+            "first_ts": self.first_ts,
+            "last_ts": self.last_ts,
+            "agents": {k: v.tolist() for k, v in self.agents.items()},
+            "events": {k: v.tolist() for k, v in self.events.items()},
+            "time": [self.time_ts.tolist(), self.time_offsets.tolist()]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SegmentIndex":
+        index = cls(data["segment"], data.get("time_every", 256))
+        index.records, index.bytes = data["records"], data["bytes"]
+        index.first_ts, index.last_ts = data["first_ts"], data["last_ts"]
+        index.agents = {k: array("q", v) for k, v in data["agents"].items()}
+        index.events = {k: array("q", v) for k, v in data["events"].items()}
+        index.time_ts, index.time_offsets = array("d", data["time"][0]), array("q", data["time"][1])
+        return index
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+def index_path(segment_path: str) -> str:
+    return os.path.splitext(segment_path)[0] + INDEX_SUFFIX
+
+def build_index(segment_path: str, time_every: int = 256, index: Optional[SegmentIndex] = None) -> SegmentIndex:
+    """Scan a segment (or extend `index` past what it covers) and index every record."""
+    index = index or SegmentIndex(os.path.basename(segment_path), time_every)
+    for offset, end, line in iter_lines(segment_path, index.bytes):
+        record = parse_record(line)
+        if record is None:
+            index.bytes = end
+            continue
+        index.add(offset, end, record_epoch(record), record.get("agent_id", ""), record.get("event_type", ""))
+    return index
+
+def load_index(segment_path: str) -> Optional[SegmentIndex]:
+    path = index_path(segment_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return SegmentIndex.from_dict(json.load(f))
+    except (ValueError, KeyError):
+        return None  # torn or foreign sidecar; the segment is scanned instead
+
+def load_or_build_index(segment_path: str, time_every: int = 256) -> SegmentIndex:
+    """Sidecar index, extended over any bytes appended after it was written."""
+    index = load_index(segment_path)
+    if index is None or index.bytes > logical_size(segment_path):
+        index = None
+    return build_index(segment_path, time_every, index)
+
+def _matches(record: Dict[str, Any], agent_id: Optional[str], event_type: Optional[str], since: Optional[float], until: Optional[float]) -> bool:
+    if agent_id is not None and record.get("agent_id") != agent_id:
+        return False
+    if event_type is not None and record.get("event_type") != event_type:
+        return False
+    if since is not None or until is not None:
+        epoch = record_epoch(record)
+        if (since is not None and epoch < since) or (until is not None and epoch > until):
+            return False
+    return True
+
+def query_segment(
+    segment_path: str,
+    index: Optional[SegmentIndex],
+    agent_id: Optional[str] = None,
+    event_type: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None
+) -> Iterator[Dict[str, Any]]:
+    """Matching records from one segment, in file order, seeking via the index where it covers."""
+    covered = 0
+    if index is not None:
+        covered = index.bytes
+        if index.may_contain(agent_id, event_type, since, until):
+            offsets = index.candidate_offsets(agent_id, event_type, since)
+            if offsets is None:
+                for offset, _, line in iter_lines(segment_path, index.start_offset(since)):
+                    if offset >= covered:
+                        break
+                    record = parse_record(line)
+                    if record is not None and _matches(record, None, None, since, until):
+                        yield record
+            else:
+                with SegmentReader(segment_path) as reader:
+                    for offset in offsets:
+                        if offset >= covered:
+                            break  # appended by a live writer after `covered` was read
+                        record = parse_record(reader.line_at(offset).decode("utf-8", errors="replace"))
+                        if record is not None and _matches(record, agent_id, event_type, since, until):
+                            yield record
+    # Unindexed tail (or the whole segment when there is no sidecar)
+    for _, _, line in iter_lines(segment_path, covered):
+        record = parse_record(line)
+        if record is not None and _matches(record, agent_id, event_type, since, until):
+            yield record
+
+def query_ledger(
+    log_dir: str,
+    agent_id: Optional[str] = None,
+    event_type: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: Optional[int] = None,
+    indexes: Optional[Dict[str, SegmentIndex]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Forensic query across every segment, oldest first. Sidecar indexes (or the
+    in-memory ones passed via `indexes`, keyed by segment basename) let matching
+    records be read by seeking instead of scanning each file.
+    """
+    yielded = 0
+    for segment in list_segments(log_dir):
+        name = os.path.basename(segment)
+        index = (indexes or {}).get(name) or load_index(segment)
+        for record in query_segment(segment, index, agent_id, event_type, since, until):
+            yield record
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
@@ -0,0 +1,252 @@
+import hashlib
+import hmac
+import json
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from src.core.ledger_segments import SegmentReader, iter_lines, logical_size, segment_stem, tail_lines
+
+GENESIS_HASH = "0" * 64
+
+# Every chained line ends with this fixed-width suffix, so verification slices
+# instead of parsing JSON: `..., "hash": "<64 hex>"}`
+_HASH_PREFIX = ', "hash": "'
+_HASH_SUFFIX_LEN = len(_HASH_PREFIX) + 64 + 2
+# ...and its JSON body starts with `{"prev_hash": "<64 hex>"`
+_PREV_PREFIX = '{"prev_hash": "'
+
+KEY_ENV_VAR = "AVARA_LEDGER_KEY"
+KEY_FILE = ".ledger_key"
+CHECKPOINT_FILE = "checkpoints.jsonl"
+
+def load_ledger_key(log_dir: str) -> bytes:
+    """
+    HMAC key for checkpoint signatures: $AVARA_LEDGER_KEY if set, otherwise a key
+    file generated next to the logs. Production deployments should set the env var
+    so the key does not live beside the data it protects.
+    """
+    env_key = os.environ.get(KEY_ENV_VAR)
+    if env_key:
+        return env_key.encode("utf-8")
+    path = os.path.join(log_dir, KEY_FILE)
+    if not os.path.exists(path):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    with open(path, "r") as f:
+        return f.read().strip().encode("utf-8")
+
+def ledger_key_exists(log_dir: str) -> bool:
+    """True if a checkpoint key is configured, without generating one."""
+    return bool(os.environ.get(KEY_ENV_VAR)) or os.path.exists(os.path.join(log_dir, KEY_FILE))
+
+def chain_line(asctime: str, entry_json: str, prev_hash: str) -> tuple:
+    """
+    Build one chained ledger line from an entry serialized without prev_hash/hash.
+    Returns (line without newline, record hash).
+    """
+    body = f'{_PREV_PREFIX}{prev_hash}", ' + entry_json[1:]
+    hashed = f"{asctime} - {body}"
+    record_hash = hashlib.sha256(hashed.encode("utf-8")).hexdigest()
+    return f'{hashed[:-1]}{_HASH_PREFIX}{record_hash}"}}', record_hash
+
+def split_line(line: str) -> Optional[tuple]:
+    """(hashed text, prev_hash, hash) for a chained line, or None for legacy/unchained lines."""
+    if len(line) < _HASH_SUFFIX_LEN or not line.endswith('"}') or line[-_HASH_SUFFIX_LEN:-66] != _HASH_PREFIX:
+        return None
+    record_hash = line[-66:-2]
+    hashed = line[:-_HASH_SUFFIX_LEN] + "}"
+    start = hashed.find(" - " + _PREV_PREFIX)
+    if start < 0:
+        return None
+    start += 3 + len(_PREV_PREFIX)
+    return hashed, hashed[start:start + 64], record_hash
+
+def merkle_root(hashes: Sequence[str]) -> str:
+    if not hashes:
+        return GENESIS_HASH
+    level = [bytes.fromhex(h) for h in hashes]
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+def _signed_payload(checkpoint: Dict[str, Any]) -> bytes:
+    return json.dumps({k: v for k, v in checkpoint.items() if k != "signature"}, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+def sign_checkpoint(checkpoint: Dict[str, Any], key: bytes) -> Dict[str, Any]:
+    checkpoint["signature"] = hmac.new(key, _signed_payload(checkpoint), hashlib.sha256).hexdigest()
+    return checkpoint
+
+def checkpoint_is_authentic(checkpoint: Dict[str, Any], key: bytes) -> bool:
+    expected = hmac.new(key, _signed_payload(checkpoint), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, checkpoint.get("signature", ""))
+
+def read_checkpoints(log_dir: str) -> List[Dict[str, Any]]:
+    path = os.path.join(log_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def last_record_hash(path: str) -> Optional[str]:
+    """Hash of the final chained record in a segment, reading backwards from the end."""
+    lines = tail_lines(path, 1)
+    parts = split_line(lines[0]) if lines else None
+    return parts[2] if parts else None
+
+def is_legacy_segment(path: str) -> bool:
+    """True for non-empty segments whose first record predates hash chaining."""
+    first = next(iter_lines(path), None)
+    return first is not None and bool(first[2]) and split_line(first[2]) is None
+
+@dataclass
+class SegmentReport:
+    """Outcome of verifying one segment (or the tail of one, after a checkpoint)."""
+    path: str
+    start_offset: int = 0
+    records: int = 0
+    first_prev_hash: Optional[str] = None
+    last_hash: Optional[str] = None
+    checkpoints_verified: int = 0
+    error: Optional[str] = None
+    error_offset: Optional[int] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+def verify_segment(path: str, start_offset: int = 0, prev_hash: Optional[str] = None, checkpoints: Sequence[Dict[str, Any]] = ()) -> SegmentReport:
+    """
+    Re-hash every record from start_offset and check each prev_hash link.
+    With prev_hash=None the first link is only reported (for cross-segment
+    stitching). `checkpoints` for this segment have their Merkle roots re-derived.
+    Top-level so it can run on a worker process.
+    """
+    report = SegmentReport(path, start_offset)
+    # Anchor checkpoints (records == 0) only mark where a chain began
+    blocks = sorted((c for c in checkpoints if c["records"]), key=lambda c: c["block_start_offset"])
+    block_i = 0
+    block_hashes: List[str] = []
+    running = prev_hash
+    with SegmentReader(path) as reader:
+        for line_offset, offset, raw in reader.iter_lines(start_offset):
+            line = raw.decode("utf-8").rstrip("\n")
+            if not line:
+                continue
+            parts = split_line(line)
+            if parts is None:
+                report.error, report.error_offset = "Unchained or malformed record", line_offset
+                return report
+            hashed, record_prev, record_hash = parts
+            if hashlib.sha256(hashed.encode("utf-8")).hexdigest() != record_hash:
+                report.error, report.error_offset = "Record hash mismatch (record was modified)", line_offset
+                return report
+            if report.first_prev_hash is None and report.records == 0:
+                report.first_prev_hash = record_prev
+            if running is not None and record_prev != running:
+                report.error, report.error_offset = "Broken chain link (record inserted, removed or reordered)", line_offset
+                return report
+            running = record_hash
+            report.records += 1
+
+            if block_i < len(blocks) and line_offset >= blocks[block_i]["block_start_offset"]:
+                block_hashes.append(record_hash)
+                if offset >= blocks[block_i]["offset"]:
+                    cp = blocks[block_i]
+                    if merkle_root(block_hashes) != cp["merkle_root"] or record_hash != cp["last_hash"]:
+                        report.error, report.error_offset = "Checkpoint Merkle root mismatch", cp["block_start_offset"]
+                        return report
+                    report.checkpoints_verified += 1
+                    block_hashes = []
+                    block_i += 1
+    if block_i < len(blocks):
+        # A signed checkpoint covers records that are no longer there
+        report.error, report.error_offset = f"Segment ends before checkpoint at byte {blocks[block_i]['offset']} (records truncated)", blocks[block_i]["block_start_offset"]
+        return report
+    report.last_hash = running
+    return report
+
+@dataclass
+class LedgerReport:
+    """Outcome of verifying a whole ledger directory."""
+    ok: bool
+    segments: List[SegmentReport] = field(default_factory=list)
+    records: int = 0
+    trusted_checkpoint: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    legacy_segments: int = 0
+    warning: Optional[str] = None
+
+def verify_ledger(log_dir: str, segments: Sequence[str], key: Optional[bytes] = None, from_checkpoint: bool = True, workers: int = 1) -> LedgerReport:
+    """
+    Verify the hash chain across `segments` (oldest first).
+    - Leading segments written before chaining was enabled are skipped
+    - from_checkpoint: start at the newest authentic checkpoint instead of genesis
+    - workers > 1: segments are verified in parallel processes and stitched afterwards
+    Full verification (from_checkpoint=False) also re-derives every checkpoint's Merkle root.
+    A segment that was deleted, or cut short of the bytes a checkpoint covers, fails either way.
+    Every chain starts with a signed anchor checkpoint, so chained records with no
+    checkpoints at all (checkpoints.jsonl deleted to re-chain from genesis) fail
+    whenever a key is configured; without one the report only carries a warning.
+    """
+    segments = list(segments)
+    legacy = 0
+    while segments and is_legacy_segment(segments[0]):
+        segments.pop(0)
+        legacy += 1
+
+    checkpoints = read_checkpoints(log_dir)
+    warning = None
+    if not checkpoints and any(logical_size(s) for s in segments):
+        if key is not None or ledger_key_exists(log_dir):
+            return LedgerReport(False, error=f"Chained records but no signed checkpoints ({CHECKPOINT_FILE} removed?); the chain cannot be authenticated", legacy_segments=legacy)
+        warning = "No signed checkpoints and no ledger key: the hash chain is unauthenticated"
+    if checkpoints and key is None:
+        key = load_ledger_key(log_dir)
+    # Checkpoints name the plain segment; it may since have been compressed
+    names = [segment_stem(s) for s in segments]
+    for cp in checkpoints:
+        if not checkpoint_is_authentic(cp, key):
+            return LedgerReport(False, error=f"Checkpoint signature invalid for {cp.get('segment')} @ {cp.get('offset')}", legacy_segments=legacy)
+        if segment_stem(cp["segment"]) not in names:
+            return LedgerReport(False, error=f"Segment {cp['segment']} covered by a signed checkpoint is missing", legacy_segments=legacy)
+
+    start_index, start_offset, start_hash, trusted = 0, 0, GENESIS_HASH, None
+    if from_checkpoint and checkpoints:
+        trusted = checkpoints[-1]
+        start_index, start_offset, start_hash = names.index(segment_stem(trusted["segment"])), trusted["offset"], trusted["last_hash"]
+        size = logical_size(segments[start_index])
+        if size < start_offset:
+            error = f"{os.path.basename(segments[start_index])}: ends at byte {size}, before the trusted checkpoint at byte {start_offset} (records truncated)"
+            return LedgerReport(False, trusted_checkpoint=trusted, error=error, legacy_segments=legacy)
+
+    jobs = []
+    for i in range(start_index, len(segments)):
+        seg_checkpoints = [] if from_checkpoint else [cp for cp in checkpoints if segment_stem(cp["segment"]) == names[i]]
+        jobs.append((segments[i], start_offset if i == start_index else 0, seg_checkpoints))
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            reports = list(pool.map(verify_segment, *zip(*[(p, o, None, c) for p, o, c in jobs])))
+    else:
+        reports = [verify_segment(p, o, None, c) for p, o, c in jobs]
+
+    result = LedgerReport(True, reports, sum(r.records for r in reports), trusted, legacy_segments=legacy, warning=warning)
+    expected = start_hash
+    for report in reports:
+        if not report.ok:
+            result.ok, result.error = False, f"{os.path.basename(report.path)} @ {report.error_offset}: {report.error}"
+            return result
+        if report.records == 0:
+            continue
+        if report.first_prev_hash != expected:
+            result.ok, result.error = False, f"{os.path.basename(report.path)}: chain does not continue from the previous segment"
+            return result
+        expected = report.last_hash
+    return result
@@ -0,0 +1,252 @@
+import bisect
+import glob
+import mmap
+import os
+import struct
+import time
+import zlib
+from array import array
+from typing import Iterator, List, Optional, Tuple
+
+# Sealed segments are rewritten as seekable block-compressed files:
+#   MAGIC | zlib block 0 | zlib block 1 | ... | block table | footer
+# Blocks hold whole lines, and the table maps each block's uncompressed start
+# offset to its compressed position, so a record at a known (uncompressed) offset
+# is read by inflating a single block.
+PLAIN_EXT = ".log"
+COMPRESSED_EXT = ".logz"
+MAGIC = b"AVZ1"
+_FOOTER = struct.Struct("<QQ4s")  # table offset, block count, magic
+
+def segment_stem(path: str) -> str:
+    """Segment identity independent of compression: 'audit_20261018_0001'."""
+    name = os.path.basename(path)
+    for ext in (COMPRESSED_EXT, PLAIN_EXT):
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return name
+
+def list_segments(log_dir: str) -> List[str]:
+    """Every ledger segment (plain or compressed), oldest first."""
+    paths = glob.glob(os.path.join(log_dir, f"audit_*{PLAIN_EXT}")) + glob.glob(os.path.join(log_dir, f"audit_*{COMPRESSED_EXT}"))
+    by_stem = {}
+    for path in paths:
+        # While a compression swap is in flight both may exist; the compressed copy is complete
+        if segment_stem(path) not in by_stem or path.endswith(COMPRESSED_EXT):
+            by_stem[segment_stem(path)] = path
+    return [by_stem[stem] for stem in sorted(by_stem)]
+
+def resolve_segment(path: str) -> str:
+    """Follow a plain segment that was compressed after it was listed."""
+    if not os.path.exists(path) and path.endswith(PLAIN_EXT):
+        compressed = path[:-len(PLAIN_EXT)] + COMPRESSED_EXT
+        if os.path.exists(compressed):
+            return compressed
+    return path
+
+class SegmentReader:
+    """
+    Line access to a plain or block-compressed segment by uncompressed offset.
+    - iter_lines(start): (offset, end offset, raw line) from `start`
+    - iter_chunks(start): runs of complete lines, for bulk scans
+    - line_at(offset): the single line starting at `offset`
+    A trailing partially written line is never returned.
+    """
+    def __init__(self, path: str):
+        self.path = resolve_segment(path)
+        self.compressed = self.path.endswith(COMPRESSED_EXT)
+        self._f = open(self.path, "rb")
+        self._block_cache: Tuple[int, bytes] = (-1, b"")
+        if self.compressed:
+            self._load_table()
+
+    def _load_table(self):
+        self._f.seek(-_FOOTER.size, os.SEEK_END)
+        table_offset, count, magic = _FOOTER.unpack(self._f.read(_FOOTER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a block-compressed ledger segment")
+        self._f.seek(table_offset)
+        table = array("q")
+        table.frombytes(self._f.read(count * 3 * 8))
+        self._starts = table[0::3]      # uncompressed start of each block
+        self._positions = table[1::3]   # compressed byte position
+        self._lengths = table[2::3]     # compressed byte length
+        self.size = int(self._starts[-1]) + len(self._block(count - 1)) if count else 0
+
+    def _block(self, i: int) -> bytes:
+        if self._block_cache[0] != i:
+            self._f.seek(self._positions[i])
+            self._block_cache = (i, zlib.decompress(self._f.read(self._lengths[i])))
+        return self._block_cache[1]
+
+    def iter_lines(self, start: int = 0) -> Iterator[Tuple[int, int, bytes]]:
+        if not self.compressed:
+            self._f.seek(start)
+            offset = start
+            for raw in self._f:
+                end = offset + len(raw)
+                if raw.endswith(b"\n"):
+                    yield offset, end, raw
+                offset = end
+            return
+        if not len(self._starts):
+            return
+        i = max(0, bisect.bisect_right(self._starts, start) - 1)
+        while i < len(self._starts):
+            data, base = self._block(i), self._starts[i]
+            pos = max(0, start - base)
+            while pos < len(data):
+                nl = data.find(b"\n", pos)
+                if nl < 0:
+                    break
+                yield base + pos, base + nl + 1, data[pos:nl + 1]
+                pos = nl + 1
+            i += 1
+
+    def iter_chunks(self, start: int = 0, chunk_bytes: int = 8 * 1024 * 1024) -> Iterator[Tuple[int, bytes]]:
+        """(offset, data) runs of complete lines from `start`, for scanning without per-line reads."""
+        if self.compressed:
+            if not len(self._starts):
+                return
+            i = max(0, bisect.bisect_right(self._starts, start) - 1)
+            for i in range(i, len(self._starts)):
+                data, base = self._block(i), self._starts[i]
+                if start > base:
+                    data, base = data[start - base:], start
+                yield base, data
+            return
+        self._f.seek(start)
+        offset, carry = start, b""
+        while True:
+            data = self._f.read(chunk_bytes)
+            if not data:
+                return
+            data = carry + data
+            cut = data.rfind(b"\n") + 1  # a partially written last line is held back
+            carry = data[cut:]
+            if cut:
+                yield offset, data[:cut]
+                offset += cut
+
+    def line_at(self, offset: int) -> bytes:
+        if not self.compressed:
+            self._f.seek(offset)
+            return self._f.readline()
+        i = bisect.bisect_right(self._starts, offset) - 1
+        data = self._block(i)
+        rel = offset - self._starts[i]
+        return data[rel:data.find(b"\n", rel) + 1]
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self) -> "SegmentReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_lines(path: str, start: int = 0) -> Iterator[Tuple[int, int, str]]:
+    """(offset, end offset, decoded line) for every complete line from `start`."""
+    with SegmentReader(path) as reader:
+        for offset, end, raw in reader.iter_lines(start):
+            yield offset, end, raw.decode("utf-8", errors="replace").rstrip("\n")
+
+def logical_size(path: str) -> int:
+    """Uncompressed size of a segment."""
+    path = resolve_segment(path)
+    if path.endswith(COMPRESSED_EXT):
+        with SegmentReader(path) as reader:
+            return reader.size
+    return os.path.getsize(path)
+
+def compress_segment(path: str, block_size: int = 256 * 1024) -> str:
+    """
+    Rewrite a sealed plain segment as a seekable block-compressed one and remove
+    the original. The swap is atomic: readers see either file, never a torn one.
+    """
+    target = path[:-len(PLAIN_EXT)] + COMPRESSED_EXT
+    tmp = target + ".tmp"
+    table = array("q")
+    with open(path, "rb") as src, open(tmp, "wb") as dst:
+        dst.write(MAGIC)
+        start = 0
+        while True:
+            chunk = src.read(block_size)
+            if not chunk:
+                break
+            if not chunk.endswith(b"\n"):
+                # Keep whole lines in a block; extend to the next newline
+                chunk += src.readline()
+            payload = zlib.compress(chunk, 6)
+            table.extend((start, dst.tell(), len(payload)))
+            dst.write(payload)
+            start += len(chunk)
+        table_offset = dst.tell()
+        dst.write(table.tobytes())
+        dst.write(_FOOTER.pack(table_offset, len(table) // 3, MAGIC))
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp, target)
+    os.remove(path)
+    return target
+
+def tail_lines(path: str, count: int) -> List[str]:
+    """
+    Last `count` complete lines. Plain segments are memory-mapped and scanned
+    backwards from the end, so the cost depends on `count`, not the file size;
+    compressed segments inflate only their trailing blocks.
+    """
+    path = resolve_segment(path)
+    if count <= 0:
+        return []
+    if path.endswith(COMPRESSED_EXT):
+        with SegmentReader(path) as reader:
+            lines: List[bytes] = []
+            i = len(reader._starts) - 1
+            while i >= 0 and len(lines) < count:
+                lines = reader._block(i).splitlines() + lines
+                i -= 1
+            return [l.decode("utf-8", errors="replace") for l in lines[-count:]]
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return []
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            end = mm.rfind(b"\n")  # drop a partially written last line
+            if end < 0:
+                return []
+            lines = []
+            pos = end
+            while len(lines) < count and pos > 0:
+                start = mm.rfind(b"\n", 0, pos) + 1
+                lines.append(mm[start:pos].decode("utf-8", errors="replace"))
+                pos = start - 1
+            return lines[::-1]
+
+def follow(log_dir: str, poll_seconds: float = 0.5, start_at_end: bool = True) -> Iterator[str]:
+    """Yield ledger lines as they are appended, moving to each new segment on rotation."""
+    segments = [s for s in list_segments(log_dir) if s.endswith(PLAIN_EXT)]
+    path = segments[-1] if segments else None
+    offset = os.path.getsize(path) if path and start_at_end else 0
+    pending = b""
+    while True:
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+            offset += len(data)
+            pending += data
+            *complete, pending = pending.split(b"\n")
+            for line in complete:
+                if line:
+                    yield line.decode("utf-8", errors="replace")
+        newest = [s for s in list_segments(log_dir) if s.endswith(PLAIN_EXT)]
+        if newest and newest[-1] != path and not _has_unread(path, offset):
+            # Rotated: the old segment is drained, continue at the start of the new one
+            path, offset, pending = newest[-1], 0, b""
+            continue
+        time.sleep(poll_seconds)
+
+def _has_unread(path: Optional[str], offset: int) -> bool:
+    return bool(path) and os.path.exists(path) and os.path.getsize(path) > offset
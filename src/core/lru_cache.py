@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+_MISSING = object()
+
+class LRUCache:
+    """
+    Bounded, thread-safe least-recently-used map shared by the guard caches.
+    - Evicts the coldest entry once `max_size` is reached
+    - Tracks hits and misses so callers can expose hit rates
+    """
+    def __init__(self, max_size: int = 1024):
+        if max_size <= 0:
+            raise ValueError("LRUCache max_size must be positive.")
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        """Drop every entry. Hit/miss counters are kept for long-running stats."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0
+            }
@@ -0,0 +1,314 @@
+import glob
+import json
+import os
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+class MessageRecord:
+    """Compact log entry for one agent-to-agent message."""
+    __slots__ = ("seq", "timestamp", "sender_id", "receiver_id", "content", "assumptions", "confidence_score")
+
+    def __init__(self, seq: int, timestamp: float, sender_id: str, receiver_id: str, content: str, assumptions: Tuple[str, ...], confidence_score: float):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.sender_id = sender_id
+        self.receiver_id = receiver_id
+        self.content = content
+        self.assumptions = assumptions
+        self.confidence_score = confidence_score
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MessageRecord":
+        return cls(
+            data["seq"], data["timestamp"], data["sender_id"], data["receiver_id"],
+            data["content"], tuple(data.get("assumptions", ())), data["confidence_score"]
+        )
+
+class _Segment:
+    """An append-only spill file and the byte offset of each record in it."""
+    __slots__ = ("path", "first_seq", "offsets", "size")
+
+    def __init__(self, path: str, first_seq: int):
+        self.path = path
+        self.first_seq = first_seq
+        self.offsets = array("q")
+        self.size = 0
+
+    @property
+    def last_seq(self) -> int:
+        return self.first_seq + len(self.offsets) - 1
+
+class _PairSeqs:
+    """Ascending seqs of one (sender, receiver) pair; the oldest are pruned from the head."""
+    __slots__ = ("seqs", "head")
+
+    def __init__(self):
+        self.seqs = array("q")
+        self.head = 0
+
+    def append(self, seq: int):
+        self.seqs.append(seq)
+
+    def drop_through(self, seq: int):
+        """Forget every seq <= `seq`; the array is compacted once half of it is dead."""
+        seqs, head = self.seqs, self.head
+        while head < len(seqs) and seqs[head] <= seq:
+            head += 1
+        if head == len(seqs) or (head >= 1024 and head * 2 >= len(seqs)):
+            del seqs[:head]
+            head = 0
+        self.head = head
+
+    def values(self) -> List[int]:
+        return self.seqs[self.head:].tolist()
+
+    def __len__(self) -> int:
+        return len(self.seqs) - self.head
+
+class MessageLog:
+    """
+    Executes Message Log rules:
+    - Keeps the newest `capacity` messages in a fixed-size in-memory ring
+    - Spills evicted messages to append-only JSONL segment files (when a spill dir is set)
+    - Keeps at most `max_spill_segments` spill files (None = all); older ones are deleted
+    - Indexes every retained message by (sender, receiver) pair for forensic queries;
+      dropped and deleted messages are pruned from the index as they leave the log
+    - Reads messages back in order across disk and memory through iterators
+    """
+    def __init__(
+        self,
+        capacity: int = 10000,
+        spill_dir: Optional[str] = None,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        max_spill_segments: Optional[int] = None
+    ):
+        if max_spill_segments is not None and max_spill_segments < 1:
+            raise ValueError("MessageLog max_spill_segments must be at least 1 (the segment being written).")
+        self.capacity = capacity
+        self.spill_dir = spill_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.max_spill_segments = max_spill_segments
+        self._ring: Deque[MessageRecord] = deque()
+        self._segments: List[_Segment] = []
+        self._writer = None
+        self._pair_index: Dict[Tuple[str, str], _PairSeqs] = {}
+        self._next_seq = 0
+        self._dropped = 0
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._load_segments()
+
+    # --- Recovery ---
+    def _load_segments(self):
+        """
+        Rebuild segment offsets and the pair index from spill files left by earlier runs.
+        A torn last record (the process died mid-write) is truncated away.
+        """
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "messages_*.seg"))):
+            segment = None
+            with open(path, "rb") as f:
+                offset = 0
+                for line in f:
+                    rec = self._parse_line(line)
+                    if rec is None:
+                        if f.read(1):
+                            raise ValueError(f"Corrupt message log record in {path} at byte {offset}")
+                        break
+                    if segment is None:
+                        segment = _Segment(path, rec["seq"])
+                    segment.offsets.append(offset)
+                    self._index(rec["sender_id"], rec["receiver_id"], rec["seq"])
+                    offset += len(line)
+                    self._next_seq = rec["seq"] + 1
+            if offset < os.path.getsize(path):
+                print(f"MESSAGE LOG: Truncated torn record at byte {offset} of {path}")
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+            if segment:
+                segment.size = offset
+                self._segments.append(segment)
+            else:
+                os.remove(path)
+        self._enforce_retention()
+
+    @staticmethod
+    def _parse_line(line: bytes) -> Optional[Dict[str, Any]]:
+        if not line.endswith(b"\n"):
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    # --- Writing ---
+    def _index(self, sender_id: str, receiver_id: str, seq: int):
+        seqs = self._pair_index.get((sender_id, receiver_id))
+        if seqs is None:
+            seqs = self._pair_index[(sender_id, receiver_id)] = _PairSeqs()
+        seqs.append(seq)
+
+    def _unindex(self, sender_id: str, receiver_id: str, seq: int):
+        """Prune a message that is no longer retained (always the oldest of its pair)."""
+        seqs = self._pair_index.get((sender_id, receiver_id))
+        if seqs is not None:
+            seqs.drop_through(seq)
+            if not seqs:
+                del self._pair_index[(sender_id, receiver_id)]
+
+    def _enforce_retention(self):
+        if self.max_spill_segments is None:
+            return
+        while len(self._segments) > self.max_spill_segments:
+            segment = self._segments.pop(0)
+            os.remove(segment.path)
+            for key, seqs in list(self._pair_index.items()):
+                seqs.drop_through(segment.last_seq)
+                if not seqs:
+                    del self._pair_index[key]
+
+    def append(self, sender_id: str, receiver_id: str, content: str, assumptions: List[str], confidence_score: float) -> MessageRecord:
+        with self._lock:
+            record = MessageRecord(self._next_seq, time.time(), sender_id, receiver_id, content, tuple(assumptions), confidence_score)
+            self._next_seq += 1
+            if len(self._ring) >= self.capacity:
+                self._spill(self._ring.popleft())
+            self._ring.append(record)
+            self._index(sender_id, receiver_id, record.seq)
+            return record
+
+    def _spill(self, record: MessageRecord):
+        if not self.spill_dir:
+            self._dropped += 1
+            self._unindex(record.sender_id, record.receiver_id, record.seq)
+            return
+        segment = self._segments[-1] if self._segments else None
+        if segment is None or self._writer is None or segment.size >= self.segment_max_bytes:
+            if self._writer:
+                self._writer.close()
+            segment = _Segment(os.path.join(self.spill_dir, f"messages_{record.seq:012d}.seg"), record.seq)
+            self._segments.append(segment)
+            self._writer = open(segment.path, "ab")
+            self._enforce_retention()
+        line = (json.dumps(record.to_dict(), separators=(",", ":")) + "\n").encode("utf-8")
+        segment.offsets.append(segment.size)
+        self._writer.write(line)
+        segment.size += len(line)
+
+    def flush(self):
+        with self._lock:
+            if self._writer:
+                self._writer.flush()
+
+    def close(self):
+        """Spill the in-memory ring too, so a restart can replay every message."""
+        with self._lock:
+            if self.spill_dir:
+                while self._ring:
+                    self._spill(self._ring.popleft())
+            if self._writer:
+                self._writer.close()
+                self._writer = None
+
+    # --- Reading ---
+    def _segment_for(self, seq: int) -> Optional[_Segment]:
+        segments = self._segments
+        lo, hi = 0, len(segments) - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            segment = segments[mid]
+            if seq < segment.first_seq:
+                hi = mid - 1
+            elif seq > segment.last_seq:
+                lo = mid + 1
+            else:
+                return segment
+        return None
+
+    def _read_spilled(self, seqs: List[int]) -> Iterator[MessageRecord]:
+        handles: Dict[str, Any] = {}
+        try:
+            for seq in seqs:
+                segment = self._segment_for(seq)
+                if segment is None:
+                    continue  # dropped before a spill dir was configured, or past retention
+                fh = handles.get(segment.path)
+                if fh is None:
+                    try:
+                        fh = handles[segment.path] = open(segment.path, "rb")
+                    except FileNotFoundError:
+                        continue  # deleted by retention after the index was read
+                fh.seek(segment.offsets[seq - segment.first_seq])
+                yield MessageRecord.from_dict(json.loads(fh.readline()))
+        finally:
+            for fh in handles.values():
+                fh.close()
+
+    def iter_messages(self, since_seq: int = 0) -> Iterator[MessageRecord]:
+        """Every retained message with seq >= since_seq, oldest first (disk, then memory)."""
+        with self._lock:
+            if self._writer:
+                self._writer.flush()
+            # Segment sizes are snapshotted together with the ring: records spilled after
+            # this point are yielded from the ring copy, never a second time from disk
+            segments = [(segment.path, segment.size, segment.last_seq) for segment in self._segments]
+            ring = list(self._ring)
+        for path, size, last_seq in segments:
+            if last_seq < since_seq:
+                continue
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                continue  # deleted by retention since the snapshot
+            with f:
+                offset = 0
+                for line in f:
+                    offset += len(line)
+                    if offset > size:
+                        break
+                    record = MessageRecord.from_dict(json.loads(line))
+                    if record.seq >= since_seq:
+                        yield record
+        for record in ring:
+            if record.seq >= since_seq:
+                yield record
+
+    def messages_between(self, sender_id: str, receiver_id: str) -> Iterator[MessageRecord]:
+        """Every retained message from sender_id to receiver_id, oldest first, via the pair index."""
+        with self._lock:
+            if self._writer:
+                self._writer.flush()
+            pair = self._pair_index.get((sender_id, receiver_id))
+            seqs = pair.values() if pair else []
+            ring = list(self._ring)
+        first_in_memory = ring[0].seq if ring else self._next_seq
+        yield from self._read_spilled([s for s in seqs if s < first_in_memory])
+        wanted = {s for s in seqs if s >= first_in_memory}
+        for record in ring:
+            if record.seq in wanted:
+                yield record
+
+    def agent_pairs(self) -> List[Tuple[str, str]]:
+        with self._lock:
+            return list(self._pair_index.keys())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_memory": len(self._ring),
+                "capacity": self.capacity,
+                "spilled": sum(len(s.offsets) for s in self._segments),
+                "segments": len(self._segments),
+                "indexed": sum(len(seqs) for seqs in self._pair_index.values()),
+                "dropped": self._dropped,
+                "total": self._next_seq
+            }
+
+    def __len__(self) -> int:
+        return len(self._ring)
@@ -0,0 +1,37 @@
+import threading
+from typing import Dict, Any
+
+class MetricsRegistry:
+    """
+    Process-wide counters and gauges for AVARA subsystems.
+    - Thread-safe increments from request threads and background jobs
+    - Snapshot exposed through the /metrics route
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def increment(self, name: str, amount: int = 1):
+        """Add `amount` to a monotonically increasing counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float):
+        """Record the current value of a point-in-time measurement."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            if name in self._counters:
+                return self._counters[name]
+            return self._gauges.get(name, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copy of every counter and gauge, safe to serialize."""
+        with self._lock:
+            return {"counters": dict(self._counters), "gauges": dict(self._gauges)}
+
+# Shared registry used by default across the control plane
+metrics = MetricsRegistry()
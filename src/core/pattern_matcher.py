@@ -0,0 +1,164 @@
+import codecs
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.core.lru_cache import LRUCache
+
+# Text is case-folded in slices of this many characters, never as a whole
+FOLD_CHUNK_CHARS = 65536
+
+# str.lower() maps exactly one code point to two ("İ" -> "i" + U+0307). Folding it
+# to a plain "i" first keeps the fold one-to-one, so offsets in folded text are
+# offsets in the original (and "İgnore previous instructions" still matches).
+_FOLD_FIXUPS = str.maketrans({"\u0130": "i"})
+
+def fold_case(text: str) -> str:
+    """Length-preserving lower-case fold used for signatures and scanned text."""
+    folded = text.lower()
+    if len(folded) != len(text):
+        folded = text.translate(_FOLD_FIXUPS).lower()
+    return folded
+
+# A scannable source: a string, a file-like object (text or binary) or an
+# iterable of str/bytes pieces such as a streamed HTTP body.
+ScanSource = Union[str, bytes, Any]
+
+def iter_text_chunks(source: ScanSource, chunk_size: int = FOLD_CHUNK_CHARS, encoding: str = "utf-8") -> Iterator[str]:
+    """Normalize any scan source into text chunks of at most `chunk_size` characters."""
+    if isinstance(source, str):
+        for base in range(0, len(source), chunk_size):
+            yield source[base:base + chunk_size]
+        return
+    if isinstance(source, (bytes, bytearray)):
+        source = [source]
+
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    if hasattr(source, "read"):
+        pieces: Iterable[Any] = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        pieces = source
+    for piece in pieces:
+        if isinstance(piece, (bytes, bytearray)):
+            piece = decoder.decode(piece)
+        # Re-slice oversized pieces so folding never allocates more than one chunk
+        for base in range(0, len(piece), chunk_size):
+            yield piece[base:base + chunk_size]
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+@dataclass(frozen=True)
+class PatternMatch:
+    """A signature hit inside scanned text."""
+    signature: str
+    offset: int  # start offset of the hit in the original text
+
+class SignatureMatcher:
+    """
+    Aho–Corasick automaton shared by the keyword-scanning guards.
+    - Built once per signature set, scans each text in a single pass
+    - Case-insensitive (signatures and text go through fold_case)
+    - Reports every matched signature with its offset in the original text
+    """
+    def __init__(self, signatures: Iterable[str]):
+        self.signatures: Tuple[str, ...] = tuple(dict.fromkeys(fold_case(s) for s in signatures if s))
+        self.max_length = max((len(s) for s in self.signatures), default=0)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._build()
+
+    def _build(self):
+        goto, out = self._goto, self._out
+        for pid, signature in enumerate(self.signatures):
+            state = 0
+            for ch in signature:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    self._fail.append(0)
+                    out.append(())
+                state = nxt
+            out[state] = out[state] + (pid,)
+
+        # Breadth-first failure links; outputs are merged along them so the
+        # scan loop never has to walk the failure chain to report hits.
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                out[nxt] = out[nxt] + out[self._fail[nxt]]
+
+    def _advance(self, state: int, chunk: str, base: int) -> Iterator[Tuple[int, PatternMatch]]:
+        """
+        Feed one chunk through the automaton starting at `state`.
+        Yields (state, match) for each hit; the final state is yielded with a None match.
+        """
+        goto, fail, out, signatures = self._goto, self._fail, self._out, self.signatures
+        for i, ch in enumerate(fold_case(chunk)):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for pid in out[state]:
+                    # The fold is one-to-one, so folded offsets are original offsets
+                    yield state, PatternMatch(signatures[pid], base + i - len(signatures[pid]) + 1)
+        yield state, None
+
+    def iter_matches(self, text: str) -> Iterator[PatternMatch]:
+        """Lazily yield every match in `text`, in order of where each hit ends."""
+        return self.iter_stream_matches(text)
+
+    def iter_stream_matches(self, source: ScanSource, chunk_size: int = FOLD_CHUNK_CHARS, encoding: str = "utf-8") -> Iterator[PatternMatch]:
+        """
+        Scan a string, file-like object or iterable of pieces chunk by chunk.
+        The automaton state carries over chunk boundaries, so a signature split
+        across two chunks is still found and memory stays at one chunk.
+        """
+        if not self.signatures:
+            return
+        state = 0
+        base = 0
+        for chunk in iter_text_chunks(source, chunk_size, encoding):
+            for state, match in self._advance(state, chunk, base):
+                if match is not None:
+                    yield match
+            base += len(chunk)
+
+    def find_all(self, text: str) -> List[PatternMatch]:
+        return list(self.iter_matches(text))
+
+    def search(self, text: str) -> Optional[PatternMatch]:
+        """First match only; stops scanning as soon as one signature hits."""
+        return next(self.iter_matches(text), None)
+
+    def contains_any(self, text: str) -> bool:
+        return self.search(text) is not None
+
+    def scan_stream(self, source: ScanSource, first_only: bool = False, chunk_size: int = FOLD_CHUNK_CHARS) -> List[PatternMatch]:
+        """Collect matches from a streamed source; with `first_only` reading stops at the first hit."""
+        matches = self.iter_stream_matches(source, chunk_size)
+        if first_only:
+            first = next(matches, None)
+            return [first] if first else []
+        return list(matches)
+
+_matcher_cache = LRUCache(max_size=64)
+
+def get_matcher(signatures: Iterable[str]) -> SignatureMatcher:
+    """Return the shared automaton for a signature set, building it on first use."""
+    key = tuple(signatures)
+    matcher = _matcher_cache.get(key)
+    if matcher is None:
+        matcher = SignatureMatcher(key)
+        _matcher_cache.put(key, matcher)
+    return matcher
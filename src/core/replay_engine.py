@@ -0,0 +1,251 @@
+import multiprocessing
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.core.ledger_index import query_ledger
+from src.guards.circuit_breaker import ActionRiskLevel, AgentAction, CircuitBreaker, CircuitBreakerStatus
+from src.guards.intent_validator import AgentState, IntentValidator, ValidationDecision
+from src.guards.tool_guard import ToolGuard, ToolRegistry, permissions_from_scopes
+
+# Decisions as recorded by /guard/validate_action
+DECISION_ALLOW = "ALLOW"
+DECISION_INTENT_BLOCK = "INTENT_BLOCK"
+DECISION_TOOL_BLOCK = "TOOL_BLOCK"
+DECISION_REQUIRE_APPROVAL = "REQUIRE_APPROVAL"
+
+_DECISION_EVENTS = {
+    "ACTION_ALLOW": DECISION_ALLOW,
+    "INTENT_BLOCK": DECISION_INTENT_BLOCK,
+    "TOOL_BLOCK": DECISION_TOOL_BLOCK,
+    "APPROVAL_REQUEST": DECISION_REQUIRE_APPROVAL,
+}
+
+@dataclass
+class ReplayGuards:
+    """The guards a historical decision is re-evaluated against."""
+    intent_validator: IntentValidator
+    tool_registry: ToolRegistry
+    circuit_breaker: CircuitBreaker
+    tool_guard: Optional[ToolGuard] = None
+
+    def __post_init__(self):
+        if self.tool_guard is None:
+            self.tool_guard = ToolGuard(self.tool_registry)
+
+def default_guards() -> ReplayGuards:
+    """Guards configured like the API server, with tools loaded from its storage engine."""
+    from src.db.storage_backend import open_store
+    return ReplayGuards(IntentValidator(), ToolRegistry(open_store()), CircuitBreaker())
+
+@dataclass
+class ReplayedAction:
+    """A ValidateActionRequest reconstructed from a ledger record, with the decision it got."""
+    agent_id: str
+    task_intent: str
+    proposed_action: str
+    target_resource: str
+    action_args: Dict[str, Any]
+    risk_level: str
+    historical_decision: str
+    timestamp: str
+    scopes: Optional[List[str]] = None
+    tool_registry_version: Optional[int] = None
+    action_id: Optional[str] = None
+
+@dataclass
+class ReplayDiff:
+    """A historical decision that the current guards would decide differently."""
+    action: ReplayedAction
+    replayed_decision: str
+    reason: str
+
+@dataclass
+class ReplayReport:
+    records: int = 0
+    replayed: int = 0
+    matched: int = 0
+    skipped: int = 0
+    changed: int = 0
+    transitions: Counter = field(default_factory=Counter)  # (historical, replayed) -> count
+    diffs: List[ReplayDiff] = field(default_factory=list)  # first `max_diffs` only
+    elapsed_seconds: float = 0.0
+
+    @property
+    def events_per_second(self) -> float:
+        return self.replayed / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+def _action_from_record(record: Dict[str, Any], scopes_by_agent: Dict[str, List[str]]) -> Optional[ReplayedAction]:
+    decision = _DECISION_EVENTS.get(record.get("event_type"))
+    context = record.get("context") or {}
+    if decision == DECISION_REQUIRE_APPROVAL:
+        context = context.get("request")  # approval requests logged before replay support carry no request
+    if decision is None or not context or "task_intent" not in context:
+        return None
+    agent_id = context.get("agent_id", record.get("agent_id"))
+    return ReplayedAction(
+        agent_id=agent_id,
+        task_intent=context["task_intent"],
+        proposed_action=context["proposed_action"],
+        target_resource=context["target_resource"],
+        action_args=context.get("action_args") or {},
+        risk_level=context["risk_level"],
+        historical_decision=decision,
+        timestamp=record["timestamp"],
+        scopes=context.get("agent_scopes", scopes_by_agent.get(agent_id)),
+        tool_registry_version=context.get("tool_registry_version"),
+        action_id=(record.get("context") or {}).get("action_id")
+    )
+
+def iter_replayable(log_dir: str, since: Optional[float] = None, until: Optional[float] = None) -> Iterator[ReplayedAction]:
+    """
+    Stream reconstructed validate_action requests from the ledger, oldest first.
+    Agent scopes come from the record itself or, for older records, from the
+    agent's IAM_PROVISION event (found via the segment indexes when `since` skips it).
+    """
+    scopes_by_agent: Dict[str, List[str]] = {}
+    if since is not None:
+        for record in query_ledger(log_dir, event_type="IAM_PROVISION", until=since):
+            scopes_by_agent[record["agent_id"]] = record["context"].get("scopes", [])
+    for record in query_ledger(log_dir, since=since, until=until):
+        if record.get("event_type") == "IAM_PROVISION":
+            scopes_by_agent[record["agent_id"]] = record["context"].get("scopes", [])
+            continue
+        action = _action_from_record(record, scopes_by_agent)
+        if action is not None:
+            yield action
+
+def evaluate_actions(guards: ReplayGuards, actions: List[ReplayedAction]) -> List[Tuple[Optional[str], str]]:
+    """
+    Re-decide a batch in the order /guard/validate_action applies its checks
+    (intent, tool, circuit breaker), without printing, auditing or persisting.
+    Intent drift is scored for the whole batch at once. Returns (decision, reason)
+    per action; decision is None when it cannot be re-derived (registered tool,
+    unknown agent scopes).
+    """
+    scores = guards.intent_validator.score_actions([
+        AgentState(a.task_intent, a.proposed_action, a.target_resource, a.action_args, agent_id=a.agent_id) for a in actions
+    ])
+    snapshot = guards.tool_registry.snapshot()
+    results: List[Tuple[Optional[str], str]] = []
+    for action, score in zip(actions, scores):
+        intent_decision = IntentValidator.decision_for(score)
+        if intent_decision == ValidationDecision.BLOCK:
+            results.append((DECISION_INTENT_BLOCK, f"drift {score:.2f}"))
+            continue
+        if snapshot.is_registered(action.proposed_action):
+            if action.scopes is None:
+                results.append((None, "agent scopes unknown"))
+                continue
+            reason = guards.tool_guard.check_invocation(action.proposed_action, action.action_args, permissions_from_scopes(action.scopes), snapshot)
+            if reason:
+                results.append((DECISION_TOOL_BLOCK, reason))
+                continue
+        try:
+            risk = ActionRiskLevel[action.risk_level.upper()]
+        except KeyError:
+            results.append((None, f"unknown risk level {action.risk_level!r}"))
+            continue
+        status = guards.circuit_breaker.classify(AgentAction(action.proposed_action, action.target_resource, action.action_args, risk))
+        if status == CircuitBreakerStatus.HALT_REQUIRE_APPROVAL:
+            results.append((DECISION_REQUIRE_APPROVAL, "high-risk action"))
+        elif intent_decision == ValidationDecision.REQUIRE_APPROVAL:
+            results.append((DECISION_REQUIRE_APPROVAL, f"questionable alignment, drift {score:.2f}"))
+        else:
+            results.append((DECISION_ALLOW, f"drift {score:.2f}"))
+    return results
+
+# Per-process guards for parallel replay, built once by the pool initializer
+_worker_guards: Optional[ReplayGuards] = None
+
+def _init_worker(guard_factory: Callable[[], ReplayGuards]):
+    global _worker_guards
+    _worker_guards = guard_factory()
+
+def _evaluate_in_worker(actions: List[ReplayedAction]) -> List[Tuple[Optional[str], str]]:
+    return evaluate_actions(_worker_guards, actions)
+
+class ReplayEngine:
+    """
+    Executes Decision Replay rules:
+    - Streams historical validate_action decisions out of the audit ledger lazily
+    - Re-evaluates them against the current guards with no side effects
+    - Batches are scored together; workers > 1 spreads them over processes
+    - Reports every decision that would now come out differently
+    """
+    def __init__(
+        self,
+        guards: Optional[ReplayGuards] = None,
+        guard_factory: Callable[[], ReplayGuards] = default_guards,
+        batch_size: int = 2048,
+        workers: int = 1,
+        max_diffs: int = 1000
+    ):
+        # Worker processes rebuild guards via `guard_factory`, so it must be a
+        # module-level function; in-process replay uses `guards` if given
+        self.guards = guards
+        self.guard_factory = guard_factory
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_diffs = max_diffs
+
+    def _batches(self, actions: Iterable[ReplayedAction]) -> Iterator[List[ReplayedAction]]:
+        batch: List[ReplayedAction] = []
+        for action in actions:
+            batch.append(action)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _evaluated(self, actions: Iterable[ReplayedAction]) -> Iterator[Tuple[List[ReplayedAction], List[Tuple[Optional[str], str]]]]:
+        if self.workers <= 1:
+            guards = self.guards or self.guard_factory()
+            for batch in self._batches(actions):
+                yield batch, evaluate_actions(guards, batch)
+            return
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_init_worker, initargs=(self.guard_factory,)) as pool:
+            # A bounded window of in-flight batches keeps memory flat and results in ledger order
+            pending: deque = deque()
+            for batch in self._batches(actions):
+                pending.append((batch, pool.submit(_evaluate_in_worker, batch)))
+                if len(pending) >= self.workers * 2:
+                    done, future = pending.popleft()
+                    yield done, future.result()
+            while pending:
+                done, future = pending.popleft()
+                yield done, future.result()
+
+    def iter_diffs(self, actions: Iterable[ReplayedAction], report: Optional[ReplayReport] = None) -> Iterator[ReplayDiff]:
+        """Stream decisions that differ from history; `report` (if given) accumulates totals."""
+        report = report if report is not None else ReplayReport()
+        for batch, results in self._evaluated(actions):
+            report.records += len(batch)
+            for action, (decision, reason) in zip(batch, results):
+                if decision is None:
+                    report.skipped += 1
+                    continue
+                report.replayed += 1
+                if decision == action.historical_decision:
+                    report.matched += 1
+                    continue
+                report.changed += 1
+                report.transitions[(action.historical_decision, decision)] += 1
+                yield ReplayDiff(action, decision, reason)
+
+    def replay(self, actions: Iterable[ReplayedAction]) -> ReplayReport:
+        report = ReplayReport()
+        started = time.perf_counter()
+        for diff in self.iter_diffs(actions, report):
+            if len(report.diffs) < self.max_diffs:
+                report.diffs.append(diff)
+        report.elapsed_seconds = time.perf_counter() - started
+        return report
+
+    def replay_ledger(self, log_dir: str, since: Optional[float] = None, until: Optional[float] = None) -> ReplayReport:
+        """Replay every validate_action decision in the ledger at `log_dir` (epoch-second bounds)."""
+        return self.replay(iter_replayable(log_dir, since, until))
@@ -0,0 +1,126 @@
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.core.metrics import MetricsRegistry, metrics
+from src.core.pattern_matcher import PatternMatch, SignatureMatcher
+
+# --- Worker-process side ---
+# Automata built inside a worker, keyed by signature-set digest. Each worker
+# compiles a given signature set once and reuses it for every later job.
+_worker_matchers: Dict[str, SignatureMatcher] = {}
+
+def _worker_matcher(key: str, signatures: Tuple[str, ...]) -> SignatureMatcher:
+    matcher = _worker_matchers.get(key)
+    if matcher is None:
+        matcher = SignatureMatcher(signatures)
+        _worker_matchers[key] = matcher
+    return matcher
+
+def _init_worker(preload: Sequence[Tuple[str, Tuple[str, ...]]]):
+    for key, signatures in preload:
+        _worker_matcher(key, signatures)
+
+def _scan_job(key: str, signatures: Tuple[str, ...], texts: List[str]) -> List[Optional[Tuple[str, int]]]:
+    matcher = _worker_matcher(key, signatures)
+    results = []
+    for text in texts:
+        match = matcher.search(text)
+        results.append((match.signature, match.offset) if match else None)
+    return results
+
+def signature_key(signatures: Sequence[str]) -> str:
+    return hashlib.sha1("\x00".join(signatures).encode()).hexdigest()
+
+# --- Request-process side ---
+class ScanOffloader:
+    """
+    Executes CPU Offload rules for content scanning:
+    - Small jobs stay inline on the request thread
+    - Large jobs are split across a process pool so they do not hold the server's GIL
+    - Worker processes compile each signature automaton once and reuse it
+    - Queue depth and offload counts are exported as metrics
+    """
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        size_threshold_chars: int = 256 * 1024,
+        batch_chars: int = 1024 * 1024,
+        preload_signatures: Sequence[Sequence[str]] = (),
+        metrics_registry: MetricsRegistry = metrics
+    ):
+        self.max_workers = max_workers
+        self.size_threshold_chars = size_threshold_chars
+        self.batch_chars = batch_chars
+        self.metrics = metrics_registry
+        self._preload = [(signature_key(tuple(s)), tuple(s)) for s in preload_signatures]
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a server process that already runs threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self._preload,)
+                )
+            return self._pool
+
+    def _track(self, future: Future):
+        with self._lock:
+            self._in_flight += 1
+            self.metrics.set_gauge("scan_pool.queue_depth", self._in_flight)
+
+        def _done(_):
+            with self._lock:
+                self._in_flight -= 1
+                self.metrics.set_gauge("scan_pool.queue_depth", self._in_flight)
+        future.add_done_callback(_done)
+
+    def submit(self, fn: Callable, *args: Any) -> Future:
+        """Run any picklable CPU-bound function on the pool (e.g. drift scoring)."""
+        future = self._get_pool().submit(fn, *args)
+        self._track(future)
+        self.metrics.increment("scan_pool.jobs_offloaded")
+        return future
+
+    def should_offload(self, texts: Sequence[str]) -> bool:
+        return sum(len(t) for t in texts) >= self.size_threshold_chars
+
+    def scan_first(self, matcher: SignatureMatcher, texts: Sequence[str]) -> List[Optional[PatternMatch]]:
+        """First signature hit (or None) per text, inline or across worker processes by size."""
+        if not self.should_offload(texts):
+            self.metrics.increment("scan_pool.jobs_inline")
+            return [matcher.search(t) for t in texts]
+
+        signatures = matcher.signatures
+        key = signature_key(signatures)
+        # Pack texts into jobs of roughly batch_chars so one huge batch is spread over every core
+        jobs: List[Tuple[int, List[str]]] = []
+        start, size = 0, 0
+        for i, text in enumerate(texts):
+            size += len(text)
+            if size >= self.batch_chars:
+                jobs.append((start, list(texts[start:i + 1])))
+                start, size = i + 1, 0
+        if start < len(texts):
+            jobs.append((start, list(texts[start:])))
+
+        results: List[Optional[PatternMatch]] = [None] * len(texts)
+        futures = [(offset, self.submit(_scan_job, key, signatures, chunk)) for offset, chunk in jobs]
+        for offset, future in futures:
+            for i, hit in enumerate(future.result()):
+                results[offset + i] = PatternMatch(*hit) if hit else None
+        return results
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
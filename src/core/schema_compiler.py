@@ -0,0 +1,280 @@
+import hashlib
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.core.lru_cache import LRUCache
+
+# A compiled validator returns None when the value conforms, else (path, message)
+SchemaError = Tuple[str, str]
+Validator = Callable[[Any], Optional[SchemaError]]
+
+class InvalidSchemaError(ValueError):
+    """The schema itself is malformed (unknown type, bad pattern, non-numeric bound, ...)."""
+
+def _accept(value: Any) -> Optional[SchemaError]:
+    return None
+
+def _is_integer(v: Any) -> bool:
+    return (isinstance(v, int) and not isinstance(v, bool)) or (isinstance(v, float) and v.is_integer())
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "integer": _is_integer,
+    "number": _is_number,
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "null": lambda v: v is None,
+}
+
+def _child_error(key: Any, err: SchemaError) -> SchemaError:
+    path = f"{key}.{err[0]}" if err[0] else str(key)
+    return path, err[1]
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+def schema_hash(schema: Dict[str, Any]) -> str:
+    return hashlib.sha256(_canonical(schema).encode("utf-8")).hexdigest()
+
+def _count(schema: Dict[str, Any], keyword: str) -> Optional[int]:
+    """A length/count bound (minLength, maxItems, ...): absent, or a non-negative integer."""
+    value = schema.get(keyword)
+    if value is None:
+        return None
+    if not _is_integer(value) or value < 0:
+        raise InvalidSchemaError(f"{keyword} must be a non-negative integer, got {value!r}")
+    return int(value)
+
+def _compile_type(schema: Dict[str, Any]) -> Optional[Validator]:
+    declared = schema.get("type")
+    if declared is None:
+        return None
+    names = [declared] if isinstance(declared, str) else list(declared)
+    unknown = [n for n in names if n not in _TYPE_CHECKS]
+    if unknown:
+        raise InvalidSchemaError(f"unknown type {unknown[0]!r} (expected one of {sorted(_TYPE_CHECKS)})")
+    preds = [_TYPE_CHECKS[n] for n in names]
+    expected = " or ".join(names)
+    if len(preds) == 1:
+        pred = preds[0]
+        return lambda v: None if pred(v) else ("", f"expected {expected}, got {type(v).__name__}")
+    return lambda v: None if any(p(v) for p in preds) else ("", f"expected {expected}, got {type(v).__name__}")
+
+def _enum_key(v: Any) -> Any:
+    """Hashable JSON-equality key: 1 == 1.0, but True != 1 and "1" != 1."""
+    if isinstance(v, bool) or v is None:
+        return ("b", v)
+    if isinstance(v, (int, float)):
+        return ("n", v)
+    if isinstance(v, str):
+        return ("s", v)
+    return ("j", _canonical(v))
+
+def _compile_enum(schema: Dict[str, Any]) -> List[Validator]:
+    checks: List[Validator] = []
+    if "enum" in schema:
+        allowed = frozenset(_enum_key(e) for e in schema["enum"])
+        shown = schema["enum"]
+        checks.append(lambda v: None if _enum_key(v) in allowed else ("", f"must be one of {shown}"))
+    if "const" in schema:
+        const = _enum_key(schema["const"])
+        checks.append(lambda v: None if _enum_key(v) == const else ("", f"must equal {schema['const']!r}"))
+    return checks
+
+def _compile_string(schema: Dict[str, Any]) -> Optional[Validator]:
+    min_len, max_len = _count(schema, "minLength"), _count(schema, "maxLength")
+    regex = re.compile(schema["pattern"]) if "pattern" in schema else None
+    if min_len is None and max_len is None and regex is None:
+        return None
+
+    def check_string(v: Any) -> Optional[SchemaError]:
+        if not isinstance(v, str):
+            return None
+        if min_len is not None and len(v) < min_len:
+            return "", f"shorter than minLength {min_len}"
+        if max_len is not None and len(v) > max_len:
+            return "", f"longer than maxLength {max_len}"
+        if regex is not None and not regex.search(v):
+            return "", f"does not match pattern {regex.pattern!r}"
+        return None
+    return check_string
+
+def _compile_numeric(schema: Dict[str, Any]) -> Optional[Validator]:
+    def bound(keyword: str) -> Optional[float]:
+        value = schema.get(keyword)
+        if value is None or isinstance(value, bool):
+            return None  # draft-4 boolean exclusives are not supported
+        if not _is_number(value):
+            raise InvalidSchemaError(f"{keyword} must be a number, got {value!r}")
+        return value
+    lo, hi = bound("minimum"), bound("maximum")
+    xlo, xhi = bound("exclusiveMinimum"), bound("exclusiveMaximum")
+    multiple = bound("multipleOf")
+    if multiple is not None and multiple <= 0:
+        raise InvalidSchemaError(f"multipleOf must be greater than 0, got {multiple!r}")
+    if lo is None and hi is None and xlo is None and xhi is None and multiple is None:
+        return None
+
+    def is_multiple(v: Any) -> bool:
+        if isinstance(v, int) and isinstance(multiple, int):
+            return v % multiple == 0
+        try:
+            quotient = v / multiple
+            nearest = round(quotient)
+        except (OverflowError, ValueError):  # inf/nan
+            return False
+        # Relative tolerance absorbs binary float error, so 0.3 is a multiple of 0.1
+        return abs(quotient - nearest) <= 1e-9 * max(1.0, abs(quotient))
+
+    def check_number(v: Any) -> Optional[SchemaError]:
+        if not _is_number(v):
+            return None
+        if lo is not None and v < lo:
+            return "", f"{v} < minimum {lo}"
+        if hi is not None and v > hi:
+            return "", f"{v} > maximum {hi}"
+        if xlo is not None and v <= xlo:
+            return "", f"{v} <= exclusiveMinimum {xlo}"
+        if xhi is not None and v >= xhi:
+            return "", f"{v} >= exclusiveMaximum {xhi}"
+        if multiple is not None and not is_multiple(v):
+            return "", f"not a multiple of {multiple}"
+        return None
+    return check_number
+
+def _compile_array(schema: Dict[str, Any]) -> Optional[Validator]:
+    min_items, max_items = _count(schema, "minItems"), _count(schema, "maxItems")
+    unique = bool(schema.get("uniqueItems"))
+    items = schema.get("items")
+    item_validator = _compile(items) if isinstance(items, (dict, bool)) else _accept
+    if min_items is None and max_items is None and not unique and item_validator is _accept:
+        return None
+
+    def check_array(v: Any) -> Optional[SchemaError]:
+        if not isinstance(v, list):
+            return None
+        if min_items is not None and len(v) < min_items:
+            return "", f"fewer than minItems {min_items}"
+        if max_items is not None and len(v) > max_items:
+            return "", f"more than maxItems {max_items}"
+        if unique and len({_enum_key(i) for i in v}) != len(v):
+            return "", "items are not unique"
+        if item_validator is not _accept:
+            for i, item in enumerate(v):
+                err = item_validator(item)
+                if err:
+                    return _child_error(i, err)
+        return None
+    return check_array
+
+def _compile_object(schema: Dict[str, Any]) -> Optional[Validator]:
+    required = tuple(schema.get("required", ()))
+    properties = {name: _compile(sub) for name, sub in schema.get("properties", {}).items()}
+    additional = schema.get("additionalProperties", True)
+    additional_validator = None if additional is True else _compile(additional)
+    min_props, max_props = _count(schema, "minProperties"), _count(schema, "maxProperties")
+    # Only properties with real constraints are visited per call
+    constrained = {name: fn for name, fn in properties.items() if fn is not _accept}
+    visit = bool(constrained) or additional_validator is not None
+    if not required and min_props is None and max_props is None and not visit:
+        return None
+
+    def check_object(v: Any) -> Optional[SchemaError]:
+        if not isinstance(v, dict):
+            return None
+        for name in required:
+            if name not in v:
+                return "", f"missing required property '{name}'"
+        if min_props is not None and len(v) < min_props:
+            return "", f"fewer than minProperties {min_props}"
+        if max_props is not None and len(v) > max_props:
+            return "", f"more than maxProperties {max_props}"
+        if visit:
+            for key, value in v.items():
+                fn = constrained.get(key)
+                if fn is None:
+                    if key in properties or additional_validator is None:
+                        continue
+                    if additional is False:
+                        return "", f"unexpected property '{key}'"
+                    fn = additional_validator
+                err = fn(value)
+                if err:
+                    return _child_error(key, err)
+        return None
+    return check_object
+
+def _compile_combinators(schema: Dict[str, Any]) -> List[Validator]:
+    checks: List[Validator] = []
+    for sub in schema.get("allOf", ()):
+        checks.append(_compile(sub))
+    if "anyOf" in schema:
+        options = [_compile(s) for s in schema["anyOf"]]
+        checks.append(lambda v: None if any(o(v) is None for o in options) else ("", "does not match any schema in anyOf"))
+    if "oneOf" in schema:
+        options = [_compile(s) for s in schema["oneOf"]]
+        checks.append(lambda v: None if sum(o(v) is None for o in options) == 1 else ("", "must match exactly one schema in oneOf"))
+    if "not" in schema:
+        negated = _compile(schema["not"])
+        checks.append(lambda v: ("", "must not match schema in 'not'") if negated(v) is None else None)
+    return checks
+
+def _compile(schema: Any) -> Validator:
+    if schema is True or schema == {}:
+        return _accept
+    if schema is False:
+        return lambda v: ("", "no value is allowed here")
+    if not isinstance(schema, dict):
+        raise InvalidSchemaError(f"a schema must be an object or boolean, got {type(schema).__name__}")
+
+    checks: List[Validator] = []
+    type_check = _compile_type(schema)
+    if type_check:
+        checks.append(type_check)
+    checks += _compile_enum(schema)
+    for family in (_compile_string, _compile_numeric, _compile_array, _compile_object):
+        check = family(schema)
+        if check:
+            checks.append(check)
+    checks += [c for c in _compile_combinators(schema) if c is not _accept]
+
+    if not checks:
+        return _accept
+    if len(checks) == 1:
+        return checks[0]
+
+    def validate(v: Any) -> Optional[SchemaError]:
+        for check in checks:
+            err = check(v)
+            if err:
+                return err
+        return None
+    return validate
+
+_compiled = LRUCache(1024)
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """
+    Compile a JSON Schema (draft 2020-12 core validation keywords, no $ref/format)
+    into a validator closure. Identical schemas share one compiled validator.
+    Raises InvalidSchemaError if the schema itself is malformed.
+    """
+    try:
+        key = schema_hash(schema)
+    except (TypeError, ValueError) as e:
+        raise InvalidSchemaError(f"schema is not JSON-serializable: {e}") from e
+    validator = _compiled.get(key)
+    if validator is None:
+        try:
+            validator = _compile(schema)
+        except InvalidSchemaError:
+            raise
+        except (TypeError, ValueError, AttributeError, KeyError, re.error) as e:
+            raise InvalidSchemaError(f"malformed schema: {e}") from e
+        _compiled.put(key, validator)
+    return validator
@@ -0,0 +1,208 @@
+import bisect
+import heapq
+import json
+import threading
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from src.db.storage_backend import StorageBackend
+
+class InMemoryStore(StorageBackend):
+    """
+    Executes In-Memory Storage rules:
+    - Same contract and results as the SQLite PersistentStore, without durability
+    - For tests and latency-critical single-node deployments
+    - JSON columns are kept encoded, so callers get fresh copies exactly as from SQLite
+    - One lock; every call is atomic
+    - Pending and resolved approvals are indexed by timestamp (heaps with lazy deletion),
+      so the expiry sweeper touches only the rows it moves, like SQLite's timestamp index
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._agents: Dict[str, Tuple[str, str, float, int]] = {}
+        self._tools: Dict[str, Tuple[str, str, str, bool]] = {}
+        # agent_id -> (timestamps, rows) kept sorted by timestamp for range scans
+        self._executions: Dict[str, Tuple[List[float], List[Tuple[str, str, float]]]] = {}
+        self._approvals: Dict[str, Dict[str, Any]] = {}
+        self._approvals_history: Dict[str, Dict[str, Any]] = {}
+        # (timestamp, action_id) per status change; an entry is stale once its row moved on
+        self._pending_by_time: List[Tuple[float, str]] = []
+        self._resolved_by_time: List[Tuple[float, str]] = []
+        self._roles: Dict[str, int] = {}
+        self._documents: Dict[str, Tuple[str, str, int]] = {}
+
+    # --- IAM Persistence ---
+    def save_agent(self, agent_id: str, role_name: str, scopes: List[str], ttl: int):
+        with self._lock:
+            self._agents[agent_id] = (role_name, json.dumps(scopes), time.time(), ttl)
+
+    def load_agent(self, agent_id: str) -> Optional[Dict[str, Any]]:
+        row = self._agents.get(agent_id)
+        if row:
+            return {"role_name": row[0], "scopes": json.loads(row[1]), "created_at": row[2], "ttl_seconds": row[3]}
+        return None
+
+    def delete_agent(self, agent_id: str):
+        with self._lock:
+            self._agents.pop(agent_id, None)
+
+    # --- Tool Persistence ---
+    def save_tool(self, name: str, desc: str, schema: dict, perms: list):
+        self.save_tools([(name, desc, schema, perms, True)])
+
+    def load_tool(self, name: str) -> Optional[Dict[str, Any]]:
+        row = self._tools.get(name)
+        if row:
+            return {"description": row[0], "parameters_schema": json.loads(row[1]), "required_permissions": json.loads(row[2]), "is_active": row[3]}
+        return None
+
+    def save_tools(self, rows: Iterable[tuple]):
+        """Bulk upsert of (name, description, schema, permissions, is_active) rows in one transaction."""
+        encoded = {name: (desc, json.dumps(schema), json.dumps(perms), bool(active)) for name, desc, schema, perms, active in rows}
+        with self._lock:
+            self._tools.update(encoded)
+
+    def load_all_tools(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = list(self._tools.items())
+        return [
+            {"name": name, "description": desc, "parameters_schema": json.loads(schema), "required_permissions": json.loads(perms), "is_active": active}
+            for name, (desc, schema, perms, active) in rows
+        ]
+
+    # --- Anomaly Execution Persistence ---
+    def log_execution(self, agent_id: str, action: str, target: str):
+        now = time.time()
+        with self._lock:
+            stamps, rows = self._executions.setdefault(agent_id, ([], []))
+            i = bisect.bisect_right(stamps, now)  # == len(stamps) unless the clock stepped back
+            stamps.insert(i, now)
+            rows.insert(i, (action, target, now))
+
+    def get_recent_executions(self, agent_id: str, seconds_ago: float) -> List[Dict[str, Any]]:
+        threshold = time.time() - seconds_ago
+        with self._lock:
+            stamps, rows = self._executions.get(agent_id, ([], []))
+            recent = rows[bisect.bisect_right(stamps, threshold):]
+        return [{"action": row[0], "target": row[1], "timestamp": row[2]} for row in recent]
+
+    # --- Approvals Persistence ---
+    def _index_approval(self, action_id: str, row: Dict[str, Any]):
+        """Record a row's current (status, timestamp) in the time index. Caller holds _lock."""
+        heap = self._pending_by_time if row["status"] == "PENDING" else self._resolved_by_time
+        heapq.heappush(heap, (row["timestamp"], action_id))
+        # Stale entries are dropped as the sweeper reaches them; rebuild if they pile up faster
+        if len(self._pending_by_time) + len(self._resolved_by_time) > 2 * len(self._approvals) + 1024:
+            self._pending_by_time = [(r["timestamp"], a) for a, r in self._approvals.items() if r["status"] == "PENDING"]
+            self._resolved_by_time = [(r["timestamp"], a) for a, r in self._approvals.items() if r["status"] != "PENDING"]
+            heapq.heapify(self._pending_by_time)
+            heapq.heapify(self._resolved_by_time)
+
+    def _pop_due(self, heap: List[Tuple[float, str]], before: float, pending: bool) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Oldest live (action_id, row) in `heap` stamped before `before`, removed from the heap. Caller holds _lock."""
+        while heap and heap[0][0] < before:
+            ts, action_id = heapq.heappop(heap)
+            row = self._approvals.get(action_id)
+            if row is not None and row["timestamp"] == ts and (row["status"] == "PENDING") == pending:
+                return action_id, row
+        return None
+
+    def save_approval(self, action_id: str, agent_id: str, action_type: str, target: str, parameters: dict, status: str = "PENDING"):
+        row = {"agent_id": agent_id, "action_type": action_type, "target": target, "parameters": json.dumps(parameters), "status": status, "timestamp": time.time()}
+        with self._lock:
+            self._approvals[action_id] = row
+            self._index_approval(action_id, row)
+
+    def get_approval(self, action_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._approvals.get(action_id)
+            if row:
+                return {"action_id": action_id, **row, "parameters": json.loads(row["parameters"])}
+            # Fall back to the compact history for archived approvals
+            row = self._approvals_history.get(action_id)
+            if row:
+                return {"action_id": action_id, **row, "parameters": {}}
+        return None
+
+    def update_approval_status(self, action_id: str, new_status: str):
+        with self._lock:
+            row = self._approvals.get(action_id)
+            if row:
+                row["status"], row["timestamp"] = new_status, time.time()
+                self._index_approval(action_id, row)
+
+    def resolve_pending_approval(self, action_id: str, new_status: str) -> bool:
+        """Atomically move an approval out of PENDING. Returns False if it was already resolved."""
+        with self._lock:
+            row = self._approvals.get(action_id)
+            if row is None or row["status"] != "PENDING":
+                return False
+            row["status"], row["timestamp"] = new_status, time.time()
+            self._index_approval(action_id, row)
+            return True
+
+    def expire_pending_approvals(self, created_before: float, batch_size: int = 500) -> List[Dict[str, Any]]:
+        """Mark up to `batch_size` PENDING approvals created before the cutoff as EXPIRED."""
+        with self._lock:
+            now = time.time()
+            expired = []
+            while len(expired) < batch_size:
+                due = self._pop_due(self._pending_by_time, created_before, pending=True)
+                if due is None:
+                    break
+                action_id, row = due
+                row["status"], row["timestamp"] = "EXPIRED", now
+                self._index_approval(action_id, row)
+                expired.append({"action_id": action_id, "agent_id": row["agent_id"]})
+            return expired
+
+    def archive_resolved_approvals(self, resolved_before: float, batch_size: int = 500) -> int:
+        """Move up to `batch_size` resolved approvals into approvals_history. Returns rows archived."""
+        with self._lock:
+            archived = 0
+            while archived < batch_size:
+                due = self._pop_due(self._resolved_by_time, resolved_before, pending=False)
+                if due is None:
+                    break
+                action_id, row = due
+                del self._approvals[action_id]
+                self._approvals_history[action_id] = {
+                    "agent_id": row["agent_id"], "action_type": row["action_type"], "target": row["target"],
+                    "status": row["status"], "timestamp": row["timestamp"]
+                }
+                archived += 1
+            return archived
+
+    # --- Provenance Persistence ---
+    def load_roles(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._roles)
+
+    def intern_roles(self, names: Iterable[str]) -> Dict[str, int]:
+        """Assign integer IDs to role names (idempotent). Returns name -> role_id for the given names."""
+        names = list(dict.fromkeys(names))
+        with self._lock:
+            for name in names:
+                if name not in self._roles:
+                    self._roles[name] = len(self._roles) + 1  # ids start at 1, like INTEGER PRIMARY KEY
+            return {name: self._roles[name] for name in names}
+
+    def roles_generation(self) -> int:
+        with self._lock:
+            return len(self._roles)
+
+    def save_documents(self, rows: Iterable[Tuple[str, str, str, int]]) -> int:
+        """Upsert (doc_id, source_uri, content_hash, acl_bits) rows in a single transaction."""
+        encoded = [(doc_id, (uri, content_hash, bits)) for doc_id, uri, content_hash, bits in rows]
+        with self._lock:
+            self._documents.update(encoded)
+        return len(encoded)
+
+    def load_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        row = self._documents.get(doc_id)
+        if row:
+            return {"doc_id": doc_id, "source_uri": row[0], "content_hash": row[1], "acl_bits": row[2]}
+        return None
+
+    def count_documents(self) -> int:
+        return len(self._documents)
@@ -1,23 +1,89 @@
 import sqlite3
 import json
-from typing import Dict, Any, List, Optional
+import threading
+import weakref
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 import time
 
+from src.db.storage_backend import StorageBackend
+
 DATABASE_PATH = "./avara_state.db"
 
-class PersistentStore:
+class PersistentStore(StorageBackend):
     """
     Executes Database Persistence rules:
     - Maintains Agent Identity State across reboots
     - Stores Tool Registries persistently
     - Replaces in-memory representations for production
+    - The durable StorageBackend engine (see InMemoryStore for the in-process one)
+    - One long-lived connection per thread, in WAL mode so readers never wait on writers
     """
-    def __init__(self, db_path: str = DATABASE_PATH):
+    def __init__(
+        self,
+        db_path: str = DATABASE_PATH,
+        synchronous: str = "NORMAL",
+        cache_size_kib: int = 2048,
+        mmap_size: int = 256 * 1024 * 1024,
+        cached_statements: int = 256,
+        busy_timeout_seconds: float = 5.0
+    ):
+        # synchronous=NORMAL in WAL mode survives process crashes; a power loss can
+        # drop the last commits. Use "FULL" where that matters more than latency.
+        # cache_size_kib is per connection, i.e. per thread (~40 under the API's
+        # worker pool); reads beyond it are served from the mmap'd page cache.
         self.db_path = db_path
+        self.synchronous = synchronous
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self._local = threading.local()
+        # id(conn) -> (weak ref to the owning thread, conn); thread idents are reused, thread objects are not
+        self._connections: Dict[int, Tuple[weakref.ref, sqlite3.Connection]] = {}
+        self._connections_lock = threading.Lock()
         self._init_db()
 
+    def _connection(self) -> sqlite3.Connection:
+        """
+        This thread's connection, opened and tuned on first use. Use it as
+        `with self._connection() as conn:` - the block is one transaction,
+        committed on success and rolled back on error, exactly as before.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.busy_timeout_seconds,
+                cached_statements=self.cached_statements,
+                check_same_thread=False  # only close() touches it from another thread
+            )
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+            conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            self._local.conn = conn
+            with self._connections_lock:
+                # Drop connections whose threads have exited (e.g. a resized worker pool)
+                for key, (owner, old) in list(self._connections.items()):
+                    thread = owner()
+                    if thread is None or not thread.is_alive():
+                        del self._connections[key]
+                        old.close()
+                self._connections[id(conn)] = (weakref.ref(threading.current_thread()), conn)
+        return conn
+
+    def close(self):
+        """Close every thread's connection. Threads that use the store afterwards reopen theirs."""
+        with self._connections_lock:
+            connections, self._connections = [conn for _, conn in self._connections.values()], {}
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
+            # WAL is persistent in the database file; readers see the last commit while a write is in progress
+            conn.execute("PRAGMA journal_mode = WAL")
             cursor = conn.cursor()
             
             # Agent IAM Table
@@ -65,18 +131,56 @@ class PersistentStore:
                     timestamp REAL
                 )
             ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_approvals_status_ts
+                ON approvals (status, timestamp)
+            ''')
+            # The archiver's `status != 'PENDING'` cannot seek the index above; without this
+            # every sweep scans and sorts the whole pending backlog
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_approvals_resolved_ts
+                ON approvals (timestamp) WHERE status != 'PENDING'
+            ''')
+
+            # Compact history of resolved approvals (parameters dropped)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS approvals_history (
+                    action_id TEXT PRIMARY KEY,
+                    agent_id TEXT,
+                    action_type TEXT,
+                    target TEXT,
+                    status TEXT,
+                    resolved_at REAL
+                )
+            ''')
+
+            # RAG Provenance: roles interned to integer IDs, ACLs stored as role bitsets
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS roles (
+                    role_id INTEGER PRIMARY KEY,
+                    name TEXT UNIQUE
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    source_uri TEXT,
+                    content_hash TEXT,
+                    acl_bits BLOB
+                )
+            ''')
             conn.commit()
 
     # --- IAM Persistence ---
     def save_agent(self, agent_id: str, role_name: str, scopes: List[str], ttl: int):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             conn.execute(
                 "INSERT OR REPLACE INTO agents (agent_id, role_name, scopes, created_at, ttl_seconds) VALUES (?, ?, ?, ?, ?)",
                 (agent_id, role_name, json.dumps(scopes), time.time(), ttl)
             )
 
     def load_agent(self, agent_id: str) -> Optional[Dict[str, Any]]:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.execute("SELECT role_name, scopes, created_at, ttl_seconds FROM agents WHERE agent_id = ?", (agent_id,))
             row = cursor.fetchone()
             if row:
@@ -89,19 +193,19 @@ class PersistentStore:
         return None
 
     def delete_agent(self, agent_id: str):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             conn.execute("DELETE FROM agents WHERE agent_id = ?", (agent_id,))
 
     # --- Tool Persistence ---
     def save_tool(self, name: str, desc: str, schema: dict, perms: list):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             conn.execute(
                 "INSERT OR REPLACE INTO tools (name, description, parameters_schema, required_permissions, is_active) VALUES (?, ?, ?, ?, ?)",
                 (name, desc, json.dumps(schema), json.dumps(perms), True)
             )
 
     def load_tool(self, name: str) -> Optional[Dict[str, Any]]:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.execute("SELECT description, parameters_schema, required_permissions, is_active FROM tools WHERE name = ?", (name,))
             row = cursor.fetchone()
             if row:
@@ -113,9 +217,31 @@ class PersistentStore:
                 }
         return None
 
+    def save_tools(self, rows: Iterable[tuple]):
+        """Bulk upsert of (name, description, schema, permissions, is_active) rows in one transaction."""
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO tools (name, description, parameters_schema, required_permissions, is_active) VALUES (?, ?, ?, ?, ?)",
+                ((name, desc, json.dumps(schema), json.dumps(perms), bool(active)) for name, desc, schema, perms, active in rows)
+            )
+
+    def load_all_tools(self) -> List[Dict[str, Any]]:
+        with self._connection() as conn:
+            cursor = conn.execute("SELECT name, description, parameters_schema, required_permissions, is_active FROM tools")
+            return [
+                {
+                    "name": row[0],
+                    "description": row[1],
+                    "parameters_schema": json.loads(row[2]),
+                    "required_permissions": json.loads(row[3]),
+                    "is_active": bool(row[4])
+                }
+                for row in cursor.fetchall()
+            ]
+
     # --- Anomaly Execution Persistence ---
     def log_execution(self, agent_id: str, action: str, target: str):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             conn.execute(
                 "INSERT INTO executions (agent_id, action_type, target, timestamp) VALUES (?, ?, ?, ?)",
                 (agent_id, action, target, time.time())
@@ -123,7 +249,7 @@ class PersistentStore:
 
     def get_recent_executions(self, agent_id: str, seconds_ago: float) -> List[Dict[str, Any]]:
         threshold = time.time() - seconds_ago
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.execute(
                 "SELECT action_type, target, timestamp FROM executions WHERE agent_id = ? AND timestamp > ?",
                 (agent_id, threshold)
@@ -132,14 +258,14 @@ class PersistentStore:
 
     # --- Approvals Persistence ---
     def save_approval(self, action_id: str, agent_id: str, action_type: str, target: str, parameters: dict, status: str = "PENDING"):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             conn.execute(
                 "INSERT OR REPLACE INTO approvals (action_id, agent_id, action_type, target, parameters, status, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
                 (action_id, agent_id, action_type, target, json.dumps(parameters), status, time.time())
             )
 
     def get_approval(self, action_id: str) -> Optional[Dict[str, Any]]:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.execute("SELECT agent_id, action_type, target, parameters, status, timestamp FROM approvals WHERE action_id = ?", (action_id,))
             row = cursor.fetchone()
             if row:
@@ -152,9 +278,114 @@ class PersistentStore:
                     "status": row[4],
                     "timestamp": row[5]
                 }
+            # Fall back to the compact history for archived approvals
+            cursor = conn.execute("SELECT agent_id, action_type, target, status, resolved_at FROM approvals_history WHERE action_id = ?", (action_id,))
+            row = cursor.fetchone()
+            if row:
+                return {
+                    "action_id": action_id,
+                    "agent_id": row[0],
+                    "action_type": row[1],
+                    "target": row[2],
+                    "parameters": {},
+                    "status": row[3],
+                    "timestamp": row[4]
+                }
         return None
 
     def update_approval_status(self, action_id: str, new_status: str):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             conn.execute("UPDATE approvals SET status = ?, timestamp = ? WHERE action_id = ?", (new_status, time.time(), action_id))
 
+    def resolve_pending_approval(self, action_id: str, new_status: str) -> bool:
+        """Atomically move an approval out of PENDING. Returns False if it was already resolved."""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE approvals SET status = ?, timestamp = ? WHERE action_id = ? AND status = 'PENDING'",
+                (new_status, time.time(), action_id)
+            )
+            return cursor.rowcount == 1
+
+    def expire_pending_approvals(self, created_before: float, batch_size: int = 500) -> List[Dict[str, Any]]:
+        """Mark up to `batch_size` PENDING approvals created before the cutoff as EXPIRED."""
+        with self._connection() as conn:
+            # One statement selects and updates, so an approval resolved concurrently is
+            # neither overwritten nor reported; only rows actually expired are returned.
+            # `+status` keeps the planner on the primary key for the outer match instead
+            # of walking every pending row through the status index
+            rows = conn.execute(
+                "UPDATE approvals SET status = 'EXPIRED', timestamp = ? "
+                "WHERE +status = 'PENDING' AND action_id IN ("
+                "SELECT action_id FROM approvals WHERE status = 'PENDING' AND timestamp < ? ORDER BY timestamp LIMIT ?"
+                ") RETURNING action_id, agent_id",
+                (time.time(), created_before, batch_size)
+            ).fetchall()
+            return [{"action_id": row[0], "agent_id": row[1]} for row in rows]
+
+    def archive_resolved_approvals(self, resolved_before: float, batch_size: int = 500) -> int:
+        """Move up to `batch_size` resolved approvals into approvals_history. Returns rows archived."""
+        with self._connection() as conn:
+            ids = [row[0] for row in conn.execute(
+                "SELECT action_id FROM approvals WHERE status != 'PENDING' AND timestamp < ? ORDER BY timestamp LIMIT ?",
+                (resolved_before, batch_size)
+            ).fetchall()]
+            if not ids:
+                return 0
+            placeholders = ",".join("?" * len(ids))
+            conn.execute(
+                f"INSERT OR REPLACE INTO approvals_history (action_id, agent_id, action_type, target, status, resolved_at) "
+                f"SELECT action_id, agent_id, action_type, target, status, timestamp FROM approvals WHERE action_id IN ({placeholders})",
+                ids
+            )
+            conn.execute(f"DELETE FROM approvals WHERE action_id IN ({placeholders})", ids)
+            return len(ids)
+
+    # --- Provenance Persistence ---
+    @staticmethod
+    def _encode_bits(bits: int) -> bytes:
+        return bits.to_bytes(max(1, (bits.bit_length() + 7) // 8), "little")
+
+    def load_roles(self) -> Dict[str, int]:
+        with self._connection() as conn:
+            return {name: role_id for role_id, name in conn.execute("SELECT role_id, name FROM roles")}
+
+    def intern_roles(self, names: Iterable[str]) -> Dict[str, int]:
+        """Assign integer IDs to role names (idempotent). Returns name -> role_id for the given names."""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+        with self._connection() as conn:
+            conn.executemany("INSERT OR IGNORE INTO roles (name) VALUES (?)", [(n,) for n in names])
+            placeholders = ",".join("?" * len(names))
+            return {name: role_id for role_id, name in conn.execute(f"SELECT role_id, name FROM roles WHERE name IN ({placeholders})", names)}
+
+    def roles_generation(self) -> int:
+        # role_id is the rowid and roles are never deleted, so the highest id only grows
+        with self._connection() as conn:
+            return conn.execute("SELECT COALESCE(MAX(role_id), 0) FROM roles").fetchone()[0]
+
+    def save_documents(self, rows: Iterable[Tuple[str, str, str, int]]) -> int:
+        """Upsert (doc_id, source_uri, content_hash, acl_bits) rows in a single transaction."""
+        encoded = [(doc_id, uri, content_hash, self._encode_bits(bits)) for doc_id, uri, content_hash, bits in rows]
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO documents (doc_id, source_uri, content_hash, acl_bits) VALUES (?, ?, ?, ?)",
+                encoded
+            )
+        return len(encoded)
+
+    def load_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._connection() as conn:
+            row = conn.execute("SELECT source_uri, content_hash, acl_bits FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+            if row:
+                return {
+                    "doc_id": doc_id,
+                    "source_uri": row[0],
+                    "content_hash": row[1],
+                    "acl_bits": int.from_bytes(row[2], "little")
+                }
+        return None
+
+    def count_documents(self) -> int:
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
@@ -0,0 +1,111 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+# e.g. "memory://" or "sqlite:///var/lib/avara/state.db"
+STORAGE_URL_ENV_VAR = "AVARA_STORAGE_URL"
+
+class StorageBackend(ABC):
+    """
+    Storage contract shared by every engine:
+    - Identities, tools, execution history, approvals and RAG provenance
+    - Rows go in and come out as plain Python values (JSON-compatible), never engine objects
+    - Thread-safe; each call is atomic
+    """
+
+    # --- IAM ---
+    @abstractmethod
+    def save_agent(self, agent_id: str, role_name: str, scopes: List[str], ttl: int): ...
+
+    @abstractmethod
+    def load_agent(self, agent_id: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def delete_agent(self, agent_id: str): ...
+
+    # --- Tools ---
+    @abstractmethod
+    def save_tool(self, name: str, desc: str, schema: dict, perms: list): ...
+
+    @abstractmethod
+    def load_tool(self, name: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def save_tools(self, rows: Iterable[tuple]):
+        """Bulk upsert of (name, description, schema, permissions, is_active) rows in one transaction."""
+
+    @abstractmethod
+    def load_all_tools(self) -> List[Dict[str, Any]]: ...
+
+    # --- Executions ---
+    @abstractmethod
+    def log_execution(self, agent_id: str, action: str, target: str): ...
+
+    @abstractmethod
+    def get_recent_executions(self, agent_id: str, seconds_ago: float) -> List[Dict[str, Any]]: ...
+
+    # --- Approvals ---
+    @abstractmethod
+    def save_approval(self, action_id: str, agent_id: str, action_type: str, target: str, parameters: dict, status: str = "PENDING"): ...
+
+    @abstractmethod
+    def get_approval(self, action_id: str) -> Optional[Dict[str, Any]]:
+        """Live approval, or its archived history row (with empty parameters)."""
+
+    @abstractmethod
+    def update_approval_status(self, action_id: str, new_status: str): ...
+
+    @abstractmethod
+    def resolve_pending_approval(self, action_id: str, new_status: str) -> bool:
+        """Atomically move an approval out of PENDING. Returns False if it was already resolved."""
+
+    @abstractmethod
+    def expire_pending_approvals(self, created_before: float, batch_size: int = 500) -> List[Dict[str, Any]]:
+        """Mark up to `batch_size` PENDING approvals created before the cutoff (oldest first) as EXPIRED."""
+
+    @abstractmethod
+    def archive_resolved_approvals(self, resolved_before: float, batch_size: int = 500) -> int:
+        """Move up to `batch_size` resolved approvals (oldest first) into history. Returns rows archived."""
+
+    # --- Provenance ---
+    @abstractmethod
+    def load_roles(self) -> Dict[str, int]: ...
+
+    @abstractmethod
+    def intern_roles(self, names: Iterable[str]) -> Dict[str, int]:
+        """Assign integer IDs to role names (idempotent). Returns name -> role_id for the given names."""
+
+    @abstractmethod
+    def roles_generation(self) -> int:
+        """Counter that grows whenever a role is interned (by any process); roles are never deleted."""
+
+    @abstractmethod
+    def save_documents(self, rows: Iterable[Tuple[str, str, str, int]]) -> int:
+        """Upsert (doc_id, source_uri, content_hash, acl_bits) rows in a single transaction."""
+
+    @abstractmethod
+    def load_document(self, doc_id: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def count_documents(self) -> int: ...
+
+    # --- Lifecycle ---
+    def close(self):
+        """Release engine resources. The default engine-less implementation does nothing."""
+
+def open_store(url: Optional[str] = None) -> StorageBackend:
+    """
+    Storage engine for a URL (default: $AVARA_STORAGE_URL, else the SQLite file
+    at persistent_store.DATABASE_PATH):
+    - memory://             in-process dicts; fast, not durable
+    - sqlite:///<path>      SQLite file (sqlite:////abs/path for absolute paths)
+    """
+    from src.db.memory_store import InMemoryStore
+    from src.db.persistent_store import DATABASE_PATH, PersistentStore
+
+    url = url or os.environ.get(STORAGE_URL_ENV_VAR) or f"sqlite:///{DATABASE_PATH}"
+    if url == "memory://":
+        return InMemoryStore()
+    if url.startswith("sqlite:///"):
+        return PersistentStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported storage URL: {url!r} (use memory:// or sqlite:///<path>)")
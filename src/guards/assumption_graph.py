@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+# A taint label: (agent that first introduced it, the unverified assumption)
+TaintLabel = Tuple[str, str]
+
+# Held in place of the labels an agent could not track past `max_labels_per_agent`;
+# no assumption resolves it, so a saturated agent stays tainted until evicted
+TAINT_OVERFLOW: TaintLabel = ("*", "*taint label limit reached*")
+
+class AssumptionEdge:
+    """Sender -> receiver channel with the assumptions and taint it has carried."""
+    __slots__ = ("assumptions", "taint", "messages")
+
+    def __init__(self):
+        self.assumptions: Set[str] = set()
+        self.taint: Set[TaintLabel] = set()
+        self.messages = 0
+
+class AssumptionGraph:
+    """
+    Executes Assumption Propagation rules:
+    - Maintains a directed sender -> receiver graph of delivered messages
+    - Taint flows forward only: a message carries the taint its sender holds when it
+      is sent, so laundering through intermediaries is caught without tainting agents
+      that were messaged before the sender became tainted
+    - Recording a message costs O(labels it carries), never a graph traversal
+    - Agents and edges are bounded LRU maps; the least recently active are evicted
+      (with their taint) once `max_agents` / `max_edges` is reached, and an agent
+      or edge tracks at most `max_labels_per_agent` labels (see TAINT_OVERFLOW)
+    - Resolving an assumption clears its labels from exactly the agents holding them;
+      edges keep the taint they carried as history
+    """
+    def __init__(self, max_assumptions_per_edge: int = 64, max_agents: int = 100000, max_edges: int = 500000, max_labels_per_agent: int = 64):
+        self.max_assumptions_per_edge = max_assumptions_per_edge
+        self.max_labels_per_agent = max_labels_per_agent
+        self.max_agents = max_agents
+        self.max_edges = max_edges
+        self._successors: Dict[str, Set[str]] = {}
+        self._edges: "OrderedDict[Tuple[str, str], AssumptionEdge]" = OrderedDict()
+        # Tainted agents only, least recently active first
+        self._taint: "OrderedDict[str, Set[TaintLabel]]" = OrderedDict()
+        # label -> agents holding it, and assumption -> its labels, for O(affected) clearing
+        self._holders: Dict[TaintLabel, Set[str]] = {}
+        self._labels_by_assumption: Dict[str, Set[TaintLabel]] = {}
+        self._evicted_agents = 0
+        self._evicted_edges = 0
+        self._lock = threading.Lock()
+
+    # --- Bounded maps ---
+    def _touch_edge(self, sender_id: str, receiver_id: str) -> AssumptionEdge:
+        key = (sender_id, receiver_id)
+        edge = self._edges.get(key)
+        if edge is not None:
+            self._edges.move_to_end(key)
+            return edge
+        if len(self._edges) >= self.max_edges:
+            (old_sender, old_receiver), _ = self._edges.popitem(last=False)
+            successors = self._successors[old_sender]
+            successors.discard(old_receiver)
+            if not successors:
+                del self._successors[old_sender]
+            self._evicted_edges += 1
+        edge = self._edges[key] = AssumptionEdge()
+        self._successors.setdefault(sender_id, set()).add(receiver_id)
+        return edge
+
+    def _add_taint(self, agent_id: str, labels: Set[TaintLabel]):
+        held = self._taint.get(agent_id)
+        if held is None:
+            if len(self._taint) >= self.max_agents:
+                self._drop_agent(*self._taint.popitem(last=False))
+                self._evicted_agents += 1
+            held = self._taint[agent_id] = set()
+        else:
+            self._taint.move_to_end(agent_id)
+        for label in self._capped(held, labels):
+            self._holders.setdefault(label, set()).add(agent_id)
+            self._labels_by_assumption.setdefault(label[1], set()).add(label)
+
+    def _capped(self, held: Set[TaintLabel], labels: Set[TaintLabel]) -> List[TaintLabel]:
+        """Add `labels` to `held` up to the label limit. Returns the labels actually added."""
+        added = []
+        for label in labels - held:
+            if len(held) >= self.max_labels_per_agent:
+                if TAINT_OVERFLOW not in held:
+                    held.add(TAINT_OVERFLOW)
+                    added.append(TAINT_OVERFLOW)
+                break
+            held.add(label)
+            added.append(label)
+        return added
+
+    def _drop_agent(self, agent_id: str, labels: Set[TaintLabel]):
+        for label in labels:
+            holders = self._holders.get(label)
+            if holders is None:
+                continue
+            holders.discard(agent_id)
+            if not holders:
+                del self._holders[label]
+                by_assumption = self._labels_by_assumption.get(label[1])
+                if by_assumption is not None:
+                    by_assumption.discard(label)
+                    if not by_assumption:
+                        del self._labels_by_assumption[label[1]]
+
+    # --- Recording ---
+    def record_message(self, sender_id: str, receiver_id: str, assumptions: Iterable[str], tainted_assumptions: Iterable[str]) -> FrozenSet[TaintLabel]:
+        """
+        Add one delivered message to the graph. The receiver inherits the taint the
+        sender holds now plus the message's own unverified assumptions.
+        Returns the taint now held by the receiver.
+        """
+        with self._lock:
+            edge = self._touch_edge(sender_id, receiver_id)
+            edge.messages += 1
+            for assumption in assumptions:
+                if len(edge.assumptions) >= self.max_assumptions_per_edge:
+                    break
+                edge.assumptions.add(assumption)
+
+            incoming = set(self._taint.get(sender_id, ()))
+            incoming.update((sender_id, a) for a in tainted_assumptions)
+            if incoming:
+                self._capped(edge.taint, incoming)
+                self._add_taint(receiver_id, incoming)
+            return frozenset(self._taint.get(receiver_id, ()))
+
+    def input_taint(self, sender_id: str, tainted_assumptions: Iterable[str]) -> FrozenSet[TaintLabel]:
+        """Taint a message would carry (sender's taint + its own unverified assumptions), without recording it."""
+        with self._lock:
+            labels = set(self._taint.get(sender_id, ()))
+        labels.update((sender_id, a) for a in tainted_assumptions)
+        return frozenset(labels)
+
+    def taint_of(self, agent_id: str) -> FrozenSet[TaintLabel]:
+        with self._lock:
+            return frozenset(self._taint.get(agent_id, ()))
+
+    def resolve_assumption(self, assumption: str) -> int:
+        """An assumption was verified out-of-band: clear its labels everywhere. Returns agents cleared."""
+        with self._lock:
+            labels = self._labels_by_assumption.pop(assumption, set())
+            cleared: Set[str] = set()
+            for label in labels:
+                for node in self._holders.pop(label, ()):
+                    held = self._taint[node]
+                    held.discard(label)
+                    if not held:
+                        del self._taint[node]
+                    cleared.add(node)
+            return len(cleared)
+
+    def edges_from(self, sender_id: str) -> List[Tuple[str, AssumptionEdge]]:
+        with self._lock:
+            return [(succ, self._edges[(sender_id, succ)]) for succ in self._successors.get(sender_id, ())]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "agents": len(set(self._successors) | {r for _, r in self._edges}),
+                "edges": len(self._edges),
+                "tainted_agents": len(self._taint),
+                "taint_labels": len(self._holders),
+                "evicted_agents": self._evicted_agents,
+                "evicted_edges": self._evicted_edges
+            }
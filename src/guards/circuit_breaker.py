@@ -39,16 +39,23 @@ class CircuitBreaker:
             "execute_payment"
         }
         
+    def classify(self, action: AgentAction) -> CircuitBreakerStatus:
+        """Breaker verdict without the console report (used by decision replay)."""
+        if action.action_type in self.high_risk_actions or action.risk_level == ActionRiskLevel.HIGH:
+            return CircuitBreakerStatus.HALT_REQUIRE_APPROVAL
+        return CircuitBreakerStatus.ALLOW
+
     def evaluate_action(self, action: AgentAction) -> CircuitBreakerStatus:
         """
         Evaluate an action synchronously before allowing execution.
         """
-        if action.action_type in self.high_risk_actions or action.risk_level == ActionRiskLevel.HIGH:
+        status = self.classify(action)
+        if status == CircuitBreakerStatus.HALT_REQUIRE_APPROVAL:
             print(f"CIRCUIT BREAKER: High-risk action detected -> '{action.action_type}' on '{action.target_resource}'.")
-            return CircuitBreakerStatus.HALT_REQUIRE_APPROVAL
+            return status
             
         print(f"CIRCUIT BREAKER: Action '{action.action_type}' allowed.")
-        return CircuitBreakerStatus.ALLOW
+        return status
 
     def request_human_approval(self, action: AgentAction) -> bool:
         """
@@ -1,11 +1,58 @@
-from dataclasses import dataclass
-from typing import List, Dict, Optional
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, List, Dict, Optional
+
+from src.core.lru_cache import LRUCache
+from src.guards.tokenizer import HeuristicTokenizer, Tokenizer
+
+class UnknownSessionError(LookupError):
+    """No context session for the agent (never opened, or ended by the client)."""
+
+class SessionEvictedError(UnknownSessionError):
+    """The session was evicted (idle TTL, session cap or memory budget); resend it with reset."""
+
+@dataclass
+class ContextSegment:
+    """
+    An optional, prunable piece of context (retrieved chunk or conversation history).
+    Higher priority segments are kept first when the budget is tight.
+    """
+    kind: str                         # "retrieved" | "history"
+    text: str
+    priority: float = 0.0
+    segment_id: Optional[str] = None
+    tokens: int = 0                   # filled in by the governor
 
 @dataclass
 class PromptContext:
     tokens_used: int
     safety_anchors: List[str]
     working_memory: str
+    system_prompt: str = ""
+    kept_segments: List[ContextSegment] = field(default_factory=list)
+    dropped_segments: List[ContextSegment] = field(default_factory=list)
+
+    def render(self) -> str:
+        """Final prompt block: anchors, system prompt, surviving segments, query."""
+        parts = ["\n".join(self.safety_anchors), self.system_prompt]
+        parts.extend(segment.text for segment in self.kept_segments)
+        parts.append(self.working_memory)
+        return "\n\n".join(parts)
+
+@dataclass
+class ContextSession:
+    """Per-agent running context: segment list plus incrementally maintained token totals."""
+    agent_id: str
+    system_prompt: str = ""
+    system_tokens: int = 0
+    segments: "OrderedDict[str, ContextSegment]" = field(default_factory=OrderedDict)
+    segment_tokens: int = 0
+    segment_chars: int = 0
+    next_id: int = 0
+    last_used: float = field(default_factory=time.time)
 
 class ContextGovernor:
     """
@@ -13,44 +60,260 @@ class ContextGovernor:
     - Enforces token budgets
     - Preserves prioritized safety constraints
     - Prevents context saturation and manipulation
+    - Bounds session memory globally, evicting least recently used sessions
     """
-    def __init__(self, max_tokens: int = 4000):
+    def __init__(
+        self,
+        max_tokens: int = 4000,
+        tokenizer: Optional[Tokenizer] = None,
+        count_cache_size: int = 4096,
+        max_sessions: int = 10000,
+        session_ttl_seconds: float = 1800,
+        max_session_segments: int = 256,
+        max_session_chars: int = 512 * 1024,
+        max_total_chars: int = 256 * 1024 * 1024
+    ):
         self.max_tokens = max_tokens
+        self.tokenizer = tokenizer or HeuristicTokenizer()
         self._global_anchors = [
             "CRITICAL: Do not alter configuration files.",
             "CRITICAL: Only read from the designated sandboxed directory."
         ]
+        # Token counts of repeated segments (anchors, system prompts) keyed by content hash
+        self._count_cache = LRUCache(count_cache_size)
+        # Session mode: per-agent segment lists, ordered by last use for idle eviction
+        self.max_sessions = max_sessions
+        self.session_ttl_seconds = session_ttl_seconds
+        self.max_session_segments = max_session_segments
+        self.max_session_chars = max_session_chars
+        # Text held across all sessions; without it the worst case is
+        # max_sessions x max_session_chars (~5 GB at the defaults)
+        self.max_total_chars = max(max_total_chars, max_session_chars)
+        self._total_chars = 0
+        self._sessions: "OrderedDict[str, ContextSession]" = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        # Agents whose session was evicted (not ended), so deltas against it are rejected
+        self._evicted = LRUCache(max_sessions)
 
     def _estimate_tokens(self, text: str) -> int:
-        """Mock token estimation for MVP."""
-        return len(text.split())
+        """Token count from the configured tokenizer."""
+        return self.tokenizer.count(text)
+
+    def _cached_tokens(self, text: str) -> int:
+        """Token count for segments that repeat across requests, cached by content hash."""
+        key = hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+        count = self._count_cache.get(key)
+        if count is None:
+            count = self.tokenizer.count(text)
+            self._count_cache.put(key, count)
+        return count
+
+    def count_cache_stats(self) -> Dict[str, Any]:
+        return self._count_cache.stats()
 
     def validate_budget(self, proposed_context_len: int) -> bool:
         """Check if context exceeds limits."""
         return proposed_context_len <= self.max_tokens
 
-    def prepare_context(self, dynamic_query: str, system_prompt: str) -> Optional[PromptContext]:
+    def _prune(self, segments: List[ContextSegment], budget: int) -> tuple:
+        """
+        Greedy one-pass pruning: walk segments by descending priority (ties keep
+        input order) and keep each one that still fits. Returns (kept, dropped, tokens used),
+        with kept segments in their original order.
+        """
+        separator = self._cached_tokens("\n\n")
+        order = sorted(range(len(segments)), key=lambda i: -segments[i].priority)
+        keep = set()
+        used = 0
+        for i in order:
+            segment = segments[i]
+            if not segment.tokens:
+                segment.tokens = self._cached_tokens(segment.text)
+            cost = segment.tokens + separator
+            if used + cost <= budget:
+                keep.add(i)
+                used += cost
+        kept = [seg for i, seg in enumerate(segments) if i in keep]
+        dropped = [seg for i, seg in enumerate(segments) if i not in keep]
+        return kept, dropped, used
+
+    def prepare_context(self, dynamic_query: str, system_prompt: str, segments: Optional[List[ContextSegment]] = None) -> Optional[PromptContext]:
         """
         Assembles a context block while strictly preserving safety guidelines 
         and enforcing budget limits.
+        Anchors, system prompt and query are mandatory; optional segments are
+        pruned by priority to fit instead of rejecting the whole request.
         """
         # Ensure safety anchors are never pruned
         anchors_block = "\n".join(self._global_anchors)
-        
-        # Assemble string to estimate
-        full_string = f"{anchors_block}\n\n{system_prompt}\n\n{dynamic_query}"
-        estimated_tokens = self._estimate_tokens(full_string)
+
+        # Anchors and system prompt repeat across requests; only the query is tokenized per call
+        estimated_tokens = (
+            self._cached_tokens(anchors_block)
+            + 2 * self._cached_tokens("\n\n")
+            + self._cached_tokens(system_prompt)
+            + self._estimate_tokens(dynamic_query)
+        )
         
         if not self.validate_budget(estimated_tokens):
             print(f"CONTEXT GOVERNOR Block: Context saturation. Used {estimated_tokens}/{self.max_tokens} tokens.")
-            # A real implementation would invoke priority-weighted pruning here.
-            # We mock a hard block for safety.
+            # Mandatory parts alone exceed the budget; nothing left to prune.
             return None
-            
+
+        kept, dropped, segment_tokens = self._prune(segments or [], self.max_tokens - estimated_tokens)
+        estimated_tokens += segment_tokens
+
+        if dropped:
+            print(f"CONTEXT GOVERNOR Prune: Dropped {len(dropped)} low-priority segment(s) to fit the budget.")
         print(f"CONTEXT GOVERNOR Pass: Context budget OK ({estimated_tokens}/{self.max_tokens}). Constraints re-anchored.")
         
         return PromptContext(
             tokens_used=estimated_tokens,
             safety_anchors=self._global_anchors,
-            working_memory=dynamic_query
+            working_memory=dynamic_query,
+            system_prompt=system_prompt,
+            kept_segments=kept,
+            dropped_segments=dropped
+        )
+
+    # --- Session mode (incremental per-conversation accounting) ---
+    @staticmethod
+    def _held_chars(session: ContextSession) -> int:
+        return session.segment_chars + len(session.system_prompt)
+
+    def _drop_session(self, agent_id: str, evicted: bool):
+        session = self._sessions.pop(agent_id)
+        self._total_chars -= self._held_chars(session)
+        if evicted:
+            self._evicted.put(agent_id, True)
+
+    def _evict_sessions(self, now: float, keep: Optional[str] = None):
+        # Sessions are ordered by last use, so idle eviction stops at the first live one
+        while self._sessions:
+            agent_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.session_ttl_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            self._drop_session(agent_id, evicted=True)
+        # Global memory budget: least recently used first, never the session being updated
+        while self._total_chars > self.max_total_chars:
+            agent_id = next(iter(self._sessions))
+            if agent_id == keep:
+                break
+            self._drop_session(agent_id, evicted=True)
+
+    def _remove_segment(self, session: ContextSession, segment_id: str):
+        segment = session.segments.pop(segment_id, None)
+        if segment:
+            session.segment_tokens -= segment.tokens
+            session.segment_chars -= len(segment.text)
+            self._total_chars -= len(segment.text)
+
+    def update_session(
+        self,
+        agent_id: str,
+        system_prompt: Optional[str] = None,
+        append: Optional[List[ContextSegment]] = None,
+        remove_ids: Optional[List[str]] = None,
+        reset: bool = False
+    ) -> ContextSession:
+        """
+        Apply a delta to an agent's session. Only appended segments (and a changed
+        system prompt) are tokenized; removals subtract their known counts.
+        Oldest segments are evicted once the per-session segment or size bound is hit.
+        Raises SessionEvictedError for a delta against an evicted session (unless `reset`).
+        """
+        now = time.time()
+        with self._sessions_lock:
+            self._evict_sessions(now)
+            session = self._sessions.get(agent_id)
+            if session is None and not reset and self._evicted.get(agent_id):
+                raise SessionEvictedError(f"Context session for {agent_id} was evicted; resend it with reset.")
+            if session is None or reset:
+                if session is not None:
+                    self._drop_session(agent_id, evicted=False)
+                self._evicted.pop(agent_id)
+                session = ContextSession(agent_id)
+                self._sessions[agent_id] = session
+            self._sessions.move_to_end(agent_id)
+            session.last_used = now
+
+            if system_prompt is not None and system_prompt != session.system_prompt:
+                self._total_chars += len(system_prompt) - len(session.system_prompt)
+                session.system_prompt = system_prompt
+                session.system_tokens = self._cached_tokens(system_prompt)
+
+            for segment_id in remove_ids or []:
+                self._remove_segment(session, segment_id)
+
+            for segment in append or []:
+                if segment.segment_id is None:
+                    segment.segment_id = f"t{session.next_id}"
+                session.next_id += 1
+                self._remove_segment(session, segment.segment_id)
+                segment.tokens = self._estimate_tokens(segment.text)
+                session.segments[segment.segment_id] = segment
+                session.segment_tokens += segment.tokens
+                session.segment_chars += len(segment.text)
+                self._total_chars += len(segment.text)
+
+            while session.segments and (len(session.segments) > self.max_session_segments or session.segment_chars > self.max_session_chars):
+                self._remove_segment(session, next(iter(session.segments)))
+
+            self._evict_sessions(now, keep=agent_id)
+            return session
+
+    def prepare_session_context(self, agent_id: str, dynamic_query: str) -> Optional[PromptContext]:
+        """
+        Budget check for a session using its running totals. Segments are only
+        re-ranked when the running total no longer fits. Returns None on saturation;
+        raises SessionEvictedError / UnknownSessionError when there is no session.
+        """
+        with self._sessions_lock:
+            session = self._sessions.get(agent_id)
+            if session is None:
+                if self._evicted.get(agent_id):
+                    raise SessionEvictedError(f"Context session for {agent_id} was evicted; resend it with reset.")
+                raise UnknownSessionError(f"No context session for {agent_id}.")
+            segments = list(session.segments.values())
+            system_prompt, system_tokens, segment_tokens = session.system_prompt, session.system_tokens, session.segment_tokens
+
+        separator = self._cached_tokens("\n\n")
+        mandatory = (
+            self._cached_tokens("\n".join(self._global_anchors))
+            + 2 * separator
+            + system_tokens
+            + self._estimate_tokens(dynamic_query)
+        )
+        if not self.validate_budget(mandatory):
+            print(f"CONTEXT GOVERNOR Block: Context saturation. Used {mandatory}/{self.max_tokens} tokens.")
+            return None
+
+        running = segment_tokens + separator * len(segments)
+        if self.validate_budget(mandatory + running):
+            kept, dropped, used = segments, [], running
+        else:
+            kept, dropped, used = self._prune(segments, self.max_tokens - mandatory)
+            print(f"CONTEXT GOVERNOR Prune: Dropped {len(dropped)} low-priority session segment(s) to fit the budget.")
+
+        print(f"CONTEXT GOVERNOR Pass: Session budget OK ({mandatory + used}/{self.max_tokens}). Constraints re-anchored.")
+        return PromptContext(
+            tokens_used=mandatory + used,
+            safety_anchors=self._global_anchors,
+            working_memory=dynamic_query,
+            system_prompt=system_prompt,
+            kept_segments=kept,
+            dropped_segments=dropped
         )
+
+    def end_session(self, agent_id: str):
+        with self._sessions_lock:
+            if agent_id in self._sessions:
+                self._drop_session(agent_id, evicted=False)
+            self._evicted.pop(agent_id)
+
+    def session_count(self) -> int:
+        return len(self._sessions)
+
+    def held_chars(self) -> int:
+        """Characters of system prompts and segments held across all sessions."""
+        return self._total_chars
@@ -0,0 +1,129 @@
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.core.lru_cache import LRUCache
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Function words carry no intent signal and only add hash collisions
+_STOPWORDS = frozenset({"a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "from", "by", "is", "it", "this", "that"})
+
+class HashingVectorizer:
+    """
+    Offline text vectorizer for drift scoring.
+    - Hashed bag-of-words plus character n-grams (no vocabulary to ship or fit)
+    - Sublinear term weighting, L2-normalized so dot product == cosine similarity
+    """
+    def __init__(self, n_features: int = 4096, char_ngram: int = 3, max_chars: int = 4096):
+        self.n_features = n_features
+        self.char_ngram = char_ngram
+        self.max_chars = max_chars
+
+    def _features(self, text: str) -> Dict[int, float]:
+        counts: Dict[int, float] = {}
+        n = self.char_ngram
+        for word in _WORD_RE.findall(text[:self.max_chars].lower()):
+            if word in _STOPWORDS:
+                continue
+            grams = [word]
+            padded = f" {word} "
+            if len(padded) > n:
+                grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+            for gram in grams:
+                idx = zlib.crc32(gram.encode()) % self.n_features
+                counts[idx] = counts.get(idx, 0.0) + 1.0
+        return counts
+
+    def transform_sparse(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, weights) of the normalized feature vector."""
+        counts = self._features(text)
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        weights /= np.linalg.norm(weights)
+        return indices, weights
+
+    def transform_dense(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.n_features, dtype=np.float32)
+        indices, weights = self.transform_sparse(text)
+        vec[indices] = weights
+        return vec
+
+    def transform_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Stack dense vectors into an (n_texts, n_features) matrix."""
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            indices, weights = self.transform_sparse(text)
+            matrix[row, indices] = weights
+        return matrix
+
+class EmbeddingDriftScorer:
+    """
+    Scores semantic drift between a task intent and a proposed action, fully offline.
+    - Task vectors are cached per agent (task_intent rarely changes within a run)
+    - Single validation = one sparse dot product against the cached task vector
+    - Batch scoring = one matrix-vector multiply
+    """
+    def __init__(self, vectorizer: Optional[HashingVectorizer] = None, cache_size: int = 4096):
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self._task_vectors = LRUCache(cache_size)
+        # Bumped whenever the vector space changes so dependent caches can invalidate
+        self.version = 1
+
+    @staticmethod
+    def action_text(action: str, resource: str = "", args: Optional[Dict[str, Any]] = None) -> str:
+        """Flatten action, resource and argument names/values into one document."""
+        parts = [action, resource]
+        for key, value in (args or {}).items():
+            parts.append(str(key))
+            parts.append(str(value))
+        return " ".join(parts)
+
+    def content_terms(self, action: str, resource: str = "", args: Optional[Dict[str, Any]] = None) -> int:
+        """Number of non-stopword words in the action document (how much evidence a drift score rests on)."""
+        text = self.action_text(action, resource, args)[:self.vectorizer.max_chars].lower()
+        return sum(1 for word in _WORD_RE.findall(text) if word not in _STOPWORDS)
+
+    def task_vector(self, task: str, agent_id: Optional[str] = None) -> np.ndarray:
+        key = agent_id if agent_id is not None else task
+        cached = self._task_vectors.get(key)
+        if cached is not None and cached[0] == task:
+            return cached[1]
+        vec = self.vectorizer.transform_dense(task)
+        self._task_vectors.put(key, (task, vec))
+        return vec
+
+    def similarity(self, task: str, action: str, resource: str = "", args: Optional[Dict[str, Any]] = None, agent_id: Optional[str] = None) -> float:
+        task_vec = self.task_vector(task, agent_id)
+        indices, weights = self.vectorizer.transform_sparse(self.action_text(action, resource, args))
+        if not len(indices):
+            return 0.0
+        return float(np.clip(task_vec[indices] @ weights, 0.0, 1.0))
+
+    def drift(self, task: str, action: str, resource: str = "", args: Optional[Dict[str, Any]] = None, agent_id: Optional[str] = None) -> float:
+        """0.0 = action shares the task's vocabulary, 1.0 = nothing in common."""
+        return 1.0 - self.similarity(task, action, resource, args, agent_id)
+
+    def drift_batch(self, task: str, actions: Sequence[Tuple[str, str, Optional[Dict[str, Any]]]], agent_id: Optional[str] = None) -> np.ndarray:
+        """Score many (action, resource, args) tuples against one task in a single matrix multiply."""
+        if not actions:
+            return np.empty(0, dtype=np.float32)
+        matrix = self.vectorizer.transform_batch([self.action_text(*a) for a in actions])
+        sims = np.clip(matrix @ self.task_vector(task, agent_id), 0.0, 1.0)
+        return 1.0 - sims
+
+    def set_vectorizer(self, vectorizer: HashingVectorizer):
+        """Swap the vector space. Cached task vectors and dependent memos are invalidated."""
+        self.vectorizer = vectorizer
+        self._task_vectors.clear()
+        self.version += 1
+
+    def clear_cache(self):
+        self._task_vectors.clear()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self._task_vectors.stats()
@@ -1,6 +1,11 @@
+import hashlib
+import json
 from enum import Enum, auto
 from dataclasses import dataclass
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.core.lru_cache import LRUCache
+from src.guards.drift_scorer import EmbeddingDriftScorer
 
 class ValidationDecision(Enum):
     ALLOW = auto()
@@ -13,6 +18,7 @@ class AgentState:
     proposed_action: str
     target_resource: str
     action_args: Dict[str, Any]
+    agent_id: Optional[str] = None
 
 class IntentValidator:
     """
@@ -22,41 +28,163 @@ class IntentValidator:
     - Blocks instruction hijacking
     - Stateless per action
     """
-    def __init__(self):
-        # Stub logic for semantic drift and instruction hijacking detection
-        pass
-        
-    def _detect_drift(self, task: str, action: str) -> float:
+    def __init__(
+        self,
+        drift_scorer: Optional[EmbeddingDriftScorer] = None,
+        embedding_weight: float = 0.5,
+        escalation_drift: float = 0.97,
+        min_evidence_terms: int = 6,
+        memo_size: int = 8192
+    ):
+        self.drift_scorer = drift_scorer or EmbeddingDriftScorer()
+        # Embedding drift has its own band. Below `escalation_drift` it is scaled into
+        # ALLOW (<= 0.5): terse benign actions ("Schedule a standup" / create_event)
+        # share no n-grams with their task and score a raw drift of 1.0. An action
+        # whose document has at least `min_evidence_terms` content words and still
+        # shares (almost) nothing with the task is escalated into REQUIRE_APPROVAL
+        # (0.6 - 0.8); only the explicit rules BLOCK.
+        # Calibration: benign actions with that much text scored <= 0.92, off-task
+        # ones (exfiltration, shell, payments) 1.0 - see tests/test_intent_validator.py
+        self.embedding_weight = embedding_weight
+        self.escalation_drift = escalation_drift
+        self.min_evidence_terms = min_evidence_terms
+        # (task keyword, action keyword, drift score) hijack signatures
+        self._drift_rules: List[Tuple[str, str, float]] = [
+            # Mock a drift if the agent tries to send an email when asked to parse a file.
+            ("analyze", "email", 0.9),
+            # Catch our Interactive Demo severe drift scenario:
+            ("summarize", "delete", 0.9),
+        ]
+        self._rules_version = 1
+        # Drift scores memoized by (task fingerprint, action fingerprint)
+        self._memo = LRUCache(memo_size)
+        self._memo_generation = self._generation()
+
+    # --- Drift rules & memo invalidation ---
+    def _generation(self) -> tuple:
+        return (self._rules_version, id(self.drift_scorer), self.drift_scorer.version, self.embedding_weight, self.escalation_drift, self.min_evidence_terms)
+
+    def set_drift_rules(self, rules: List[Tuple[str, str, float]]):
+        """Replace the hijack rules. Memoized scores are invalidated."""
+        self._drift_rules = [(task_kw.lower(), action_kw.lower(), score) for task_kw, action_kw, score in rules]
+        self._rules_version += 1
+
+    def add_drift_rule(self, task_keyword: str, action_keyword: str, score: float):
+        self.set_drift_rules(self._drift_rules + [(task_keyword, action_keyword, score)])
+
+    def set_drift_scorer(self, drift_scorer: EmbeddingDriftScorer):
+        """Swap the drift model. Memoized scores are invalidated."""
+        self.drift_scorer = drift_scorer
+
+    def _check_memo_generation(self):
+        generation = self._generation()
+        if generation != self._memo_generation:
+            self._memo.clear()
+            self._memo_generation = generation
+
+    def memo_stats(self) -> Dict[str, Any]:
+        return self._memo.stats()
+
+    @staticmethod
+    def _normalize_task(task: str) -> str:
+        return " ".join(task.lower().split())
+
+    @staticmethod
+    def _fingerprint(task: str, action: str, resource: str, args: Optional[Dict[str, Any]]) -> Tuple[bytes, bytes]:
+        task_fp = hashlib.blake2b(IntentValidator._normalize_task(task).encode(), digest_size=16).digest()
+        action_doc = json.dumps([action, resource, args or {}], sort_keys=True, default=str)
+        action_fp = hashlib.blake2b(action_doc.encode(), digest_size=16).digest()
+        return task_fp, action_fp
+
+    def _rule_drift(self, task: str, action: str) -> float:
+        """Explicit hijack signatures that are known to be severe."""
+        task_lower = task.lower()
+        action_lower = action.lower()
+        score = 0.1
+        for task_kw, action_kw, rule_score in self._drift_rules:
+            if task_kw in task_lower and action_kw in action_lower:
+                score = max(score, rule_score)
+        return score
+
+    def _embedding_score(self, embedding_drift: float, action: str, resource: str, args: Optional[Dict[str, Any]]) -> float:
+        """Map raw embedding drift into the decision scale (see __init__ for the bands)."""
+        if embedding_drift >= self.escalation_drift and self.drift_scorer.content_terms(action, resource, args) >= self.min_evidence_terms:
+            span = 1.0 - self.escalation_drift
+            return 0.6 + 0.2 * (min(1.0, (embedding_drift - self.escalation_drift) / span) if span > 0 else 1.0)
+        return self.embedding_weight * embedding_drift
+
+    def _detect_drift(self, task: str, action: str, resource: str = "", args: Optional[Dict[str, Any]] = None, agent_id: Optional[str] = None) -> float:
         """
-        Mock semantic drift detection.
+        Semantic drift detection.
         Returns a drift score from 0.0 (aligned) to 1.0 (hijacked/drifted).
         """
-        # A real implementation would use an LLM or embedding distance here.
-        # We mock a drift if the agent tries to send an email when asked to parse a file.
-        if "analyze" in task.lower() and "email" in action.lower():
-            return 0.9  
-        
-        # Catch our Interactive Demo severe drift scenario:
-        if "summarize" in task.lower() and "delete" in action.lower():
-            return 0.9
-            
-        return 0.1
-        
-    def validate_action(self, state: AgentState) -> ValidationDecision:
-        """
-        Validates the proposed action against the declared task intent.
-        """
-        drift_score = self._detect_drift(state.current_task, state.proposed_action)
-        
+        self._check_memo_generation()
+        key = self._fingerprint(task, action, resource, args)
+        score = self._memo.get(key)
+        if score is None:
+            embedding_drift = self.drift_scorer.drift(task, action, resource, args, agent_id)
+            score = max(self._rule_drift(task, action), self._embedding_score(embedding_drift, action, resource, args))
+            self._memo.put(key, score)
+        return score
+
+    @staticmethod
+    def decision_for(drift_score: float) -> ValidationDecision:
+        """Decision thresholds, without the console report (used by decision replay)."""
         if drift_score > 0.8:
-            print(f"INTENT VALIDATOR [BLOCK]: Severe semantic drift detected!")
-            print(f"  Task:   {state.current_task}")
-            print(f"  Action: {state.proposed_action} on {state.target_resource}")
             return ValidationDecision.BLOCK
-            
         elif drift_score > 0.5:
-            print(f"INTENT VALIDATOR [REQUIRE_APPROVAL]: Questionable alignment.")
             return ValidationDecision.REQUIRE_APPROVAL
-            
-        print(f"INTENT VALIDATOR [ALLOW]: Action aligned with task.")
         return ValidationDecision.ALLOW
+
+    def _decide(self, state: AgentState, drift_score: float) -> ValidationDecision:
+        decision = self.decision_for(drift_score)
+        if decision == ValidationDecision.BLOCK:
+            print(f"INTENT VALIDATOR [BLOCK]: Severe semantic drift detected!")
+            print(f"  Task:   {state.current_task}")
+            print(f"  Action: {state.proposed_action} on {state.target_resource}")
+        elif decision == ValidationDecision.REQUIRE_APPROVAL:
+            print(f"INTENT VALIDATOR [REQUIRE_APPROVAL]: Questionable alignment (drift {drift_score:.2f}).")
+        else:
+            print(f"INTENT VALIDATOR [ALLOW]: Action aligned with task.")
+        return decision
+
+    def validate_action(self, state: AgentState) -> ValidationDecision:
+        """
+        Validates the proposed action against the declared task intent.
+        """
+        drift_score = self._detect_drift(state.current_task, state.proposed_action, state.target_resource, state.action_args, state.agent_id)
+        return self._decide(state, drift_score)
+
+    def validate_actions(self, states: List[AgentState]) -> List[ValidationDecision]:
+        """
+        Batch variant of validate_action.
+        States sharing an agent and task are scored together in one matrix multiply.
+        """
+        return [self._decide(state, score) for state, score in zip(states, self.score_actions(states))]
+
+    def score_actions(self, states: List[AgentState]) -> List[float]:
+        """Drift scores for a batch of states, memoized like single validations."""
+        self._check_memo_generation()
+        scores: List[Optional[float]] = [None] * len(states)
+        keys = []
+        groups: Dict[tuple, List[int]] = {}
+        for i, state in enumerate(states):
+            key = self._fingerprint(state.current_task, state.proposed_action, state.target_resource, state.action_args)
+            keys.append(key)
+            scores[i] = self._memo.get(key)
+            if scores[i] is None:
+                groups.setdefault((state.agent_id, state.current_task), []).append(i)
+
+        for (agent_id, task), indices in groups.items():
+            drifts = self.drift_scorer.drift_batch(
+                task,
+                [(states[i].proposed_action, states[i].target_resource, states[i].action_args) for i in indices],
+                agent_id
+            )
+            for i, embedding_drift in zip(indices, drifts):
+                state = states[i]
+                embedding_score = self._embedding_score(float(embedding_drift), state.proposed_action, state.target_resource, state.action_args)
+                scores[i] = max(self._rule_drift(task, state.proposed_action), embedding_score)
+                self._memo.put(keys[i], scores[i])
+
+        return scores
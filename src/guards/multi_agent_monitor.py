@@ -1,7 +1,11 @@
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional
 import time
 
+from src.guards.assumption_graph import AssumptionGraph, TaintLabel
+from src.core.message_log import MessageLog, MessageRecord
+from src.core.pattern_matcher import SignatureMatcher, get_matcher
+
 @dataclass
 class AgentMessage:
     """Represents a message passed between agents."""
@@ -10,63 +14,136 @@ class AgentMessage:
     content: str
     assumptions: List[str]
     confidence_score: float  # 0.0 to 1.0
+    intended_action: Optional[str] = None  # action the receiver will take on this output, if declared
+
+@dataclass
+class MessageVerdict:
+    """Per-message outcome of monitor validation."""
+    sender_id: str
+    receiver_id: str
+    allowed: bool
+    reason: str
 
 class MultiAgentMonitor:
     """
     Executes Multi-Agent Safety Monitor rules:
-    - Logs agent-to-agent messages
-    - Tracks assumption propagation
+    - Logs agent-to-agent messages (bounded ring buffer, overflow spilled to disk)
+    - Tracks assumption propagation across agents (incremental taint graph)
+    - Blocks tainted inputs from reaching high-risk actions
     - Detects unsafe recomposition of outputs
     """
-    def __init__(self):
-        self._message_log: List[AgentMessage] = []
+    def __init__(
+        self,
+        log_capacity: int = 10000,
+        spill_dir: Optional[str] = None,
+        high_risk_actions: Optional[Iterable[str]] = None,
+        max_spill_segments: Optional[int] = None
+    ):
+        self._message_log = MessageLog(capacity=log_capacity, spill_dir=spill_dir, max_spill_segments=max_spill_segments)
+        self._assumption_graph = AssumptionGraph()
+        self.high_risk_actions = set(high_risk_actions or ())
         self._unsafe_keywords = ["override", "ignore restrictions", "bypass"]
+        self._unverified_markers = ["unverified"]
+        self._unsafe_matcher: SignatureMatcher = get_matcher(self._unsafe_keywords)
+        self._assumption_matcher: SignatureMatcher = get_matcher(self._unverified_markers)
+
+    def iter_messages(self, since_seq: int = 0) -> Iterator[MessageRecord]:
+        """Replay the message log in order, across spilled segments and memory."""
+        return self._message_log.iter_messages(since_seq)
+
+    def messages_between(self, sender_id: str, receiver_id: str) -> Iterator[MessageRecord]:
+        """Forensic query: every logged message from one agent to another."""
+        return self._message_log.messages_between(sender_id, receiver_id)
+
+    def close(self):
+        self._message_log.close()
 
     def _check_unsafe_recomposition(self, message: AgentMessage) -> bool:
         """
         Detects if combining outputs leads to unsafe emergent behavior.
         Mock implementation looking for contradiction tags or unsafe keywords.
         """
-        content_lower = message.content.lower()
-        for keyword in self._unsafe_keywords:
-            if keyword in content_lower:
-                return True
-        return False
+        return self._unsafe_matcher.contains_any(message.content)
         
-    def _verify_assumptions(self, assumptions: List[str]) -> bool:
+    def _unverified_assumptions(self, assumptions: List[str]) -> List[str]:
         """
         Validates propagated assumptions.
         E.g. If agent A assumes data is public, is it actually public?
         """
         # A real system would query the provenance/IAM layers here.
-        # We mock a rejection if an assumption explicitly states "unverified".
-        for assumption in assumptions:
-            if "unverified" in assumption.lower():
-                return False
-        return True
+        # We mock: an assumption that explicitly states "unverified" becomes taint.
+        return [a for a in assumptions if self._assumption_matcher.contains_any(a)]
 
-    def validate_message(self, message: AgentMessage) -> bool:
-        """
-        Intercepts message passing between agents.
-        Returns True if safe to deliver, False if blocked.
-        """
+    def taint_of(self, agent_id: str) -> FrozenSet[TaintLabel]:
+        """Unverified assumptions (with the agent that introduced them) reaching this agent."""
+        return self._assumption_graph.taint_of(agent_id)
+
+    def resolve_assumption(self, assumption: str) -> int:
+        """Mark an assumption as verified; its taint is cleared from every agent holding it."""
+        return self._assumption_graph.resolve_assumption(assumption)
+
+    def _evaluate(self, message: AgentMessage, unsafe: bool, unverified: List[str]) -> MessageVerdict:
         # 1. Log the message (required by rules)
-        self._message_log.append(message)
-        
+        self._message_log.append(message.sender_id, message.receiver_id, message.content, message.assumptions, message.confidence_score)
+
         # 2. Check confidence thresholds
         if message.confidence_score < 0.3:
-            print(f"MULTI-AGENT MONITOR Block: Downstream use of low-confidence output ({message.confidence_score}) from {message.sender_id}")
-            return False
+            reason = f"Downstream use of low-confidence output ({message.confidence_score}) from {message.sender_id}"
+            print(f"MULTI-AGENT MONITOR Block: {reason}")
+            return MessageVerdict(message.sender_id, message.receiver_id, False, reason)
 
-        # 3. Track assumption propagation
-        if not self._verify_assumptions(message.assumptions):
-            print(f"MULTI-AGENT MONITOR Block: Unsafe or unverified assumptions propagated by {message.sender_id}")
-            return False
+        # 3. Track assumption propagation: unverified assumptions (this message's or
+        # inherited through earlier hops) must not drive high-risk actions. A message
+        # that does not declare what the receiver will do with it cannot be cleared,
+        # so its own unverified assumptions still block delivery.
+        if unverified and message.intended_action is None:
+            reason = f"Unsafe or unverified assumptions propagated by {message.sender_id}"
+            print(f"MULTI-AGENT MONITOR Block: {reason}")
+            return MessageVerdict(message.sender_id, message.receiver_id, False, reason)
+        if message.intended_action in self.high_risk_actions:
+            taint = self._assumption_graph.input_taint(message.sender_id, unverified)
+            if taint:
+                origins = sorted({origin for origin, _ in taint})
+                reason = f"Unverified assumptions from {origins} would reach high-risk action '{message.intended_action}' via {message.sender_id}"
+                print(f"MULTI-AGENT MONITOR Block: {reason}")
+                return MessageVerdict(message.sender_id, message.receiver_id, False, reason)
 
         # 4. Detect unsafe recomposition
-        if self._check_unsafe_recomposition(message):
-            print(f"MULTI-AGENT MONITOR Block: Unsafe recomposition or bypass attempt detected between {message.sender_id} and {message.receiver_id}")
-            return False
+        if unsafe:
+            reason = f"Unsafe recomposition or bypass attempt detected between {message.sender_id} and {message.receiver_id}"
+            print(f"MULTI-AGENT MONITOR Block: {reason}")
+            return MessageVerdict(message.sender_id, message.receiver_id, False, reason)
 
+        self._assumption_graph.record_message(message.sender_id, message.receiver_id, message.assumptions, unverified)
         print(f"MULTI-AGENT MONITOR Pass: Message from {message.sender_id} to {message.receiver_id} validated.")
-        return True
+        return MessageVerdict(message.sender_id, message.receiver_id, True, "Delivered.")
+
+    def evaluate_message(self, message: AgentMessage) -> MessageVerdict:
+        """Intercepts message passing between agents and explains the decision."""
+        return self._evaluate(message, self._check_unsafe_recomposition(message), self._unverified_assumptions(message.assumptions))
+
+    def validate_message(self, message: AgentMessage) -> bool:
+        """
+        Intercepts message passing between agents.
+        Returns True if safe to deliver, False if blocked.
+        """
+        return self.evaluate_message(message).allowed
+
+    def validate_messages(self, messages: List[AgentMessage]) -> List[MessageVerdict]:
+        """
+        Batch variant for a whole orchestrator tick. Every distinct content and
+        assumption string is scanned once up front; messages are then evaluated
+        in order, so taint delivered earlier in the batch applies to later messages.
+        """
+        unsafe: Dict[str, bool] = {}
+        marked: Dict[str, bool] = {}
+        for message in messages:
+            if message.content not in unsafe:
+                unsafe[message.content] = self._unsafe_matcher.contains_any(message.content)
+            for assumption in message.assumptions:
+                if assumption not in marked:
+                    marked[assumption] = self._assumption_matcher.contains_any(assumption)
+        return [
+            self._evaluate(message, unsafe[message.content], [a for a in message.assumptions if marked[a]])
+            for message in messages
+        ]
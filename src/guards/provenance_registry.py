@@ -0,0 +1,192 @@
+import csv
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Union
+
+from src.core.lru_cache import LRUCache
+
+@dataclass
+class DocumentProvenance:
+    """Document Identity & Identity-based ACL tracking."""
+    doc_id: str
+    source_uri: str
+    allowed_roles: List[str]  # e.g. ["analyst", "admin"]
+    content_hash: str         # Ensure not maliciously altered (hex SHA-256, optional "sha256:" prefix)
+    acl_bits: int = 0         # allowed_roles as a bitset of interned role IDs (set by the registry)
+
+class ProvenanceRegistry:
+    """
+    Executes Provenance Registry rules:
+    - Persists document identity & ACLs in the store so they survive reboots
+    - Roles are interned into integer IDs and ACLs stored as bitsets (one bit test per check)
+    - Hot documents are served from an LRU cache in front of SQLite
+    - Roles in no ACL are negatively cached until the store's role generation moves
+    - Without a store, falls back to an in-memory registry
+    """
+    def __init__(self, store=None, cache_size: int = 65536, missing_role_cache_size: int = 4096):
+        self.store = store
+        self._lock = threading.Lock()
+        self._roles_generation = store.roles_generation() if store else 0
+        self._role_ids: Dict[str, int] = store.load_roles() if store else {}
+        self._role_names: Dict[int, str] = {rid: name for name, rid in self._role_ids.items()}
+        # role name -> roles generation at which it was found in no ACL
+        self._missing_roles = LRUCache(missing_role_cache_size)
+        self._cache = LRUCache(cache_size)
+        self._memory: Dict[str, DocumentProvenance] = {}
+
+    # --- Role interning ---
+    def _intern(self, names: Iterable[str]) -> Dict[str, int]:
+        names = list(dict.fromkeys(names))
+        if any(n not in self._role_ids for n in names):
+            with self._lock:
+                missing = [n for n in names if n not in self._role_ids]
+                if self.store:
+                    assigned = self.store.intern_roles(missing)
+                else:
+                    assigned = {name: len(self._role_ids) + 1 + i for i, name in enumerate(missing)}
+                self._role_ids.update(assigned)
+                self._role_names.update({rid: name for name, rid in assigned.items()})
+        return self._role_ids
+
+    def role_bit(self, role_name: str) -> int:
+        """Bitmask for a role; 0 if the role appears in no ACL."""
+        role_id = self._role_ids.get(role_name)
+        if role_id is None and self.store:
+            # Another process (e.g. a CLI bulk import) may have interned it since boot.
+            # The role table is only reloaded when its generation has moved.
+            generation = self.store.roles_generation()
+            if self._missing_roles.get(role_name) == generation:
+                return 0
+            if generation != self._roles_generation:
+                with self._lock:
+                    self._role_ids = self.store.load_roles()
+                    self._role_names = {rid: name for name, rid in self._role_ids.items()}
+                    self._roles_generation = generation
+            role_id = self._role_ids.get(role_name)
+            if role_id is None:
+                self._missing_roles.put(role_name, generation)
+        return 1 << role_id if role_id is not None else 0
+
+    def acl_bits(self, roles: Iterable[str]) -> int:
+        roles = list(roles)
+        role_ids = self._intern(roles)
+        bits = 0
+        for role in roles:
+            bits |= 1 << role_ids[role]
+        return bits
+
+    def _roles_from_bits(self, bits: int) -> List[str]:
+        roles = []
+        role_id = 0
+        while bits:
+            if bits & 1 and role_id in self._role_names:
+                roles.append(self._role_names[role_id])
+            bits >>= 1
+            role_id += 1
+        return roles
+
+    # --- Registration ---
+    def register(self, prov: DocumentProvenance):
+        self.register_many([prov])
+
+    def register_many(self, provs: Iterable[DocumentProvenance], batch_size: int = 5000) -> int:
+        """Register documents in batches (one transaction per batch). Returns the number registered."""
+        total = 0
+        batch: List[DocumentProvenance] = []
+        for prov in provs:
+            batch.append(prov)
+            if len(batch) >= batch_size:
+                total += self._flush(batch)
+                batch = []
+        if batch:
+            total += self._flush(batch)
+        return total
+
+    def _flush(self, batch: List[DocumentProvenance]) -> int:
+        self._intern(role for prov in batch for role in prov.allowed_roles)
+        for prov in batch:
+            prov.acl_bits = self.acl_bits(prov.allowed_roles)
+        if self.store:
+            self.store.save_documents((p.doc_id, p.source_uri, p.content_hash, p.acl_bits) for p in batch)
+            for prov in batch:
+                self._cache.pop(prov.doc_id)
+        else:
+            for prov in batch:
+                self._memory[prov.doc_id] = prov
+        return len(batch)
+
+    # --- Lookup ---
+    def get(self, doc_id: str) -> Optional[DocumentProvenance]:
+        if not self.store:
+            return self._memory.get(doc_id)
+        prov = self._cache.get(doc_id)
+        if prov is not None:
+            return prov
+        row = self.store.load_document(doc_id)
+        if not row:
+            return None
+        prov = DocumentProvenance(
+            doc_id=doc_id,
+            source_uri=row["source_uri"],
+            allowed_roles=self._roles_from_bits(row["acl_bits"]),
+            content_hash=row["content_hash"],
+            acl_bits=row["acl_bits"]
+        )
+        self._cache.put(doc_id, prov)
+        return prov
+
+    def __contains__(self, doc_id: str) -> bool:
+        return self.get(doc_id) is not None
+
+    def invalidate(self, doc_id: Optional[str] = None):
+        """Drop one (or every) cached document, e.g. after an out-of-process import."""
+        if doc_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(doc_id)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    # --- Bulk import ---
+    @staticmethod
+    def _open(source: Union[str, TextIO]) -> TextIO:
+        return open(source, "r", newline="", encoding="utf-8") if isinstance(source, str) else source
+
+    @staticmethod
+    def _split_roles(value: Any) -> List[str]:
+        if isinstance(value, list):
+            return [str(r) for r in value]
+        return [r.strip() for r in str(value or "").split(";") if r.strip()]
+
+    def _iter_jsonl(self, fh: TextIO) -> Iterator[DocumentProvenance]:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            yield DocumentProvenance(rec["doc_id"], rec.get("source_uri", ""), self._split_roles(rec.get("allowed_roles")), rec.get("content_hash", ""))
+
+    def _iter_csv(self, fh: TextIO) -> Iterator[DocumentProvenance]:
+        # Columns: doc_id, source_uri, allowed_roles (";"-separated), content_hash
+        for rec in csv.DictReader(fh):
+            yield DocumentProvenance(rec["doc_id"], rec.get("source_uri") or "", self._split_roles(rec.get("allowed_roles")), rec.get("content_hash") or "")
+
+    def import_jsonl(self, source: Union[str, TextIO], batch_size: int = 5000) -> int:
+        """Stream provenance records from a JSONL file (one object per line)."""
+        fh = self._open(source)
+        try:
+            return self.register_many(self._iter_jsonl(fh), batch_size)
+        finally:
+            if fh is not source:
+                fh.close()
+
+    def import_csv(self, source: Union[str, TextIO], batch_size: int = 5000) -> int:
+        """Stream provenance records from a CSV file with a header row."""
+        fh = self._open(source)
+        try:
+            return self.register_many(self._iter_csv(fh), batch_size)
+        finally:
+            if fh is not source:
+                fh.close()
@@ -1,14 +1,12 @@
+import hashlib
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Tuple
 import uuid
 
-@dataclass
-class DocumentProvenance:
-    """Document Identity & Identity-based ACL tracking."""
-    doc_id: str
-    source_uri: str
-    allowed_roles: List[str]  # e.g. ["analyst", "admin"]
-    content_hash: str         # Ensure not maliciously altered
+from src.core.lru_cache import LRUCache
+from src.core.pattern_matcher import PatternMatch, ScanSource, SignatureMatcher, get_matcher
+from src.core.scan_pool import ScanOffloader
+from src.guards.provenance_registry import DocumentProvenance, ProvenanceRegistry
 
 @dataclass
 class RetrievedContext:
@@ -17,6 +15,15 @@ class RetrievedContext:
     text_content: str
     provenance: DocumentProvenance
 
+@dataclass
+class RetrievalVerdict:
+    """Per-chunk outcome of a batch retrieval validation."""
+    doc_id: str
+    rank: int                                   # position in the retriever's result list
+    allowed: bool
+    reason: str
+    context: Optional[RetrievedContext] = None  # set only when allowed
+
 class RAGFirewall:
     """
     Executes RAG Provenance Firewall rules:
@@ -24,50 +31,193 @@ class RAGFirewall:
     - Assumes RAG output is untrusted input
     - Blocks instructions hidden in retrieved context
     """
-    def __init__(self):
-        self._document_registry: Dict[str, DocumentProvenance] = {}
+    def __init__(self, registry: Optional[ProvenanceRegistry] = None, scan_offloader: Optional[ScanOffloader] = None, verdict_cache_size: int = 16384):
+        self._document_registry = registry or ProvenanceRegistry()
         # Stub blocklist for instruction poisoning
         self._instruction_signatures = ["ignore previous instructions", "system proxy:", "execute immediately"]
+        self._matcher: SignatureMatcher = get_matcher(self._instruction_signatures)
+        # Large batches are scanned on worker processes; small ones stay inline
+        self.scan_offloader = scan_offloader
+        # (signature version, content hash) -> (first instruction hit or None)
+        self._verdict_cache = LRUCache(verdict_cache_size)
+        self._signature_version = 1
+
+    def set_instruction_signatures(self, signatures: List[str]):
+        """Replace the poisoning blocklist; the shared automaton is rebuilt once and cached verdicts are dropped."""
+        self._instruction_signatures = list(signatures)
+        self._matcher = get_matcher(self._instruction_signatures)
+        # Versioned keys keep a scan that raced this swap from caching a stale verdict
+        self._signature_version += 1
+        self._verdict_cache.clear()
+
+    def verdict_cache_stats(self) -> Dict[str, Any]:
+        return self._verdict_cache.stats()
+
+    @staticmethod
+    def compute_content_hash(content: str) -> str:
+        """Canonical content hash used for provenance registration and verification."""
+        return hashlib.sha256(content.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+    @staticmethod
+    def _hash_matches(registered: str, digest: str) -> bool:
+        registered = registered.strip().lower()
+        if registered.startswith("sha256:"):
+            registered = registered[len("sha256:"):]
+        return registered == digest
+
+    def find_instructions(self, text: str) -> List[PatternMatch]:
+        """Every instruction signature found in `text`, with offsets."""
+        return self._matcher.find_all(text)
 
     def register_document(self, prov: DocumentProvenance):
         """Register document ACLs for runtime retrieval validation."""
-        self._document_registry[prov.doc_id] = prov
+        self._document_registry.register(prov)
         
     def scan_for_instructions(self, text: str) -> bool:
         """
         Scan retrieved content for latent instructions (Poisoning).
         Returns True if safe, False if poisoned.
         """
-        lower_text = text.lower()
-        for signature in self._instruction_signatures:
-            if signature in lower_text:
-                print(f"RAG FIREWALL: Blocked content - Detected malicious instruction signature '{signature}'")
-                return False
+        match = self._matcher.search(text)
+        if match:
+            print(f"RAG FIREWALL: Blocked content - Detected malicious instruction signature '{match.signature}' at offset {match.offset}")
+            return False
+        return True
+
+    def _role_mask(self, agent_role: str) -> int:
+        """ACL bitmask for a role (0 if the role appears in no ACL)."""
+        return self._document_registry.role_bit(agent_role)
+
+    def _check_acl(self, doc_id: str, agent_role: str, role_mask: Optional[int] = None) -> Tuple[Optional[DocumentProvenance], str]:
+        """Document identity + ACL check. Returns (provenance, "") or (None, block reason)."""
+        # 1. Document Identity tracking
+        prov = self._document_registry.get(doc_id)
+        if not prov:
+            return None, "Document lacks provenance registration. Default deny."
+
+        # 2. ACL Enforcement (Permission Bypass Prevention)
+        # Vector similarity must not override access control; admins bypass ACLs,
+        # everyone else is a single bit test per document
+        if agent_role == "admin":
+            return prov, ""
+        if role_mask is None:
+            role_mask = self._role_mask(agent_role)
+        if not prov.acl_bits & role_mask:
+            return None, f"Agent role '{agent_role}' unauthorized to access document."
+        return prov, ""
+
+    def scan_stream_for_instructions(self, source: ScanSource, chunk_size: int = 65536) -> bool:
+        """
+        Streaming variant of scan_for_instructions for very large documents.
+        Accepts a file-like object or an iterable of str/bytes pieces, keeps
+        memory bounded to one chunk and stops reading at the first hit.
+        Returns True if safe, False if poisoned.
+        """
+        hits = self._matcher.scan_stream(source, first_only=True, chunk_size=chunk_size)
+        if hits:
+            print(f"RAG FIREWALL: Blocked streamed content - Detected malicious instruction signature '{hits[0].signature}' at offset {hits[0].offset}")
+            return False
         return True
 
+    def find_instructions_in_stream(self, source: ScanSource, chunk_size: int = 65536) -> List[PatternMatch]:
+        """Every instruction signature in a streamed document, with offsets."""
+        return self._matcher.scan_stream(source, chunk_size=chunk_size)
+
+    def _check_integrity(self, prov: DocumentProvenance, content: str) -> Tuple[str, str]:
+        """Hash content and verify it against the registered hash. Returns (digest, block reason or "")."""
+        digest = self.compute_content_hash(content)
+        if prov.content_hash and not self._hash_matches(prov.content_hash, digest):
+            return digest, "Content hash mismatch with registered provenance. Possible tampering."
+        return digest, ""
+
+    def _cached_scan(self, digest: str, content: str) -> Optional[PatternMatch]:
+        version, matcher = self._signature_version, self._matcher
+        cached = self._verdict_cache.get((version, digest))
+        if cached is not None:
+            return cached[0]
+        match = matcher.search(content)
+        self._verdict_cache.put((version, digest), (match,))
+        return match
+
     def validate_retrieval(self, query: str, doc_id: str, content: str, agent_role: str) -> Optional[RetrievedContext]:
         """
         Intercepts vector search results. Validates ACLs and provenance.
         Returns RetrievedContext if safe, None (or raises) if blocked.
         """
-        # 1. Document Identity tracking
-        if doc_id not in self._document_registry:
-            print(f"RAG FIREWALL Block: Document '{doc_id}' lacks provenance registration. Default deny.")
+        prov, reason = self._check_acl(doc_id, agent_role)
+        if not prov:
+            print(f"RAG FIREWALL Block: '{doc_id}' - {reason}")
             return None
-            
-        prov = self._document_registry[doc_id]
 
-        # 2. ACL Enforcement (Permission Bypass Prevention)
-        # Vector similarity must not override access control
-        user_is_admin = agent_role == "admin"
-        if agent_role not in prov.allowed_roles and not user_is_admin:
-            print(f"RAG FIREWALL Block: Agent role '{agent_role}' unauthorized to access document '{doc_id}'")
+        # 3. Integrity check against the registered content hash
+        digest, reason = self._check_integrity(prov, content)
+        if reason:
+            print(f"RAG FIREWALL Block: '{doc_id}' - {reason}")
             return None
-            
-        # 3. Instruction Scan (Quarantine check)
-        if not self.scan_for_instructions(content):
+
+        # 4. Instruction Scan (Quarantine check); identical chunks reuse the cached verdict
+        match = self._cached_scan(digest, content)
+        if match:
+            print(f"RAG FIREWALL: Blocked content - Detected malicious instruction signature '{match.signature}' at offset {match.offset}")
             print(f"RAG FIREWALL Quarantine: Content from '{doc_id}' is poisoned.")
             return None
-            
+
         print(f"RAG FIREWALL Pass: Safe context injected from '{doc_id}'")
         return RetrievedContext(query=query, text_content=content, provenance=prov)
+
+    def _scan_many(self, matcher: SignatureMatcher, contents: List[str]) -> List[Optional[PatternMatch]]:
+        """First instruction hit (or None) per content; large batches run on the process pool."""
+        if self.scan_offloader:
+            return self.scan_offloader.scan_first(matcher, contents)
+        return [matcher.search(c) for c in contents]
+
+    def validate_retrievals(self, query: str, chunks: List[Tuple[str, str]], agent_role: str) -> List[RetrievalVerdict]:
+        """
+        Batch variant of validate_retrieval for a whole top-k result set.
+        `chunks` are (doc_id, content) pairs in retriever order; verdicts keep that order.
+        ACLs and content hashes are checked first so rejected chunks are never
+        scanned, identical chunks are scanned once, and previously seen chunks
+        reuse their cached verdict.
+        """
+        role_mask = self._role_mask(agent_role)
+        verdicts: List[RetrievalVerdict] = []
+        to_scan: Dict[str, List[int]] = {}
+        contents: Dict[str, str] = {}
+        for rank, (doc_id, content) in enumerate(chunks):
+            prov, reason = self._check_acl(doc_id, agent_role, role_mask)
+            if prov:
+                digest, reason = self._check_integrity(prov, content)
+            if reason:
+                verdicts.append(RetrievalVerdict(doc_id, rank, False, reason))
+                continue
+            verdicts.append(RetrievalVerdict(doc_id, rank, True, "", RetrievedContext(query=query, text_content=content, provenance=prov)))
+            to_scan.setdefault(digest, []).append(rank)
+            contents[digest] = content
+
+        version, matcher = self._signature_version, self._matcher
+        results: Dict[str, Optional[PatternMatch]] = {}
+        uncached = []
+        for digest in to_scan:
+            cached = self._verdict_cache.get((version, digest))
+            if cached is not None:
+                results[digest] = cached[0]
+            else:
+                uncached.append(digest)
+        for digest, match in zip(uncached, self._scan_many(matcher, [contents[d] for d in uncached])):
+            self._verdict_cache.put((version, digest), (match,))
+            results[digest] = match
+
+        for digest, ranks in to_scan.items():
+            match = results[digest]
+            for rank in ranks:
+                verdict = verdicts[rank]
+                if match:
+                    verdict.allowed = False
+                    verdict.context = None
+                    verdict.reason = f"Poisoned: instruction signature '{match.signature}' at offset {match.offset}."
+                else:
+                    verdict.reason = "Safe context."
+
+        blocked = sum(1 for v in verdicts if not v.allowed)
+        print(f"RAG FIREWALL Batch: {len(verdicts) - blocked}/{len(verdicts)} chunks passed for role '{agent_role}'.")
+        return verdicts
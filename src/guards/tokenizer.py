@@ -0,0 +1,147 @@
+import json
+import math
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from src.core.lru_cache import LRUCache
+
+# GPT-2 style pre-tokenizer; stdlib `re` has no \p{L}, so letters are [^\W\d_]
+_PRETOKENIZE_RE = re.compile(r"""'s|'t|'re|'ve|'m|'ll|'d| ?[^\W\d_]+| ?\d+| ?(?:[^\s\w]|_)+|\s+(?!\S)|\s+""")
+
+def _bytes_to_unicode() -> Dict[int, str]:
+    """Reversible byte -> printable unicode map used by byte-level BPE vocabularies."""
+    printable = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    chars = printable[:]
+    n = 0
+    for b in range(256):
+        if b not in printable:
+            printable.append(b)
+            chars.append(256 + n)
+            n += 1
+    return dict(zip(printable, (chr(c) for c in chars)))
+
+_BYTE_ENCODER = _bytes_to_unicode()
+
+class Tokenizer(ABC):
+    """Pluggable token counter used by the Context Governor."""
+    name = "abstract"
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """Number of model tokens `text` occupies."""
+
+class WhitespaceTokenizer(Tokenizer):
+    """Legacy MVP estimate (one token per whitespace-separated word). Undercounts BPE models."""
+    name = "whitespace"
+
+    def count(self, text: str) -> int:
+        return len(text.split())
+
+class HeuristicTokenizer(Tokenizer):
+    """
+    Vocabulary-free BPE approximation, used when no local vocabulary is configured.
+    - One chars-per-token ratio over the whole text: byte-level BPE vocabularies
+      merge common English words (with their leading space) into a single token,
+      so prose averages ~4 ASCII characters per token
+    - Non-ASCII characters cost a token each (their multi-byte encodings rarely merge)
+    - Never below one token per whitespace-separated word
+    Calibrated against GPT-2 BPE counts - see tests/test_tokenizer.py
+    """
+    name = "heuristic"
+
+    def __init__(self, chars_per_token: float = 4.0):
+        self.chars_per_token = chars_per_token
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        ascii_chars = len(text) if text.isascii() else len(text.encode("ascii", "ignore"))
+        estimate = math.ceil(ascii_chars / self.chars_per_token) + (len(text) - ascii_chars)
+        return max(estimate, len(text.split()))
+
+class BPETokenizer(Tokenizer):
+    """
+    Pure-Python byte-level BPE tokenizer (GPT-2 merges format), fully offline.
+    - Loads merge ranks (and optionally a token -> id vocabulary) from local files
+    - Memoizes the merge result per pre-token word
+    """
+    name = "bpe"
+
+    def __init__(self, merges: List[Tuple[str, str]], vocab: Optional[Dict[str, int]] = None, cache_size: int = 65536):
+        self.ranks: Dict[Tuple[str, str], int] = {pair: rank for rank, pair in enumerate(merges)}
+        self.vocab = vocab
+        self._word_cache = LRUCache(cache_size)
+
+    @classmethod
+    def from_files(cls, merges_path: str, vocab_path: Optional[str] = None) -> "BPETokenizer":
+        merges: List[Tuple[str, str]] = []
+        with open(merges_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line or line.startswith("#version"):
+                    continue
+                left, right = line.split(" ")
+                merges.append((left, right))
+        vocab = None
+        if vocab_path:
+            with open(vocab_path, "r", encoding="utf-8") as f:
+                vocab = json.load(f)
+        return cls(merges, vocab)
+
+    def _bpe(self, word: str) -> Tuple[str, ...]:
+        cached = self._word_cache.get(word)
+        if cached is not None:
+            return cached
+        parts = list(word)
+        ranks = self.ranks
+        while len(parts) > 1:
+            best_rank, best_i = None, -1
+            for i in range(len(parts) - 1):
+                rank = ranks.get((parts[i], parts[i + 1]))
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank, best_i = rank, i
+            if best_rank is None:
+                break
+            pair = (parts[best_i], parts[best_i + 1])
+            merged: List[str] = []
+            i = 0
+            # Apply the winning merge at every position, left to right
+            while i < len(parts):
+                if i < len(parts) - 1 and (parts[i], parts[i + 1]) == pair:
+                    merged.append(parts[i] + parts[i + 1])
+                    i += 2
+                else:
+                    merged.append(parts[i])
+                    i += 1
+            parts = merged
+        result = tuple(parts)
+        self._word_cache.put(word, result)
+        return result
+
+    def tokenize(self, text: str) -> List[str]:
+        tokens: List[str] = []
+        for piece in _PRETOKENIZE_RE.findall(text):
+            word = "".join(_BYTE_ENCODER[b] for b in piece.encode("utf-8"))
+            tokens.extend(self._bpe(word))
+        return tokens
+
+    def encode(self, text: str) -> List[int]:
+        if self.vocab is None:
+            raise ValueError("BPETokenizer.encode requires a vocabulary file.")
+        return [self.vocab[t] for t in self.tokenize(text)]
+
+    def count(self, text: str) -> int:
+        total = 0
+        for piece in _PRETOKENIZE_RE.findall(text):
+            word = "".join(_BYTE_ENCODER[b] for b in piece.encode("utf-8"))
+            total += len(self._bpe(word))
+        return total
+
+def load_tokenizer(merges_path: Optional[str] = None, vocab_path: Optional[str] = None) -> Tokenizer:
+    """BPE tokenizer if a local merges file is available, otherwise the heuristic estimator."""
+    if merges_path and os.path.exists(merges_path):
+        print(f"CONTEXT GOVERNOR: Loaded BPE tokenizer from {merges_path}")
+        return BPETokenizer.from_files(merges_path, vocab_path if vocab_path and os.path.exists(vocab_path) else None)
+    return HeuristicTokenizer()
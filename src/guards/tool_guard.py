@@ -1,6 +1,10 @@
-from dataclasses import dataclass
-from typing import Dict, Any, List, Optional
+from dataclasses import asdict, dataclass
+from types import MappingProxyType
+from typing import Dict, Any, Iterable, List, Mapping, Optional
 import json
+import threading
+
+from src.core.schema_compiler import InvalidSchemaError, Validator, compile_schema
 
 @dataclass
 class ToolPermission:
@@ -21,25 +25,147 @@ class ToolRegistration:
     required_permissions: List[ToolPermission]
     is_active: bool = True
 
+def permissions_from_scopes(scopes: Iterable[str]) -> List[ToolPermission]:
+    """Agent IAM scopes ("action:resource", or bare "action" for any resource) as tool permissions."""
+    return [ToolPermission(s.split(":")[0], s.split(":")[1] if ":" in s else "*", "") for s in scopes]
+
+@dataclass(frozen=True)
+class RegistrySnapshot:
+    """Immutable, versioned view of the registry. Readers hold one for a whole decision."""
+    version: int
+    tools: Mapping[str, ToolRegistration]
+    validators: Mapping[str, Validator]
+
+    def get_tool(self, name: str) -> Optional[ToolRegistration]:
+        return self.tools.get(name)
+
+    def is_registered(self, name: str) -> bool:
+        tool = self.tools.get(name)
+        return tool is not None and tool.is_active
+
+    def get_validator(self, name: str) -> Optional[Validator]:
+        return self.validators.get(name)
+
 class ToolRegistry:
     """
     Manages the authoritative list of tools allowed by AVARA.
     Dynamic registration at runtime is forbidden by Rule 4.
+    - Loaded from the persistent store at startup
+    - Published as immutable snapshots; writers copy, then swap the reference
+      atomically, so readers on the hot path never take a lock
+    - Registering a tool with a malformed parameter schema raises InvalidSchemaError;
+      persisted rows that fail to load are quarantined (left unregistered) instead of
+      aborting startup
     """
-    def __init__(self):
-        self._tools: Dict[str, ToolRegistration] = {}
+    def __init__(self, store=None):
+        self.store = store
+        self._write_lock = threading.Lock()
+        self._snapshot = RegistrySnapshot(0, MappingProxyType({}), MappingProxyType({}))
+        # Persisted tool name -> why its row was not loaded
+        self.quarantined: Dict[str, str] = {}
+        if store:
+            self._publish(self._load(store.load_all_tools()), persist=False)
+
+    def _load(self, rows: Iterable[Dict[str, Any]]) -> List[ToolRegistration]:
+        tools = []
+        for row in rows:
+            name = row.get("name", "<unnamed>")
+            try:
+                tool = self._from_row(row)
+            except (KeyError, TypeError, ValueError) as e:
+                reason = f"unreadable row: {e!r}"
+            else:
+                try:
+                    compile_schema(tool.parameters_schema)
+                    tools.append(tool)
+                    continue
+                except InvalidSchemaError as e:
+                    reason = f"invalid parameters schema: {e}"
+            self.quarantined[name] = reason
+            print(f"TOOL REGISTRY: Quarantined persisted tool '{name}': {reason}")
+        return tools
+
+    @staticmethod
+    def _permission_from_row(p: Any) -> ToolPermission:
+        """
+        Accepts the current {action, resource, description} shape plus the legacy ones:
+        "action:resource" scope strings, [action, resource(, description)] lists and
+        dicts missing description/resource or carrying extra keys.
+        """
+        if isinstance(p, str):
+            return permissions_from_scopes([p])[0]
+        if isinstance(p, (list, tuple)) and 1 <= len(p) <= 3 and all(isinstance(f, str) for f in p):
+            fields = list(p) + ["*", ""][len(p) - 1:]
+            return ToolPermission(*fields)
+        if isinstance(p, dict):
+            action = p.get("action")
+            resource = p.get("resource", "*")
+            description = p.get("description") or ""
+            if isinstance(action, str) and action and isinstance(resource, str) and isinstance(description, str):
+                return ToolPermission(action, resource, description)
+        raise ValueError(f"unrecognized permission {p!r}")
+
+    @classmethod
+    def _from_row(cls, row: Dict[str, Any]) -> ToolRegistration:
+        schema = row["parameters_schema"]
+        if not isinstance(schema, dict):
+            raise ValueError(f"parameters schema must be an object, got {type(schema).__name__}")
+        permissions = row["required_permissions"] or []
+        if not isinstance(permissions, list):
+            raise ValueError(f"required permissions must be a list, got {type(permissions).__name__}")
+        return ToolRegistration(
+            name=row["name"],
+            description=row.get("description") or "",
+            parameters_schema=schema,
+            required_permissions=[cls._permission_from_row(p) for p in permissions],
+            is_active=bool(row.get("is_active", True))
+        )
+
+    def _publish(self, tools: List[ToolRegistration], persist: bool = True) -> int:
+        # Compile outside the write lock; identical schemas hit the compiler cache
+        validators = {tool.name: compile_schema(tool.parameters_schema) for tool in tools}
+        with self._write_lock:
+            if persist and self.store:
+                self.store.save_tools(
+                    (t.name, t.description, t.parameters_schema, [asdict(p) for p in t.required_permissions], t.is_active)
+                    for t in tools
+                )
+            current = self._snapshot
+            new_tools = dict(current.tools)
+            new_validators = dict(current.validators)
+            for tool in tools:
+                new_tools[tool.name] = tool
+                new_validators[tool.name] = validators[tool.name]
+            self._snapshot = RegistrySnapshot(current.version + 1, MappingProxyType(new_tools), MappingProxyType(new_validators))
+            return self._snapshot.version
+
+    def register_tool(self, tool: ToolRegistration) -> int:
+        """Register a new tool. Overwrites if exists. Returns the published registry version."""
+        return self._publish([tool])
+
+    def register_tools(self, tools: Iterable[ToolRegistration]) -> int:
+        """Register many tools as one new version (one copy, one store transaction)."""
+        return self._publish(list(tools))
+
+    def snapshot(self) -> RegistrySnapshot:
+        """Current snapshot; a plain attribute read, safe without locks."""
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
 
-    def register_tool(self, tool: ToolRegistration) -> None:
-        """Register a new tool. Overwrites if exists."""
-        self._tools[tool.name] = tool
-        
     def get_tool(self, name: str) -> Optional[ToolRegistration]:
         """Retrieve a tool's registration by name."""
-        return self._tools.get(name)
-        
+        return self._snapshot.get_tool(name)
+
     def is_registered(self, name: str) -> bool:
         """Check if a tool is explicitly registered."""
-        return name in self._tools and self._tools[name].is_active
+        return self._snapshot.is_registered(name)
+
+    def get_validator(self, name: str) -> Optional[Validator]:
+        """Compiled parameter-schema validator for a registered tool."""
+        return self._snapshot.get_validator(name)
 
 class ToolGuard:
     """
@@ -51,16 +177,27 @@ class ToolGuard:
     def __init__(self, registry: ToolRegistry):
         self.registry = registry
         
-    def validate_invocation(self, tool_name: str, arguments: Dict[str, Any], agent_permissions: List[ToolPermission]) -> bool:
+    def validate_invocation(self, tool_name: str, arguments: Dict[str, Any], agent_permissions: List[ToolPermission], snapshot: Optional[RegistrySnapshot] = None) -> bool:
         """
         Validates if an agent can invoke a specific tool with given arguments.
         Returns True if allowed, raises exception or returns False if blocked.
+        Pass the caller's `snapshot` so the whole decision sees one registry version.
         """
+        reason = self.check_invocation(tool_name, arguments, agent_permissions, snapshot)
+        if reason:
+            print(f"BLOCK: {reason}")
+            return False
+        return True
+
+    def check_invocation(self, tool_name: str, arguments: Dict[str, Any], agent_permissions: List[ToolPermission], snapshot: Optional[RegistrySnapshot] = None) -> Optional[str]:
+        """Same checks as validate_invocation; returns the block reason (None if allowed) instead of printing it."""
+        if snapshot is None:
+            snapshot = self.registry.snapshot()
+
         # 1. Check if explicit registration exists
-        tool_reg = self.registry.get_tool(tool_name)
+        tool_reg = snapshot.get_tool(tool_name)
         if not tool_reg:
-            print(f"BLOCK: Tool '{tool_name}' is not registered.")
-            return False
+            return f"Tool '{tool_name}' is not registered."
             
         # 2. Check if agent has all required permissions for this tool
         # In a real implementation this would check if agent_permissions cover required_permissions
@@ -70,16 +207,21 @@ class ToolGuard:
                 for p in agent_permissions
             )
             if not has_permission:
-                 print(f"BLOCK: Agent lacks permission '{required.action}' on '{required.resource}' for tool '{tool_name}'.")
-                 return False
+                 return f"Agent lacks permission '{required.action}' on '{required.resource}' for tool '{tool_name}'."
 
-        # 3. Parameter validation (Simplified for MVP, usually done with jsonschema)
+        # 3. Parameter validation
         # Verify all provided arguments are defined in schema
         schema_props = tool_reg.parameters_schema.get("properties", {})
         for arg_name in arguments.keys():
             if arg_name not in schema_props:
-                print(f"BLOCK: Unrecognized argument '{arg_name}' for tool '{tool_name}'. Metadata is untrusted.")
-                return False
+                return f"Unrecognized argument '{arg_name}' for tool '{tool_name}'. Metadata is untrusted."
+
+        # Full schema check (types, required, enums, lengths, nested objects) with the compiled validator
+        validator = snapshot.get_validator(tool_name) or compile_schema(tool_reg.parameters_schema)
+        error = validator(arguments)
+        if error:
+            path, message = error
+            return f"Invalid arguments for tool '{tool_name}'{f' at {path!r}' if path else ''}: {message}."
 
         # If we reach here, validation passed
-        return True
+        return None
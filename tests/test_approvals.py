@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+
+from src.core.approval_sweeper import ApprovalSweeper, ApprovalWaiters
+from src.core.metrics import MetricsRegistry
+from src.db.persistent_store import PersistentStore
+
+def test_expire_reports_only_rows_it_expired(tmp_path):
+    store = PersistentStore(str(tmp_path / "state.db"))
+    for i in range(5):
+        store.save_approval(f"a{i}", "agent", "delete_db", "prod", {})
+    assert store.resolve_pending_approval("a2", "APPROVED")
+
+    expired = store.expire_pending_approvals(time.time() + 1, batch_size=10)
+
+    assert sorted(r["action_id"] for r in expired) == ["a0", "a1", "a3", "a4"]
+    assert store.get_approval("a2")["status"] == "APPROVED"
+    store.close()
+
+def test_sweeper_wakes_async_waiter(tmp_path):
+    store = PersistentStore(str(tmp_path / "state.db"))
+    waiters = ApprovalWaiters()
+    sweeper = ApprovalSweeper(store, waiters, approval_ttl_seconds=0, metrics_registry=MetricsRegistry())
+    store.save_approval("a1", "agent", "delete_db", "prod", {})
+
+    async def poll():
+        timer = threading.Timer(0.1, sweeper.sweep_once)
+        timer.start()
+        resolved = await waiters.wait("a1", 5, lambda: store.get_approval("a1")["status"] != "PENDING")
+        timer.join()
+        return resolved
+
+    started = time.monotonic()
+    assert asyncio.run(poll())
+    assert time.monotonic() - started < 2
+    assert store.get_approval("a1")["status"] == "EXPIRED"
+    assert waiters.parked_count() == 0
+    store.close()
+
+def test_waiter_times_out_without_notify():
+    waiters = ApprovalWaiters()
+    assert asyncio.run(waiters.wait("a1", 0.05, lambda: False)) is False
+    assert waiters.parked_count() == 0
+
+def test_waiter_checks_resolution_off_the_event_loop():
+    waiters = ApprovalWaiters()
+    threads = []
+
+    async def poll():
+        loop_thread = threading.current_thread()
+        resolved = await waiters.wait("a1", 0.05, lambda: threads.append(threading.current_thread()) or False)
+        return resolved, loop_thread
+
+    resolved, loop_thread = asyncio.run(poll())
+    assert resolved is False
+    assert threads and loop_thread not in threads
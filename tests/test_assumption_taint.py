@@ -0,0 +1,94 @@
+from src.guards.assumption_graph import TAINT_OVERFLOW, AssumptionGraph
+from src.guards.multi_agent_monitor import AgentMessage, MultiAgentMonitor
+
+UNVERIFIED = "unverified: customer consented"
+
+def _monitor():
+    return MultiAgentMonitor(high_risk_actions={"delete_database", "transfer_funds"})
+
+def test_unverified_assumption_without_intended_action_is_blocked():
+    monitor = _monitor()
+    assert not monitor.validate_message(AgentMessage("a", "b", "report", [UNVERIFIED], 0.9))
+
+def test_laundered_taint_blocks_high_risk_action():
+    monitor = _monitor()
+    assert monitor.validate_message(AgentMessage("a", "b", "report", [UNVERIFIED], 0.9, intended_action="summarize"))
+    assert monitor.validate_message(AgentMessage("b", "c", "summary", [], 0.9, intended_action="summarize"))
+    assert monitor.validate_message(AgentMessage("c", "d", "digest", [], 0.9))
+    verdict = monitor.evaluate_message(AgentMessage("d", "e", "do it", [], 0.9, intended_action="transfer_funds"))
+    assert not verdict.allowed
+    assert "'a'" in verdict.reason
+
+    assert monitor.resolve_assumption(UNVERIFIED) == 3
+    assert monitor.validate_message(AgentMessage("d", "e", "do it", [], 0.9, intended_action="transfer_funds"))
+
+def test_taint_only_flows_forward():
+    graph = AssumptionGraph()
+    graph.record_message("hub", "old_peer", [], [])
+    graph.record_message("x", "hub", [UNVERIFIED], [UNVERIFIED])
+    assert graph.taint_of("hub") == {("x", UNVERIFIED)}
+    assert graph.taint_of("old_peer") == frozenset()  # messaged before the hub was tainted
+
+    graph.record_message("hub", "new_peer", [], [])
+    assert graph.taint_of("new_peer") == {("x", UNVERIFIED)}
+
+def test_resolve_clears_agents_and_keeps_edge_history():
+    graph = AssumptionGraph()
+    graph.record_message("x", "y", [UNVERIFIED], [UNVERIFIED])
+    assert graph.resolve_assumption(UNVERIFIED) == 1
+    assert graph.taint_of("y") == frozenset()
+    assert graph.stats()["taint_labels"] == 0
+    (_, edge), = graph.edges_from("x")
+    assert edge.taint == {("x", UNVERIFIED)}
+
+def test_agent_and_edge_maps_are_bounded():
+    graph = AssumptionGraph(max_agents=10, max_edges=20)
+    for i in range(1000):
+        graph.record_message(f"s{i}", f"r{i}", [UNVERIFIED], [UNVERIFIED])
+    stats = graph.stats()
+    assert stats["edges"] == 20
+    assert stats["tainted_agents"] == 10
+    assert stats["taint_labels"] == 10
+    assert graph.taint_of("r999") and not graph.taint_of("r0")
+    assert graph.resolve_assumption(UNVERIFIED) == 10
+
+def test_saturated_agent_stays_tainted_after_resolving_its_labels():
+    graph = AssumptionGraph(max_labels_per_agent=4)
+    for i in range(10):
+        graph.record_message(f"s{i}", "hub", [], [f"unverified {i}"])
+    assert TAINT_OVERFLOW in graph.taint_of("hub")
+    for i in range(10):
+        graph.resolve_assumption(f"unverified {i}")
+    assert graph.taint_of("hub") == {TAINT_OVERFLOW}
+
+def test_taint_graph_scales_to_thousands_of_agents(capsys):
+    # Budget: 100k messages across 5,000 agents under 50 us each; resolving one
+    # widely spread assumption under 50 ms
+    import random
+    import time
+
+    rng = random.Random(7)
+    agents = [f"agent-{i}" for i in range(5000)]
+    traffic = []
+    for i in range(100000):
+        tainted = [f"unverified: claim {i // 200 % 50}"] if i % 200 == 0 else []
+        traffic.append((rng.choice(agents), rng.choice(agents), tainted))
+
+    graph = AssumptionGraph()
+    started = time.perf_counter()
+    for sender, receiver, tainted in traffic:
+        graph.record_message(sender, receiver, tainted, tainted)
+    per_message = (time.perf_counter() - started) / len(traffic)
+    stats = graph.stats()
+    assert stats["tainted_agents"] > 1000  # taint really spread through the graph
+
+    held = sum(1 for agent in agents if any(label[1] == "unverified: claim 0" for label in graph.taint_of(agent)))
+    started = time.perf_counter()
+    cleared = graph.resolve_assumption("unverified: claim 0")
+    resolve_seconds = time.perf_counter() - started
+    assert cleared == held > 0
+    with capsys.disabled():
+        print(f"\ntaint graph: {len(agents):,} agents, {stats['edges']:,} edges, {stats['tainted_agents']:,} tainted; "
+              f"{per_message * 1e6:.1f} us/message, resolve {resolve_seconds * 1e3:.1f} ms ({cleared:,} agents)")
+    assert per_message < 50e-6
+    assert resolve_seconds < 0.05
@@ -0,0 +1,87 @@
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+from src.core.audit_ledger import DURABILITY_NONE, AuditLedger
+from src.core.ledger_segments import list_segments
+
+def test_segments_rotate_before_exceeding_max_bytes(tmp_path):
+    ledger = AuditLedger(str(tmp_path), durability=DURABILITY_NONE, segment_max_bytes=8192, compress_sealed=False)
+    for i in range(3000):
+        ledger.log_event("TOOL_CALL", f"agent-{i % 7}", {"tool": "read_file", "args": {"path": f"/data/{i}.csv"}})
+    ledger.flush()
+    segments = list_segments(str(tmp_path))
+    assert len(segments) > 10
+    assert all(os.path.getsize(s) <= 8192 for s in segments)
+    assert ledger.verify(from_checkpoint=False).ok
+    ledger.close()
+
+def test_one_large_batch_is_split_across_segments(tmp_path):
+    ledger = AuditLedger(str(tmp_path), async_mode=False, durability=DURABILITY_NONE, segment_max_bytes=4096, compress_sealed=False)
+    entries = [(1.7e9 + i, "a", "E", json.dumps({"timestamp": "t", "event_type": "E", "agent_id": "a", "decision": None, "context": {"i": i}})) for i in range(400)]
+    ledger._write_batch(entries)
+    sizes = [os.path.getsize(s) for s in list_segments(str(tmp_path))]
+    assert len(sizes) > 1 and max(sizes) <= 4096
+    assert ledger.verify(from_checkpoint=False).ok
+    ledger.close()
+
+def test_startup_compresses_only_sealed_chained_segments(tmp_path):
+    legacy = os.path.join(os.path.dirname(__file__), "..", "logs", "audit_20260226.log")
+    shutil.copy(legacy, str(tmp_path))
+    first = AuditLedger(str(tmp_path), async_mode=False, durability=DURABILITY_NONE, segment_max_bytes=4096, compress_sealed=False)
+    for i in range(60):
+        first.log_event("TOOL_CALL", "agent-1", {"tool": "read_file", "args": {"path": f"/data/{i}.csv"}})
+    first.close()
+    sealed = [s for s in list_segments(str(tmp_path)) if s != first.path and "20260226" not in s]
+    assert sealed
+
+    second = AuditLedger(str(tmp_path), async_mode=False, durability=DURABILITY_NONE, segment_max_bytes=4096)
+    second.close()
+    names = [os.path.basename(s) for s in list_segments(str(tmp_path))]
+    assert "audit_20260226.log" in names
+    assert all(os.path.basename(s) + "z" in names for s in sealed)
+    assert second.verify(from_checkpoint=False).ok
+
+class _Opaque:
+    def __str__(self):
+        return "<opaque handle>"
+
+def test_unserializable_context_does_not_cost_other_records(tmp_path):
+    ledger = AuditLedger(str(tmp_path), durability=DURABILITY_NONE, compress_sealed=False)
+    for i in range(50):
+        ledger.log_event("TOOL_CALL", "agent-1", {"i": i})
+        if i == 25:
+            ledger.log_event("TOOL_CALL", "agent-2", {"handle": _Opaque(), "tags": {"a"}})
+    circular = {}
+    circular["self"] = circular
+    with pytest.raises(ValueError):
+        ledger.log_event("TOOL_CALL", "agent-3", circular)
+    ledger.flush()
+    records = list(ledger.query())
+    assert len(records) == 51
+    assert [r for r in records if r["agent_id"] == "agent-2"][0]["context"]["handle"] == "<opaque handle>"
+    assert ledger.metrics.snapshot()["counters"].get("audit.write_errors", 0) == 0
+    ledger.close()
+
+def test_async_group_commit_outpaces_sync_writes(tmp_path, capsys):
+    # Benchmark: per-record fsync (sync mode) vs group commit (async, one fsync per batch)
+    events = 2000
+
+    def run(log_dir, **kwargs):
+        ledger = AuditLedger(str(log_dir), compress_sealed=False, **kwargs)
+        started = time.perf_counter()
+        for i in range(events):
+            ledger.log_event("TOOL_CALL", f"agent-{i % 8}", {"tool": "read_file", "args": {"path": f"/data/{i}.csv"}})
+        ledger.flush()
+        elapsed = time.perf_counter() - started
+        ledger.close()
+        return events / elapsed
+
+    sync_rate = run(tmp_path / "sync", async_mode=False)
+    async_rate = run(tmp_path / "async")
+    with capsys.disabled():
+        print(f"\naudit ledger: sync {sync_rate:,.0f} events/s, async group commit {async_rate:,.0f} events/s")
+    assert async_rate > sync_rate
@@ -0,0 +1,121 @@
+import time
+
+import pytest
+
+from src.guards.context_governor import ContextGovernor, ContextSegment, SessionEvictedError, UnknownSessionError
+from src.guards.tokenizer import WhitespaceTokenizer
+
+def _governor(**kwargs):
+    # One token per word keeps the arithmetic readable
+    return ContextGovernor(tokenizer=WhitespaceTokenizer(), **kwargs)
+
+def _words(n, word="w"):
+    return " ".join([word] * n)
+
+def _mandatory(governor, query="q", system_prompt="sys"):
+    return governor.prepare_context(query, system_prompt).tokens_used
+
+# --- Priority pruning ---
+def test_pruning_keeps_highest_priority_first_and_original_order():
+    governor = _governor()
+    governor.max_tokens = _mandatory(governor) + 25
+    segments = [
+        ContextSegment("history", _words(10), priority=1, segment_id="old"),
+        ContextSegment("retrieved", _words(10), priority=5, segment_id="top"),
+        ContextSegment("retrieved", _words(10), priority=3, segment_id="mid"),
+        ContextSegment("history", _words(2), priority=0, segment_id="tiny"),
+    ]
+    context = governor.prepare_context("q", "sys", segments)
+    # top (10) and mid (10) fit; old (10) does not; tiny (2) still fits after it
+    assert [s.segment_id for s in context.kept_segments] == ["top", "mid", "tiny"]
+    assert [s.segment_id for s in context.dropped_segments] == ["old"]
+    assert context.tokens_used <= governor.max_tokens
+
+def test_pruning_ties_keep_input_order():
+    governor = _governor()
+    governor.max_tokens = _mandatory(governor) + 12
+    segments = [ContextSegment("retrieved", _words(5), priority=1, segment_id=str(i)) for i in range(4)]
+    context = governor.prepare_context("q", "sys", segments)
+    assert [s.segment_id for s in context.kept_segments] == ["0", "1"]
+
+def test_mandatory_parts_over_budget_are_blocked():
+    governor = _governor(max_tokens=20)
+    assert governor.prepare_context(_words(50), "sys") is None
+    assert governor.prepare_context("q", "sys", [ContextSegment("retrieved", _words(500))]) is not None
+
+# --- Session deltas ---
+def test_session_deltas_keep_running_totals_exact():
+    governor = _governor()
+    session = governor.update_session("a1", system_prompt="be brief", append=[ContextSegment("history", _words(3), segment_id="h1"), ContextSegment("history", _words(4))])
+    auto_id = list(session.segments)[1]
+    # Re-sending a segment id replaces it; unknown removals are ignored
+    session = governor.update_session("a1", append=[ContextSegment("retrieved", _words(5), segment_id="h1")], remove_ids=["missing"])
+    assert list(session.segments) == [auto_id, "h1"]
+    assert session.segment_tokens == sum(s.tokens for s in session.segments.values()) == 5 + 4
+    assert session.segment_chars == sum(len(s.text) for s in session.segments.values())
+    session = governor.update_session("a1", system_prompt="be very brief", remove_ids=["h1"])
+    assert session.segment_tokens == 4 and session.system_tokens == 3
+
+    context = governor.prepare_session_context("a1", "what now")
+    full = governor.prepare_context("what now", "be very brief", list(session.segments.values()))
+    assert context.tokens_used == full.tokens_used
+    assert governor.held_chars() == len("be very brief") + session.segment_chars
+
+def test_session_prunes_only_when_running_total_overflows():
+    governor = _governor()
+    governor.update_session("a1", system_prompt="sys", append=[
+        ContextSegment("history", _words(10), priority=1, segment_id="low"),
+        ContextSegment("history", _words(10), priority=9, segment_id="high"),
+    ])
+    assert governor.prepare_session_context("a1", "q").dropped_segments == []
+    governor.max_tokens = _mandatory(governor) + 15
+    context = governor.prepare_session_context("a1", "q")
+    assert [s.segment_id for s in context.kept_segments] == ["high"]
+    assert [s.segment_id for s in context.dropped_segments] == ["low"]
+
+def test_per_session_bounds_drop_oldest_segments():
+    governor = _governor(max_session_segments=3, max_session_chars=1000)
+    for i in range(5):
+        session = governor.update_session("a1", append=[ContextSegment("history", _words(2), segment_id=f"s{i}")])
+    assert list(session.segments) == ["s2", "s3", "s4"]
+    session = governor.update_session("a1", append=[ContextSegment("history", "x" * 999, segment_id="big")])
+    assert list(session.segments) == ["big"]
+    assert governor.held_chars() == 999
+
+# --- Eviction ---
+def test_global_budget_evicts_least_recently_used_sessions():
+    governor = _governor(max_session_chars=100, max_total_chars=250)
+    for agent in ["a1", "a2", "a3"]:
+        governor.update_session(agent, append=[ContextSegment("history", "x" * 80)])
+    governor.update_session("a1", append=[ContextSegment("history", "y" * 10)])  # a1 is now most recent
+    assert governor.session_count() == 3 and governor.held_chars() == 250
+
+    governor.update_session("a4", append=[ContextSegment("history", "z" * 80)])
+    assert governor.session_count() == 3
+    assert governor.held_chars() <= 250
+    with pytest.raises(SessionEvictedError):
+        governor.prepare_session_context("a2", "q")
+    assert governor.prepare_session_context("a1", "q") is not None
+
+def test_evicted_session_rejects_deltas_until_reset():
+    governor = _governor(session_ttl_seconds=0.01)
+    governor.update_session("a1", append=[ContextSegment("history", "turn one")])
+    time.sleep(0.03)
+    governor.update_session("a2")
+    with pytest.raises(SessionEvictedError):
+        governor.update_session("a1", append=[ContextSegment("history", "turn two")])
+    session = governor.update_session("a1", reset=True, append=[ContextSegment("history", "turn one turn two")])
+    assert [s.text for s in session.segments.values()] == ["turn one turn two"]
+
+def test_unknown_and_ended_sessions_are_not_reported_as_evicted():
+    governor = _governor()
+    with pytest.raises(UnknownSessionError) as missing:
+        governor.prepare_session_context("nobody", "q")
+    assert not isinstance(missing.value, SessionEvictedError)
+    governor.update_session("a1", system_prompt="sys", append=[ContextSegment("history", "hello")])
+    governor.end_session("a1")
+    assert governor.held_chars() == 0
+    with pytest.raises(UnknownSessionError) as ended:
+        governor.prepare_session_context("a1", "q")
+    assert not isinstance(ended.value, SessionEvictedError)
+    governor.update_session("a1", append=[ContextSegment("history", "fresh start")])  # a new conversation
@@ -0,0 +1,89 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from src.core import ledger_export
+from src.core.audit_ledger import DURABILITY_NONE, AuditLedger
+from src.core.ledger_export import export_ledger, load_export
+from src.core.ledger_index import query_ledger
+
+def _ledger(log_dir, **kwargs):
+    return AuditLedger(str(log_dir), async_mode=False, durability=DURABILITY_NONE, **kwargs)
+
+def _write(ledger, start, count):
+    for i in range(start, start + count):
+        ledger.log_event(["TOOL_CALL", "ACTION_ALLOW", "TOOL_BLOCK"][i % 3], f"agent-{i % 4}", {"i": i}, decision="DENY" if i % 3 == 2 else None)
+
+def _rows(out_dir):
+    data = load_export(out_dir, mmap=False)
+    d = data["dictionaries"]
+    return [
+        (int(ts), d["agent"][a], d["event"][e], d["decision"][c] if c >= 0 else None)
+        for ts, a, e, c in zip(data["ts"], data["agent"], data["event"], data["decision"])
+    ]
+
+def _reference(log_dir, event_types=None):
+    return [
+        (round(datetime.fromisoformat(r["timestamp"]).timestamp() * 1e6), r["agent_id"], r["event_type"], r["decision"])
+        for r in query_ledger(str(log_dir)) if event_types is None or r["event_type"] in event_types
+    ]
+
+def test_incremental_export_resumes_without_duplicates(tmp_path):
+    log_dir, out = tmp_path / "logs", str(tmp_path / "export")
+    ledger = _ledger(log_dir, segment_max_bytes=16 * 1024)
+    _write(ledger, 0, 150)
+    first = export_ledger(str(log_dir), out)
+    assert first["records"] == 150 and first["segments"] > 1
+
+    # The active segment grows and rotates; only the new tail is exported
+    _write(ledger, 150, 100)
+    second = export_ledger(str(log_dir), out)
+    assert second["records"] == 100
+    third = export_ledger(str(log_dir), out)
+    assert (third["segments"], third["records"]) == (0, 0)
+    ledger.close()
+    assert _rows(out) == _reference(log_dir)
+
+def test_sealed_segments_compressed_after_export_are_not_exported_again(tmp_path):
+    log_dir, out = tmp_path / "logs", str(tmp_path / "export")
+    ledger = _ledger(log_dir, segment_max_bytes=16 * 1024, compress_sealed=True)
+    _write(ledger, 0, 200)
+    ledger.close()
+    export_ledger(str(log_dir), out)
+    # Reopening compresses the sealed segments; their logical size is unchanged
+    ledger = _ledger(log_dir, segment_max_bytes=16 * 1024, compress_sealed=True)
+    _write(ledger, 200, 20)
+    ledger.close()
+    assert export_ledger(str(log_dir), out)["records"] == 20
+    assert _rows(out) == _reference(log_dir)
+
+def test_export_interrupted_before_the_manifest_is_saved_resumes_cleanly(tmp_path, monkeypatch):
+    log_dir, out = tmp_path / "logs", str(tmp_path / "export")
+    ledger = _ledger(log_dir)
+    _write(ledger, 0, 50)
+    export_ledger(str(log_dir), out)
+    _write(ledger, 50, 30)
+    ledger.close()
+
+    # Column files are replaced, then the process dies before publishing the manifest
+    def crash(out_dir, manifest):
+        raise KeyboardInterrupt
+    with monkeypatch.context() as m:
+        m.setattr(ledger_export, "_save_manifest", crash)
+        with pytest.raises(KeyboardInterrupt):
+            export_ledger(str(log_dir), out)
+    assert len(_rows(out)) == 50  # readers only see what the manifest published
+    assert export_ledger(str(log_dir), out)["records"] == 30
+    assert _rows(out) == _reference(log_dir)
+
+def test_changing_the_event_filter_re_exports_everything(tmp_path):
+    log_dir, out = tmp_path / "logs", str(tmp_path / "export")
+    ledger = _ledger(log_dir)
+    _write(ledger, 0, 60)
+    ledger.close()
+    export_ledger(str(log_dir), out)
+    assert export_ledger(str(log_dir), out, event_types=["TOOL_BLOCK"])["records"] == 20
+    assert _rows(out) == _reference(log_dir, {"TOOL_BLOCK"})
+    assert load_export(out)["dictionaries"]["event"] == ["TOOL_BLOCK"]
+    assert sorted(os.listdir(out)) == sorted(load_export(out)["segments"] + ["manifest.json"])
@@ -0,0 +1,93 @@
+import glob
+import json
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from src.core.audit_ledger import DURABILITY_NONE, AuditLedger
+from src.core.ledger_index import INDEX_SUFFIX, query_ledger
+
+T0 = 1.7e9
+AGENTS = ["agent-a", "agent-b", "agent-c", "agent-rare"]
+EVENTS = ["TOOL_CALL", "ACTION_ALLOW", "APPROVAL_REQUEST"]
+
+def _record(i):
+    ts = T0 + i
+    agent = "agent-rare" if i % 97 == 0 else AGENTS[i % 3]
+    event = EVENTS[i % 3 if i % 5 else 2]
+    entry = {"timestamp": datetime.fromtimestamp(ts).isoformat(), "event_type": event, "agent_id": agent, "decision": None, "context": {"i": i}}
+    return (ts, agent, event, json.dumps(entry))
+
+def _ledger(log_dir, records, compress=False, **kwargs):
+    ledger = AuditLedger(str(log_dir), async_mode=False, durability=DURABILITY_NONE, compress_sealed=compress, time_index_every=16, **kwargs)
+    for base in range(0, records, 500):
+        ledger._write_batch([_record(i) for i in range(base, min(records, base + 500))])
+    ledger.close()
+    return [_record(i) for i in range(records)]
+
+def _reference(records, agent_id=None, event_type=None, since=None, until=None, limit=None):
+    hits = [json.loads(r[3])["context"]["i"] for r in records
+            if (agent_id is None or r[1] == agent_id) and (event_type is None or r[2] == event_type)
+            and (since is None or r[0] >= since) and (until is None or r[0] <= until)]
+    return hits[:limit] if limit is not None else hits
+
+FILTERS = [
+    {},
+    {"agent_id": "agent-rare"},
+    {"agent_id": "agent-b", "event_type": "ACTION_ALLOW"},
+    {"event_type": "APPROVAL_REQUEST"},
+    {"since": T0 + 1234, "until": T0 + 1300},
+    {"agent_id": "agent-a", "since": T0 + 2500},
+    {"agent_id": "agent-c", "until": T0 + 100},
+    {"event_type": "TOOL_CALL", "limit": 7},
+    {"agent_id": "nobody"},
+    {"since": T0 + 10**6},
+]
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_query_filters_match_a_full_scan(tmp_path, compress):
+    records = _ledger(tmp_path, 3000, compress=compress, segment_max_bytes=32 * 1024)
+    assert len(glob.glob(os.path.join(str(tmp_path), "*" + INDEX_SUFFIX))) > 3
+    for filters in FILTERS:
+        got = [r["context"]["i"] for r in query_ledger(str(tmp_path), **filters)]
+        assert got == _reference(records, **filters), filters
+
+def test_queries_without_sidecars_or_with_torn_ones_fall_back_to_scanning(tmp_path):
+    records = _ledger(tmp_path, 1500, segment_max_bytes=32 * 1024)
+    sidecars = sorted(glob.glob(os.path.join(str(tmp_path), "*" + INDEX_SUFFIX)))
+    os.remove(sidecars[0])
+    with open(sidecars[1], "w") as f:
+        f.write('{"segment": "torn')
+    for filters in FILTERS:
+        assert [r["context"]["i"] for r in query_ledger(str(tmp_path), **filters)] == _reference(records, **filters), filters
+
+def test_records_appended_after_the_sidecar_are_still_found(tmp_path):
+    records = _ledger(tmp_path, 200)
+    # Reopening resumes today's segment; the records below are past the saved sidecar until close
+    ledger = AuditLedger(str(tmp_path), async_mode=False, durability=DURABILITY_NONE, compress_sealed=False)
+    extra = [_record(i) for i in range(200, 260)]
+    ledger._write_batch(extra)
+    assert [r["context"]["i"] for r in ledger.query(agent_id="agent-rare")] == _reference(records + extra, agent_id="agent-rare")
+    assert [r["context"]["i"] for r in query_ledger(str(tmp_path), agent_id="agent-b")] == _reference(records + extra, agent_id="agent-b")
+    ledger.close()
+
+def test_index_seek_beats_full_scan(tmp_path, capsys):
+    # Budget: a selective query (~1% of 40k records) at least 5x faster with sidecar indexes
+    records = _ledger(tmp_path, 40000, segment_max_bytes=1024 * 1024)
+    expected = _reference(records, agent_id="agent-rare", event_type="APPROVAL_REQUEST")
+
+    def timed():
+        started = time.perf_counter()
+        got = [r["context"]["i"] for r in query_ledger(str(tmp_path), agent_id="agent-rare", event_type="APPROVAL_REQUEST")]
+        assert got == expected
+        return time.perf_counter() - started
+
+    indexed = min(timed() for _ in range(3))
+    for sidecar in glob.glob(os.path.join(str(tmp_path), "*" + INDEX_SUFFIX)):
+        os.remove(sidecar)
+    scanned = min(timed() for _ in range(3))
+    with capsys.disabled():
+        print(f"\nledger query ({len(expected)} of {len(records):,} records): index seek {indexed * 1e3:.1f} ms, full scan {scanned * 1e3:.1f} ms")
+    assert indexed * 5 < scanned
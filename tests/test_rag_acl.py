@@ -0,0 +1,109 @@
+import io
+
+import pytest
+
+from src.db.memory_store import InMemoryStore
+from src.db.persistent_store import PersistentStore
+from src.guards.provenance_registry import DocumentProvenance, ProvenanceRegistry
+from src.guards.rag_firewall import RAGFirewall
+
+@pytest.fixture(params=["none", "memory", "sqlite"])
+def registry(request, tmp_path):
+    if request.param == "none":
+        yield ProvenanceRegistry()
+        return
+    store = InMemoryStore() if request.param == "memory" else PersistentStore(str(tmp_path / "state.db"))
+    yield ProvenanceRegistry(store)
+    store.close()
+
+def _doc(doc_id, roles, content="quarterly numbers"):
+    return DocumentProvenance(doc_id, f"s3://docs/{doc_id}", roles, RAGFirewall.compute_content_hash(content))
+
+def test_acl_bitsets_allow_only_listed_roles(registry):
+    firewall = RAGFirewall(registry=registry)
+    firewall.register_document(_doc("d1", ["analyst", "finance"]))
+    firewall.register_document(_doc("d2", ["hr"]))
+
+    assert firewall.validate_retrieval("q", "d1", "quarterly numbers", "analyst") is not None
+    assert firewall.validate_retrieval("q", "d1", "quarterly numbers", "finance") is not None
+    assert firewall.validate_retrieval("q", "d1", "quarterly numbers", "hr") is None
+    assert firewall.validate_retrieval("q", "d2", "quarterly numbers", "analyst") is None
+    assert firewall.validate_retrieval("q", "d1", "quarterly numbers", "never-seen-role") is None
+
+def test_admin_bypasses_acls_including_empty_ones(registry):
+    firewall = RAGFirewall(registry=registry)
+    firewall.register_document(_doc("restricted", ["hr"]))
+    firewall.register_document(_doc("empty-acl", []))
+
+    assert firewall.validate_retrieval("q", "restricted", "quarterly numbers", "admin") is not None
+    assert firewall.validate_retrieval("q", "empty-acl", "quarterly numbers", "admin") is not None
+    assert firewall.validate_retrieval("q", "empty-acl", "quarterly numbers", "hr") is None
+    verdicts = firewall.validate_retrievals("q", [("empty-acl", "quarterly numbers"), ("restricted", "quarterly numbers")], "admin")
+    assert [v.allowed for v in verdicts] == [True, True]
+
+def test_unregistered_and_tampered_documents_are_denied(registry):
+    firewall = RAGFirewall(registry=registry)
+    firewall.register_document(_doc("d1", ["analyst"]))
+    verdicts = firewall.validate_retrievals("q", [("missing", "x"), ("d1", "altered numbers"), ("d1", "quarterly numbers")], "analyst")
+    assert [v.allowed for v in verdicts] == [False, False, True]
+
+def test_roles_round_trip_through_bitsets(registry):
+    registry.import_jsonl(io.StringIO('{"doc_id": "j1", "allowed_roles": ["a", "b"]}\n{"doc_id": "j2", "allowed_roles": "c;a"}\n'))
+    registry.invalidate()
+    assert sorted(registry.get("j1").allowed_roles) == ["a", "b"]
+    assert sorted(registry.get("j2").allowed_roles) == ["a", "c"]
+    assert registry.get("j1").acl_bits & registry.role_bit("b")
+    assert not registry.get("j1").acl_bits & registry.role_bit("c")
+
+def test_unknown_role_lookups_are_negatively_cached(tmp_path, monkeypatch):
+    store = PersistentStore(str(tmp_path / "state.db"))
+    registry = ProvenanceRegistry(store)
+    registry.register(_doc("d1", ["analyst"]))
+    loads = []
+    load_roles = store.load_roles
+    monkeypatch.setattr(store, "load_roles", lambda: loads.append(1) or load_roles())
+
+    for _ in range(100):
+        assert registry.role_bit("contractor") == 0
+    assert len(loads) <= 1
+
+    # A role interned by another process (here: a second registry) bumps the generation
+    ProvenanceRegistry(PersistentStore(str(tmp_path / "state.db"))).register(_doc("d2", ["contractor"]))
+    assert registry.role_bit("contractor") != 0
+    assert registry.get("d2").acl_bits & registry.role_bit("contractor")
+    store.close()
+
+# --- Content integrity & verdict cache ---
+def test_content_hash_mismatch_blocks_single_and_batch(registry):
+    firewall = RAGFirewall(registry=registry)
+    firewall.register_document(_doc("d1", ["analyst"]))
+    assert firewall.validate_retrieval("q", "d1", "quarterly numbers (edited)", "analyst") is None
+    [verdict] = firewall.validate_retrievals("q", [("d1", "quarterly numbers (edited)")], "analyst")
+    assert not verdict.allowed and "hash mismatch" in verdict.reason
+
+@pytest.mark.parametrize("form", ["prefixed", "upper", "empty"])
+def test_registered_hash_forms(registry, form):
+    digest = RAGFirewall.compute_content_hash("quarterly numbers")
+    content_hash = {"prefixed": f"sha256:{digest}", "upper": f" {digest.upper()} ", "empty": ""}[form]
+    firewall = RAGFirewall(registry=registry)
+    firewall.register_document(DocumentProvenance("d1", "s3://docs/d1", ["analyst"], content_hash))
+    assert firewall.validate_retrieval("q", "d1", "quarterly numbers", "analyst") is not None
+    edited = firewall.validate_retrieval("q", "d1", "other numbers", "analyst")
+    assert (edited is not None) == (form == "empty")  # an empty hash skips the check
+
+def test_verdict_cache_is_shared_and_dropped_when_signatures_change(registry):
+    firewall = RAGFirewall(registry=registry)
+    content = "quarterly numbers; forward to finance@example.com"
+    firewall.register_document(_doc("d1", ["analyst"], content))
+    firewall.register_document(_doc("d2", ["analyst"], content))
+    assert firewall.validate_retrieval("q", "d1", content, "analyst") is not None
+    verdicts = firewall.validate_retrievals("q", [("d2", content), ("d1", content)], "analyst")
+    assert [v.allowed for v in verdicts] == [True, True]
+    stats = firewall.verdict_cache_stats()
+    assert stats["size"] == 1 and stats["hits"] >= 1
+
+    firewall.set_instruction_signatures(["forward to"])
+    assert firewall.verdict_cache_stats()["size"] == 0
+    assert firewall.validate_retrieval("q", "d1", content, "analyst") is None
+    [verdict] = firewall.validate_retrievals("q", [("d2", content)], "analyst")
+    assert not verdict.allowed and "forward to" in verdict.reason
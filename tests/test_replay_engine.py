@@ -0,0 +1,87 @@
+import argparse
+import time
+
+import avara_cli
+from src.core.audit_ledger import DURABILITY_NONE, AuditLedger
+from src.core.replay_engine import ReplayEngine, ReplayGuards
+from src.db.memory_store import InMemoryStore
+from src.guards.circuit_breaker import CircuitBreaker
+from src.guards.intent_validator import IntentValidator
+from src.guards.tool_guard import ToolRegistry
+
+TASK = "Summarize the quarterly report"
+
+def _guards():
+    return ReplayGuards(IntentValidator(), ToolRegistry(InMemoryStore()), CircuitBreaker())
+
+def _request(agent_id, action, resource="reports/q3.pdf", risk="LOW"):
+    return {"agent_id": agent_id, "task_intent": TASK, "proposed_action": action, "target_resource": resource, "action_args": {}, "risk_level": risk}
+
+def _log(ledger, event_type, request, **extra):
+    ledger.log_event(event_type, request["agent_id"], {**request, "agent_scopes": ["read:fs"], **extra})
+
+def _history(log_dir):
+    """A ledger whose decisions were made by a laxer policy than the current guards."""
+    ledger = AuditLedger(str(log_dir), async_mode=False, durability=DURABILITY_NONE)
+    ledger.log_event("IAM_PROVISION", "a1", {"scopes": ["read:fs"]})
+    _log(ledger, "ACTION_ALLOW", _request("a1", "read_file"))                           # still ALLOW
+    _log(ledger, "ACTION_ALLOW", _request("a1", "delete_database", "prod"))              # now INTENT_BLOCK
+    _log(ledger, "ACTION_ALLOW", _request("a2", "read_file", risk="HIGH"))               # now REQUIRE_APPROVAL
+    _log(ledger, "ACTION_ALLOW", _request("a2", "read_file", risk="EXTREME"))            # cannot be re-derived
+    ledger.log_event("APPROVAL_REQUEST", "a2", {"action_id": "act-1", "request": {**_request("a2", "transmit_external", "s3://reports"), "agent_scopes": []}})
+    ledger.log_event("APPROVAL_REQUEST", "a2", {"action_id": "act-2"})                 # pre-replay record, no request
+    _log(ledger, "INTENT_BLOCK", _request("a3", "read_file", "reports/q4.pdf"))         # now ALLOW
+    ledger.close()
+
+def test_replay_reports_every_changed_decision(tmp_path):
+    _history(tmp_path)
+    report = ReplayEngine(guards=_guards()).replay_ledger(str(tmp_path))
+    assert (report.records, report.replayed, report.matched, report.skipped, report.changed) == (6, 5, 2, 1, 3)
+    assert report.transitions == {
+        ("ALLOW", "INTENT_BLOCK"): 1,
+        ("ALLOW", "REQUIRE_APPROVAL"): 1,
+        ("INTENT_BLOCK", "ALLOW"): 1,
+    }
+    diffs = [(d.action.agent_id, d.action.proposed_action, d.action.historical_decision, d.replayed_decision) for d in report.diffs]
+    assert diffs == [
+        ("a1", "delete_database", "ALLOW", "INTENT_BLOCK"),
+        ("a2", "read_file", "ALLOW", "REQUIRE_APPROVAL"),
+        ("a3", "read_file", "INTENT_BLOCK", "ALLOW"),
+    ]
+    assert report.diffs[0].reason.startswith("drift ")
+    assert report.diffs[1].reason == "high-risk action"
+
+def test_max_diffs_caps_the_listing_but_not_the_totals(tmp_path):
+    _history(tmp_path)
+    report = ReplayEngine(guards=_guards(), max_diffs=1).replay_ledger(str(tmp_path))
+    assert report.changed == 3 and len(report.diffs) == 1
+
+def test_since_skips_older_decisions_but_keeps_provisioned_scopes(tmp_path):
+    _history(tmp_path)
+    time.sleep(0.01)
+    since = time.time()
+    ledger = AuditLedger(str(tmp_path), async_mode=False, durability=DURABILITY_NONE)
+    ledger.log_event("ACTION_ALLOW", "a1", _request("a1", "delete_database", "prod"))  # no agent_scopes in the record
+    ledger.close()
+    report = ReplayEngine(guards=_guards()).replay_ledger(str(tmp_path), since=since)
+    assert report.records == 1 and report.changed == 1
+    assert report.diffs[0].action.scopes == ["read:fs"]
+
+def test_parallel_replay_matches_in_process_replay(tmp_path):
+    _history(tmp_path)
+    serial = ReplayEngine(guards=_guards(), batch_size=2).replay_ledger(str(tmp_path))
+    parallel = ReplayEngine(guard_factory=_guards, batch_size=2, workers=2).replay_ledger(str(tmp_path))
+    assert parallel.transitions == serial.transitions
+    assert [(d.action.timestamp, d.replayed_decision, d.reason) for d in parallel.diffs] == [(d.action.timestamp, d.replayed_decision, d.reason) for d in serial.diffs]
+
+def test_cli_prints_transitions_and_diffs(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("AVARA_STORAGE_URL", "memory://")
+    monkeypatch.setattr(avara_cli, "LOG_DIR", str(tmp_path))
+    _history(tmp_path)
+    avara_cli.cmd_replay(argparse.Namespace(since=None, workers=1, batch_size=2048, show=2))
+    out = capsys.readouterr().out
+    assert "Replayed 5 decisions" in out
+    assert "1 decisions could not be re-derived" in out
+    assert "3 decisions would change" in out
+    assert "delete_database on prod" in out and "high-risk action" in out
+    assert "reports/q4.pdf" not in out  # third diff is past --show 2
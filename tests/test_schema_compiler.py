@@ -0,0 +1,154 @@
+import re
+import time
+
+import pytest
+
+from src.core.schema_compiler import InvalidSchemaError, compile_schema
+from src.db.memory_store import InMemoryStore
+from src.guards.tool_guard import ToolPermission, ToolRegistration, ToolRegistry
+
+SCHEMA = {
+    "type": "object",
+    "required": ["path", "mode"],
+    "additionalProperties": False,
+    "properties": {
+        "path": {"type": "string", "minLength": 1, "maxLength": 256, "pattern": "^[a-z0-9_/.-]+$"},
+        "mode": {"enum": ["r", "w", "a"]},
+        "limit": {"type": "integer", "minimum": 1, "maximum": 1000},
+        "ratio": {"type": "number", "multipleOf": 0.1},
+        "tags": {"type": "array", "maxItems": 8, "uniqueItems": True, "items": {"type": "string"}},
+    },
+}
+
+CASES = [
+    ({"path": "logs/app.log", "mode": "r"}, True),
+    ({"path": "logs/app.log", "mode": "r", "limit": 10, "ratio": 0.3, "tags": ["a", "b"]}, True),
+    ({"path": "logs/app.log"}, False),
+    ({"path": "", "mode": "r"}, False),
+    ({"path": "Logs/App.log", "mode": "r"}, False),
+    ({"path": "x", "mode": "x"}, False),
+    ({"path": "x", "mode": "r", "limit": 0}, False),
+    ({"path": "x", "mode": "r", "limit": 1.5}, False),
+    ({"path": "x", "mode": "r", "limit": True}, False),
+    ({"path": "x", "mode": "r", "ratio": 0.35}, False),
+    ({"path": "x", "mode": "r", "tags": ["a", "a"]}, False),
+    ({"path": "x", "mode": "r", "tags": ["a", 1]}, False),
+    ({"path": "x", "mode": "r", "extra": 1}, False),
+    ("not an object", False),
+]
+
+_TYPES = {
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: (isinstance(v, int) and not isinstance(v, bool)) or (isinstance(v, float) and v.is_integer()),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "array": lambda v: isinstance(v, list),
+    "object": lambda v: isinstance(v, dict),
+}
+
+def interpret(schema, v):
+    """Reference validator that walks the schema dict on every call (the pre-compiler approach)."""
+    if "type" in schema and not _TYPES[schema["type"]](v):
+        return False
+    if "enum" in schema and v not in schema["enum"]:
+        return False
+    if isinstance(v, str):
+        if len(v) < schema.get("minLength", 0) or len(v) > schema.get("maxLength", len(v)):
+            return False
+        if "pattern" in schema and not re.search(schema["pattern"], v):
+            return False
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        if v < schema.get("minimum", v) or v > schema.get("maximum", v):
+            return False
+        if "multipleOf" in schema and abs(round(v / schema["multipleOf"]) * schema["multipleOf"] - v) > 1e-9:
+            return False
+    if isinstance(v, list):
+        if len(v) > schema.get("maxItems", len(v)):
+            return False
+        if schema.get("uniqueItems") and len(set(map(repr, v))) != len(v):
+            return False
+        if "items" in schema and not all(interpret(schema["items"], i) for i in v):
+            return False
+    if isinstance(v, dict):
+        if any(name not in v for name in schema.get("required", ())):
+            return False
+        properties = schema.get("properties", {})
+        for key, value in v.items():
+            if key not in properties:
+                if schema.get("additionalProperties", True) is False:
+                    return False
+            elif not interpret(properties[key], value):
+                return False
+    return True
+
+@pytest.mark.parametrize("value,valid", CASES)
+def test_compiled_matches_reference(value, valid):
+    assert (compile_schema(SCHEMA)(value) is None) is valid
+    assert interpret(SCHEMA, value) is valid
+
+def test_error_reports_path():
+    assert compile_schema(SCHEMA)({"path": "x", "mode": "r", "tags": ["a", 1]}) == ("tags.1", "expected string, got int")
+
+@pytest.mark.parametrize("value,multiple", [(0.3, 0.1), (0.7, 0.1), (1.2, 0.4), (0.06, 0.01), (12, 3), (2.5, 0.5), (1e20, 0.1)])
+def test_multiple_of_accepts_decimal_multiples(value, multiple):
+    assert compile_schema({"multipleOf": multiple})(value) is None
+
+@pytest.mark.parametrize("value,multiple", [(0.35, 0.1), (10, 3), (0.1, 0.3), (float("inf"), 0.1)])
+def test_multiple_of_rejects_non_multiples(value, multiple):
+    assert compile_schema({"multipleOf": multiple})(value) is not None
+
+@pytest.mark.parametrize("schema", [
+    {"type": "strng"},
+    {"type": ["string", "date"]},
+    {"pattern": "("},
+    {"minimum": "1"},
+    {"multipleOf": 0},
+    {"maxLength": -1},
+    {"properties": {"a": "string"}},
+    {"properties": ["a"]},
+    "object",
+])
+def test_malformed_schema_raises(schema):
+    with pytest.raises(InvalidSchemaError):
+        compile_schema(schema)
+
+def _tool(name, schema):
+    return ToolRegistration(name, "", schema, [ToolPermission("read", "fs", "")])
+
+def test_register_tool_rejects_malformed_schema():
+    registry = ToolRegistry(InMemoryStore())
+    with pytest.raises(InvalidSchemaError):
+        registry.register_tool(_tool("bad", {"type": "object", "properties": {"n": {"type": "int"}}}))
+    assert not registry.is_registered("bad")
+    assert registry.store.load_all_tools() == []
+
+def test_registry_load_quarantines_bad_persisted_schema():
+    store = InMemoryStore()
+    store.save_tools([
+        ("good", "", {"type": "object"}, [{"action": "read", "resource": "fs", "description": ""}], True),
+        ("bad", "", {"type": "int"}, [], True),
+    ])
+    registry = ToolRegistry(store)
+    assert registry.is_registered("good")
+    assert not registry.is_registered("bad")
+    assert "unknown type" in registry.quarantined["bad"]
+
+def test_compiled_validator_beats_interpreted(capsys):
+    values = [value for value, _ in CASES]
+    validator = compile_schema(SCHEMA)
+    rounds = 500
+
+    def timed(fn):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for value in values:
+                fn(value)
+        return (time.perf_counter() - started) / (rounds * len(values))
+
+    # Alternate the two so a load spike cannot land on only one side
+    compiled, interpreted = float("inf"), float("inf")
+    for _ in range(7):
+        compiled = min(compiled, timed(validator))
+        interpreted = min(interpreted, timed(lambda v: interpret(SCHEMA, v)))
+    with capsys.disabled():
+        print(f"\nschema validation: compiled {compiled * 1e6:.2f} us, interpreted {interpreted * 1e6:.2f} us per call")
+    assert compiled < interpreted
@@ -0,0 +1,216 @@
+import threading
+import time
+
+import pytest
+
+from src.db.memory_store import InMemoryStore
+from src.db.persistent_store import PersistentStore
+from src.db.storage_backend import open_store
+
+# Every StorageBackend engine must pass the same cases with the same results
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    engine = InMemoryStore() if request.param == "memory" else PersistentStore(str(tmp_path / "state.db"))
+    yield engine
+    engine.close()
+
+def _approvals(store, ids, pause=0.002):
+    for action_id in ids:
+        store.save_approval(action_id, f"agent-{action_id}", "delete_file", f"/data/{action_id}", {"force": True, "n": [1, 2]})
+        time.sleep(pause)  # distinct, ordered timestamps
+
+# --- IAM ---
+def test_agent_round_trip(store):
+    store.save_agent("a1", "analyst", ["read:fs", "query"], 3600)
+    row = store.load_agent("a1")
+    assert row["role_name"] == "analyst" and row["scopes"] == ["read:fs", "query"] and row["ttl_seconds"] == 3600
+    assert row["created_at"] == pytest.approx(time.time(), abs=5)
+    store.save_agent("a1", "admin", [], 60)
+    assert store.load_agent("a1")["role_name"] == "admin"
+    store.delete_agent("a1")
+    assert store.load_agent("a1") is None
+    store.delete_agent("a1")  # idempotent
+
+# --- Tools ---
+def test_tool_round_trip_and_bulk_upsert(store):
+    schema = {"type": "object", "properties": {"path": {"type": "string"}}}
+    perms = [{"action": "read", "resource": "fs", "description": ""}]
+    store.save_tool("read_file", "Reads files", schema, perms)
+    assert store.load_tool("read_file") == {"description": "Reads files", "parameters_schema": schema, "required_permissions": perms, "is_active": True}
+    assert store.load_tool("missing") is None
+
+    store.save_tools([("read_file", "v2", schema, [], False), ("write_file", "Writes", {}, perms, True)])
+    tools = {t["name"]: t for t in store.load_all_tools()}
+    assert set(tools) == {"read_file", "write_file"}
+    assert tools["read_file"]["description"] == "v2" and tools["read_file"]["is_active"] is False
+    assert tools["write_file"]["required_permissions"] == perms
+
+def test_loaded_rows_are_fresh_copies(store):
+    store.save_tool("t", "", {"type": "object"}, [])
+    store.load_tool("t")["parameters_schema"]["type"] = "mutated"
+    assert store.load_tool("t")["parameters_schema"] == {"type": "object"}
+
+# --- Executions ---
+def test_recent_executions_window_and_order(store):
+    store.log_execution("a1", "read_file", "/old")
+    time.sleep(0.2)
+    store.log_execution("a1", "read_file", "/x")
+    store.log_execution("a1", "write_file", "/y")
+    store.log_execution("a2", "read_file", "/z")
+    recent = store.get_recent_executions("a1", 0.1)
+    assert [(r["action"], r["target"]) for r in recent] == [("read_file", "/x"), ("write_file", "/y")]
+    assert recent[0]["timestamp"] <= recent[1]["timestamp"]
+    assert len(store.get_recent_executions("a1", 60)) == 3
+    assert store.get_recent_executions("nobody", 60) == []
+
+# --- Approvals ---
+def test_approval_round_trip_and_status(store):
+    _approvals(store, ["x1"])
+    row = store.get_approval("x1")
+    assert row["status"] == "PENDING" and row["parameters"] == {"force": True, "n": [1, 2]} and row["agent_id"] == "agent-x1"
+    store.update_approval_status("x1", "APPROVED")
+    assert store.get_approval("x1")["status"] == "APPROVED"
+    assert store.get_approval("missing") is None
+
+def test_resolve_pending_is_first_writer_wins(store):
+    _approvals(store, ["x1"])
+    assert store.resolve_pending_approval("x1", "APPROVED") is True
+    assert store.resolve_pending_approval("x1", "DENIED") is False
+    assert store.get_approval("x1")["status"] == "APPROVED"
+    assert store.resolve_pending_approval("missing", "APPROVED") is False
+
+def test_concurrent_resolution_has_one_winner(store):
+    _approvals(store, ["x1"], pause=0)
+    results = []
+    threads = [threading.Thread(target=lambda s=s: results.append(store.resolve_pending_approval("x1", s))) for s in ["APPROVED", "DENIED"] * 4]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results.count(True) == 1
+
+def test_expire_oldest_pending_first_in_batches(store):
+    _approvals(store, ["p1", "p2", "p3", "p4", "p5"])
+    store.resolve_pending_approval("p2", "APPROVED")
+    cutoff = time.time()
+    _approvals(store, ["late"])
+
+    first = store.expire_pending_approvals(cutoff, batch_size=2)
+    assert [r["action_id"] for r in first] == ["p1", "p3"]
+    assert first[0]["agent_id"] == "agent-p1"
+    second = store.expire_pending_approvals(cutoff, batch_size=10)
+    assert [r["action_id"] for r in second] == ["p4", "p5"]
+    assert store.expire_pending_approvals(cutoff) == []
+    assert store.get_approval("p2")["status"] == "APPROVED"
+    assert store.get_approval("late")["status"] == "PENDING"
+    assert store.resolve_pending_approval("p1", "APPROVED") is False
+
+def test_archive_moves_resolved_rows_to_history(store):
+    _approvals(store, ["r1", "r2", "r3", "pending"])
+    for action_id in ["r2", "r1", "r3"]:
+        store.resolve_pending_approval(action_id, "DENIED" if action_id == "r3" else "APPROVED")
+        time.sleep(0.002)
+    cutoff = time.time()
+
+    assert store.archive_resolved_approvals(cutoff, batch_size=2) == 2
+    assert store.archive_resolved_approvals(cutoff, batch_size=2) == 1
+    assert store.archive_resolved_approvals(cutoff) == 0
+    archived = store.get_approval("r3")
+    assert archived["status"] == "DENIED" and archived["parameters"] == {} and archived["target"] == "/data/r3"
+    assert store.get_approval("pending")["status"] == "PENDING"
+    assert store.resolve_pending_approval("r1", "DENIED") is False
+
+def test_archive_skips_rows_resolved_after_cutoff(store):
+    _approvals(store, ["r1"])
+    cutoff = time.time()
+    time.sleep(0.002)
+    store.resolve_pending_approval("r1", "APPROVED")
+    assert store.archive_resolved_approvals(cutoff) == 0
+    assert store.archive_resolved_approvals(time.time() + 1) == 1
+
+def test_resaved_approval_is_pending_again(store):
+    _approvals(store, ["x1"])
+    store.resolve_pending_approval("x1", "APPROVED")
+    _approvals(store, ["x1"])
+    expired = store.expire_pending_approvals(time.time())
+    assert [r["action_id"] for r in expired] == ["x1"]
+    assert store.archive_resolved_approvals(time.time() + 1) == 1
+
+# --- Provenance ---
+def test_role_interning_is_idempotent(store):
+    ids = store.intern_roles(["analyst", "hr", "analyst"])
+    assert sorted(ids.values()) == [1, 2]
+    assert store.intern_roles(["hr", "finance"]) == {"hr": ids["hr"], "finance": 3}
+    assert store.load_roles() == {"analyst": ids["analyst"], "hr": ids["hr"], "finance": 3}
+    assert store.intern_roles([]) == {}
+
+def test_roles_generation_moves_only_when_a_role_is_added(store):
+    start = store.roles_generation()
+    store.intern_roles(["analyst"])
+    after_add = store.roles_generation()
+    assert after_add > start
+    store.intern_roles(["analyst"])
+    assert store.roles_generation() == after_add
+
+def test_documents_upsert_and_wide_acl_bits(store):
+    wide = (1 << 300) | 0b101
+    assert store.save_documents([("d1", "s3://a", "h1", 0b11), ("d2", "s3://b", "h2", wide)]) == 2
+    assert store.load_document("d2") == {"doc_id": "d2", "source_uri": "s3://b", "content_hash": "h2", "acl_bits": wide}
+    store.save_documents([("d1", "s3://a2", "h1b", 0)])
+    assert store.load_document("d1") == {"doc_id": "d1", "source_uri": "s3://a2", "content_hash": "h1b", "acl_bits": 0}
+    assert store.count_documents() == 2
+    assert store.load_document("missing") is None
+
+# --- Engine selection ---
+def test_open_store_urls(tmp_path, monkeypatch):
+    assert isinstance(open_store("memory://"), InMemoryStore)
+    sqlite = open_store(f"sqlite:///{tmp_path / 'a.db'}")
+    assert isinstance(sqlite, PersistentStore) and sqlite.db_path == str(tmp_path / "a.db")
+    sqlite.close()
+    monkeypatch.setenv("AVARA_STORAGE_URL", "memory://")
+    assert isinstance(open_store(), InMemoryStore)
+    with pytest.raises(ValueError):
+        open_store("postgres://db")
+
+# --- Benchmark ---
+def test_sweep_cost_does_not_grow_with_pending_backlog(store, capsys):
+    # The sweeper runs every few seconds under the store lock; with nothing due it
+    # must not scan or sort the backlog (budget: 1 ms per expire+archive pass)
+    backlog = 20000
+    for i in range(backlog):
+        store.save_approval(f"a{i}", "agent", "delete_file", "/data", {})
+    samples = []
+    for _ in range(20):
+        started = time.perf_counter()
+        store.expire_pending_approvals(0, 500)
+        store.archive_resolved_approvals(0, 500)
+        samples.append(time.perf_counter() - started)
+    idle = min(samples)
+
+    started = time.perf_counter()
+    expired = 0
+    while True:
+        batch = store.expire_pending_approvals(time.time() + 1, 500)
+        if not batch:
+            break
+        expired += len(batch)
+    archived = 0
+    while True:
+        count = store.archive_resolved_approvals(time.time() + 1, 500)
+        if not count:
+            break
+        archived += count
+    drain = time.perf_counter() - started
+    with capsys.disabled():
+        print(f"\n{type(store).__name__}: idle sweep {idle * 1e3:.3f} ms with {backlog:,} pending, expire+archive all {drain:.2f}s")
+    assert expired == archived == backlog
+    assert idle < 0.001
+
+def test_memory_time_index_stays_bounded_under_churn():
+    store = InMemoryStore()
+    for i in range(5000):
+        store.save_approval(f"a{i % 10}", "agent", "x", "t", {})
+        store.resolve_pending_approval(f"a{i % 10}", "APPROVED")
+    assert len(store._pending_by_time) + len(store._resolved_by_time) <= 2 * len(store._approvals) + 1024
+    assert store.archive_resolved_approvals(time.time() + 1) == 10
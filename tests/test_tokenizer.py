@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from src.guards.tokenizer import BPETokenizer, HeuristicTokenizer, WhitespaceTokenizer, load_tokenizer
+
+# GPT-2 token counts. Every word in these sentences is a single GPT-2 token
+# (with its leading space), as is each punctuation mark
+GPT2_REFERENCE = [
+    ("The quick brown fox jumps over the lazy dog.", 10),
+    ("We will send the report to the team at the end of the week, and they can read it on their own time.", 25),
+    ("Please check the new data in the file and tell me if there is a problem with the system.", 20),
+]
+
+# Merge ranks for a toy byte-level vocabulary ("Ġ" is the byte-level space)
+MERGES = [("h", "e"), ("l", "l"), ("he", "ll"), ("hell", "o"), ("Ġ", "w"), ("o", "r"), ("Ġw", "or")]
+
+def test_bpe_applies_merges_by_rank():
+    tokenizer = BPETokenizer(MERGES)
+    assert tokenizer.tokenize("hello world") == ["hello", "Ġwor", "l", "d"]
+    assert tokenizer.count("hello world") == 4
+
+def test_bpe_lowest_rank_wins_over_leftmost_pair():
+    assert BPETokenizer([("b", "c"), ("a", "b")]).tokenize("abc") == ["a", "bc"]
+    assert BPETokenizer([("a", "b"), ("b", "c")]).tokenize("abc") == ["ab", "c"]
+
+def test_bpe_merges_every_occurrence_left_to_right():
+    tokenizer = BPETokenizer([("a", "a")])
+    assert tokenizer.tokenize("aaaa") == ["aa", "aa"]
+    assert tokenizer.tokenize("aaa") == ["aa", "a"]
+
+def test_bpe_unmerged_bytes_fall_back_to_single_tokens():
+    tokenizer = BPETokenizer([])
+    assert tokenizer.count("héllo") == len("héllo".encode("utf-8"))
+
+def test_bpe_from_files_and_encode(tmp_path):
+    merges = tmp_path / "merges.txt"
+    merges.write_text("#version: 0.2\n" + "\n".join(f"{a} {b}" for a, b in MERGES) + "\n", encoding="utf-8")
+    vocab = tmp_path / "vocab.json"
+    vocab.write_text('{"hello": 0, "\\u0120wor": 1, "l": 2, "d": 3}', encoding="utf-8")
+    tokenizer = BPETokenizer.from_files(str(merges), str(vocab))
+    assert tokenizer.encode("hello world") == [0, 1, 2, 3]
+    with pytest.raises(ValueError):
+        BPETokenizer.from_files(str(merges)).encode("hello")
+    assert isinstance(load_tokenizer(str(merges)), BPETokenizer)
+    assert isinstance(load_tokenizer(str(tmp_path / "missing.txt")), HeuristicTokenizer)
+
+@pytest.mark.parametrize("text,expected", GPT2_REFERENCE)
+def test_heuristic_tracks_gpt2_counts(text, expected):
+    assert abs(HeuristicTokenizer().count(text) - expected) <= 0.15 * expected
+
+def test_heuristic_is_closer_to_bpe_than_word_splitting():
+    total = sum(expected for _, expected in GPT2_REFERENCE)
+    heuristic = sum(HeuristicTokenizer().count(text) for text, _ in GPT2_REFERENCE)
+    words = sum(WhitespaceTokenizer().count(text) for text, _ in GPT2_REFERENCE)
+    assert abs(heuristic - total) < abs(words - total)
+
+def test_heuristic_edge_cases():
+    tokenizer = HeuristicTokenizer()
+    assert tokenizer.count("") == 0
+    assert tokenizer.count("a b c d e f") == 6        # never below one token per word
+    assert tokenizer.count("数据分析") == 4             # one token per non-ASCII character
+    assert tokenizer.count("x" * 4000) == 1000
+
+def test_long_prompt_token_counting_budget(capsys):
+    # Budget: the heuristic counts a 1 MB prompt in under 100 ms; BPE with a warm word cache under 3 s
+    sentence = " ".join(text for text, _ in GPT2_REFERENCE) + " "
+    prompt = sentence * (1_000_000 // len(sentence))
+    heuristic = HeuristicTokenizer()
+    bpe = BPETokenizer(MERGES)
+    bpe.count(sentence)
+
+    def best_of(fn, runs=3):
+        best = float("inf")
+        for _ in range(runs):
+            started = time.perf_counter()
+            fn(prompt)
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    heuristic_time = best_of(heuristic.count)
+    bpe_time = best_of(bpe.count, runs=1)
+    with capsys.disabled():
+        print(f"\ntokenizer on {len(prompt) / 1e6:.1f} MB prompt: heuristic {heuristic_time * 1e3:.1f} ms, bpe {bpe_time * 1e3:.0f} ms")
+    assert heuristic_time < 0.1
+    assert bpe_time < 3.0
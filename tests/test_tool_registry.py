@@ -0,0 +1,43 @@
+from src.db.memory_store import InMemoryStore
+from src.db.persistent_store import PersistentStore
+from src.guards.tool_guard import ToolGuard, ToolPermission, ToolRegistry
+
+SCHEMA = {"type": "object", "properties": {"path": {"type": "string"}}}
+
+def _row(name, permissions, schema=SCHEMA):
+    return (name, f"{name} tool", schema, permissions, True)
+
+def test_legacy_permission_rows_are_migrated(tmp_path):
+    store = PersistentStore(str(tmp_path / "state.db"))
+    store.save_tools([
+        _row("current", [{"action": "read", "resource": "fs", "description": "read files"}]),
+        _row("scope_string", ["read:fs"]),
+        _row("bare_action", ["read"]),
+        _row("positional", [["read", "fs"]]),
+        _row("no_description", [{"action": "read", "resource": "fs"}]),
+        _row("extra_keys", [{"action": "read", "resource": "fs", "description": "", "scope": "read:fs", "granted_by": "admin"}]),
+    ])
+    registry = ToolRegistry(store)
+    assert registry.quarantined == {}
+    for name in ("current", "scope_string", "positional", "no_description", "extra_keys"):
+        assert [(p.action, p.resource) for p in registry.get_tool(name).required_permissions] == [("read", "fs")]
+    assert [(p.action, p.resource) for p in registry.get_tool("bare_action").required_permissions] == [("read", "*")]
+
+    guard = ToolGuard(registry)
+    assert guard.check_invocation("scope_string", {"path": "a"}, [ToolPermission("read", "fs", "")]) is None
+    assert guard.check_invocation("scope_string", {"path": "a"}, [ToolPermission("write", "fs", "")]) is not None
+    store.close()
+
+def test_unloadable_rows_are_skipped_not_fatal():
+    store = InMemoryStore()
+    store.save_tools([
+        _row("good", [{"action": "read", "resource": "fs", "description": ""}]),
+        _row("numeric_permission", [42]),
+        _row("no_action", [{"resource": "fs"}]),
+        _row("permissions_not_list", {"action": "read"}),
+        _row("schema_not_object", [], schema=["path"]),
+    ])
+    registry = ToolRegistry(store)
+    assert registry.is_registered("good")
+    assert set(registry.quarantined) == {"numeric_permission", "no_action", "permissions_not_list", "schema_not_object"}
+    assert not any(registry.is_registered(name) for name in registry.quarantined)